@@ -0,0 +1,19 @@
+from .generator import SyntheticActivity, generate_activities, generate_activity
+from .mock_strava import MockStravaServer, create_mock_strava_app
+from .suites import SUITES, BenchContext, BenchmarkResult, benchmark, compare_to_baseline, load_baseline, run_suites, save_baseline
+
+__all__ = [
+    "SyntheticActivity",
+    "generate_activities",
+    "generate_activity",
+    "MockStravaServer",
+    "create_mock_strava_app",
+    "SUITES",
+    "BenchContext",
+    "BenchmarkResult",
+    "benchmark",
+    "compare_to_baseline",
+    "load_baseline",
+    "run_suites",
+    "save_baseline",
+]
@@ -0,0 +1,180 @@
+import math
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from stride.provider.strava.models import StravaActivityResponseModel, StravaStreamType
+
+# sport -> (mean speed m/s, mean cadence, has power)
+SPORT_PROFILES: dict[str, tuple[float, float, bool]] = {
+    "Run": (3.0, 86.0, False),
+    "Ride": (8.0, 88.0, True),
+    "Walk": (1.4, 55.0, False),
+}
+
+METERS_PER_DEGREE_LAT = 111_320.0
+
+FIRST_START_DATE = datetime(2024, 1, 1, 7, tzinfo=timezone.utc)
+
+
+class SyntheticActivity:
+    """A generated activity, as the Strava API would return it."""
+
+    def __init__(self, summary: dict[str, Any], streams: dict[StravaStreamType, list[Any]]):
+        self.summary = summary
+        self.streams = streams
+
+    @property
+    def id(self) -> int:
+        return int(self.summary["id"])
+
+    def to_response_model(self) -> StravaActivityResponseModel:
+        return StravaActivityResponseModel(**self.summary)
+
+    def stream_json(self, stream_types: list[StravaStreamType]) -> list[dict[str, Any]]:
+        """Streams in the JSON layout of the Strava streams endpoint."""
+        return [{"type": stream_type.value, "data": self.streams[stream_type], "series_type": "distance", "original_size": len(self.streams[stream_type]), "resolution": "high"} for stream_type in stream_types if stream_type in self.streams]
+
+
+def generate_activity(
+    activity_id: int,
+    duration_s: int = 3600,
+    sport: str = "Run",
+    start_date: datetime | None = None,
+    origin: tuple[float, float] = (52.37, 4.89),
+    seed: int | None = None,
+    athlete_id: int = 1,
+) -> SyntheticActivity:
+    """Generate a realistic 1 Hz activity with all Strava stream types.
+
+    Speed, heartrate and cadence are smooth random walks around the sport's profile,
+    the track is a meandering loop around the origin, altitude rolls with the
+    distance and the occasional pause shows up in the moving stream.
+
+    Args:
+        activity_id: Strava ID of the activity
+        duration_s: Elapsed time in seconds (one sample per second)
+        sport: "Run", "Ride" or "Walk"
+        start_date: Start of the activity (default: derived from the ID)
+        origin: (lat, lng) the track starts at
+        seed: Random seed (default: the activity ID), equal seeds give equal activities
+        athlete_id: Strava ID of the athlete
+
+    Returns:
+        Generated activity
+    """
+    rng = random.Random(activity_id if seed is None else seed)
+    mean_speed, mean_cadence, has_power = SPORT_PROFILES[sport]
+    start_date = start_date or FIRST_START_DATE + timedelta(hours=6 * (activity_id % 10_000))
+
+    time: list[float] = []
+    distance: list[float] = []
+    latlng: list[list[float]] = []
+    altitude: list[float] = []
+    velocity: list[float] = []
+    heartrate: list[float] = []
+    cadence: list[float] = []
+    watts: list[float] = []
+    temp: list[float] = []
+    moving: list[bool] = []
+    grade: list[float] = []
+
+    lat, lng = origin
+    heading = rng.uniform(0, 2 * math.pi)
+    speed = mean_speed
+    hr = 95.0
+    total = 0.0
+    pause_left = 0
+    for second in range(duration_s):
+        if pause_left == 0 and rng.random() < 0.001:
+            pause_left = rng.randint(5, 60)
+        is_moving = pause_left == 0
+        pause_left = max(pause_left - 1, 0)
+
+        speed = min(max(speed + rng.gauss(0, 0.05) + 0.02 * (mean_speed - speed), 0.3 * mean_speed), 2.0 * mean_speed) if is_moving else 0.0
+        heading += rng.gauss(0, 0.03)
+        step = speed if is_moving else 0.0
+        total += step
+        lat += step * math.cos(heading) / METERS_PER_DEGREE_LAT
+        lng += step * math.sin(heading) / (METERS_PER_DEGREE_LAT * math.cos(math.radians(lat)))
+        elevation = 10 + 8 * math.sin(total / 900) + 3 * math.sin(total / 170)
+        target_hr = 100 + 60 * (speed / (2 * mean_speed)) + 15 * min(second / max(duration_s, 1), 1)
+        hr += 0.05 * (target_hr - hr) + rng.gauss(0, 0.3)
+
+        time.append(float(second))
+        distance.append(round(total, 1))
+        latlng.append([round(lat, 6), round(lng, 6)])
+        altitude.append(round(elevation, 1))
+        velocity.append(round(speed, 3))
+        heartrate.append(float(round(hr)))
+        cadence.append(float(round(mean_cadence + rng.gauss(0, 2))) if is_moving else 0.0)
+        watts.append(float(round(max(0.0, 25 * speed + rng.gauss(0, 15)))) if is_moving else 0.0)
+        temp.append(float(round(18 + 2 * math.sin(second / 3600))))
+        moving.append(is_moving)
+        grade.append(round(100 * (elevation - altitude[-2]) / step, 1) if len(altitude) > 1 and step > 0 else 0.0)
+
+    streams: dict[StravaStreamType, list[Any]] = {
+        StravaStreamType.TIME: time,
+        StravaStreamType.DISTANCE: distance,
+        StravaStreamType.LATLNG: latlng,
+        StravaStreamType.ALTITUDE: altitude,
+        StravaStreamType.VELOCITY_SMOOTH: velocity,
+        StravaStreamType.HEARTRATE: heartrate,
+        StravaStreamType.CADENCE: cadence,
+        StravaStreamType.TEMP: temp,
+        StravaStreamType.MOVING: moving,
+        StravaStreamType.GRADE_SMOOTH: grade,
+    }
+    if has_power:
+        streams[StravaStreamType.WATTS] = watts
+
+    moving_time = sum(moving)
+    summary = {
+        "id": activity_id,
+        "name": f"Synthetic {sport.lower()} {activity_id}",
+        "distance": round(total, 1),
+        "moving_time": moving_time,
+        "elapsed_time": duration_s,
+        "total_elevation_gain": round(sum(max(b - a, 0.0) for a, b in zip(altitude, altitude[1:])), 1),
+        "type": sport,
+        "start_date": start_date.isoformat(),
+        "start_date_local": start_date.replace(tzinfo=None).isoformat(),
+        "timezone": "(GMT+01:00) Europe/Amsterdam",
+        "average_speed": round(total / max(moving_time, 1), 3),
+        "max_speed": max(velocity, default=0.0),
+        "average_heartrate": round(sum(heartrate) / max(len(heartrate), 1), 1),
+        "max_heartrate": max(heartrate, default=0.0),
+        "has_heartrate": True,
+        "average_cadence": round(sum(cadence) / max(len(cadence), 1), 1),
+        "average_watts": round(sum(watts) / max(len(watts), 1), 1) if has_power else None,
+        "device_watts": has_power,
+        "athlete": {"id": athlete_id},
+    }
+    return SyntheticActivity(summary, streams)
+
+
+def generate_activities(count: int, duration_s: int = 3600, sports: tuple[str, ...] = ("Run", "Ride"), first_id: int = 1_000_000, seed: int = 0) -> list[SyntheticActivity]:
+    """Generate a reproducible set of activities, alternating sports and spread over nearby start points.
+
+    Args:
+        count: Number of activities
+        duration_s: Elapsed time of every activity in seconds
+        sports: Sports to cycle through
+        first_id: Strava ID of the first activity
+        seed: Random seed of the set
+
+    Returns:
+        Generated activities, oldest first
+    """
+    rng = random.Random(seed)
+    return [
+        generate_activity(
+            first_id + i,
+            duration_s=duration_s,
+            sport=sports[i % len(sports)],
+            start_date=FIRST_START_DATE + timedelta(hours=6 * i),
+            origin=(52.37 + rng.uniform(-0.05, 0.05), 4.89 + rng.uniform(-0.05, 0.05)),
+            seed=seed * 1_000_003 + i,
+        )
+        for i in range(count)
+    ]
@@ -0,0 +1,159 @@
+import asyncio
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Any
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from stride.bench.generator import SyntheticActivity
+from stride.provider.strava.models import StravaStreamType
+
+
+class RateLimiter:
+    """Strava style fixed-window rate limits: per 15 minutes and per day."""
+
+    def __init__(self, limit_15min: int = 0, limit_daily: int = 0):
+        self.limit_15min = limit_15min
+        self.limit_daily = limit_daily
+        self._lock = threading.Lock()
+        self._window: tuple[int, int] = (0, 0)
+        self.usage_15min = 0
+        self.usage_daily = 0
+
+    def hit(self) -> bool:
+        """Count a request, returns False if it exceeds a limit (0 means unlimited)."""
+        now = time.time()
+        window = (int(now // 900), int(now // 86400))
+        with self._lock:
+            if window[0] != self._window[0]:
+                self.usage_15min = 0
+            if window[1] != self._window[1]:
+                self.usage_daily = 0
+            self._window = window
+            self.usage_15min += 1
+            self.usage_daily += 1
+            return not ((self.limit_15min and self.usage_15min > self.limit_15min) or (self.limit_daily and self.usage_daily > self.limit_daily))
+
+    def headers(self) -> dict[str, str]:
+        return {
+            "X-RateLimit-Limit": f"{self.limit_15min},{self.limit_daily}",
+            "X-RateLimit-Usage": f"{self.usage_15min},{self.usage_daily}",
+        }
+
+
+def create_mock_strava_app(activities: list[SyntheticActivity], latency_ms: float = 0.0, limit_15min: int = 0, limit_daily: int = 0) -> FastAPI:
+    """Create a FastAPI app that serves activities like the Strava API v3.
+
+    Serves /api/v3/athlete/activities (per_page, page, after, before),
+    /api/v3/activities/{id} and /api/v3/activities/{id}/streams[/{types}].
+
+    Args:
+        activities: Activities to serve
+        latency_ms: Delay added to every response
+        limit_15min: Requests allowed per 15 minutes (0: unlimited)
+        limit_daily: Requests allowed per day (0: unlimited)
+
+    Returns:
+        FastAPI app, with the request count per path in app.state.requests
+    """
+    app = FastAPI()
+    by_id = {activity.id: activity for activity in activities}
+    start_times = sorted((datetime.fromisoformat(activity.summary["start_date"]).timestamp(), activity.id) for activity in activities)
+    limiter = RateLimiter(limit_15min, limit_daily)
+    app.state.requests = {}
+    app.state.limiter = limiter
+
+    @app.middleware("http")
+    async def simulate_api(request: Request, call_next):  # type: ignore[no-untyped-def]
+        route = request.url.path
+        app.state.requests[route] = app.state.requests.get(route, 0) + 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if not limiter.hit():
+            return JSONResponse({"message": "Rate Limit Exceeded"}, status_code=429, headers=limiter.headers())
+        response = await call_next(request)
+        response.headers.update(limiter.headers())
+        return response
+
+    @app.get("/api/v3/athlete/activities")
+    def list_activities(per_page: int = 30, page: int = 1, after: float | None = None, before: float | None = None) -> list[dict[str, Any]]:
+        ids = [activity_id for start, activity_id in start_times if (after is None or start > after) and (before is None or start < before)]
+        return [by_id[activity_id].summary for activity_id in ids[(page - 1) * per_page : page * per_page]]
+
+    @app.get("/api/v3/activities/{activity_id}")
+    def get_activity(activity_id: int) -> dict[str, Any]:
+        if activity_id not in by_id:
+            raise HTTPException(status_code=404, detail="Record Not Found")
+        return by_id[activity_id].summary
+
+    @app.get("/api/v3/activities/{activity_id}/streams/{types}")
+    def get_streams_by_type(activity_id: int, types: str) -> list[dict[str, Any]]:
+        if activity_id not in by_id:
+            raise HTTPException(status_code=404, detail="Record Not Found")
+        return by_id[activity_id].stream_json([StravaStreamType(stream_type) for stream_type in types.split(",")])
+
+    @app.get("/api/v3/activities/{activity_id}/streams")
+    def get_streams(activity_id: int, keys: str = "", key_by_type: bool = False) -> list[dict[str, Any]] | dict[str, dict[str, Any]]:
+        streams = get_streams_by_type(activity_id, keys or ",".join(stream_type.value for stream_type in StravaStreamType))
+        return {stream.pop("type"): stream for stream in streams} if key_by_type else streams
+
+    return app
+
+
+class MockStravaServer:
+    """Runs a mock Strava API in a background thread.
+
+    Usage:
+        with MockStravaServer(activities, latency_ms=20) as server:
+            StravaService(base_url=server.base_url).get_activities()
+    """
+
+    def __init__(self, activities: list[SyntheticActivity], latency_ms: float = 0.0, limit_15min: int = 0, limit_daily: int = 0, port: int = 0):
+        self.app = create_mock_strava_app(activities, latency_ms, limit_15min, limit_daily)
+        self.port = port or self._free_port()
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, name="mock-strava", daemon=True)
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port: int = sock.getsockname()[1]
+            return port
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/v3"
+
+    @property
+    def requests(self) -> dict[str, int]:
+        """Number of requests served per path."""
+        requests: dict[str, int] = self.app.state.requests
+        return requests
+
+    def start(self) -> "MockStravaServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+    def __enter__(self) -> "MockStravaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    from stride.bench.generator import generate_activities
+
+    # serve 50 synthetic activities on http://127.0.0.1:8123/api/v3
+    uvicorn.run(create_mock_strava_app(generate_activities(50), latency_ms=50, limit_15min=600, limit_daily=30000), host="127.0.0.1", port=8123)
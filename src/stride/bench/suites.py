@@ -0,0 +1,248 @@
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import pydantic
+import sqlmodel
+from loguru import logger
+
+from stride.bench.generator import SyntheticActivity, generate_activities
+from stride.bench.mock_strava import MockStravaServer
+from stride.enums import ActivityProjection, StreamType
+from stride.provider.strava.main import StravaService
+from stride.provider.strava.models import StravaJSONStreamResponseModel, StravaStreamType
+from stride.stridedb.async_database import AsyncStrideDBService
+from stride.stridedb.converters import StrideConverterService
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.models import Activity
+
+DEFAULT_BASELINE_PATH = Path("benchmarks") / "baseline.json"
+
+# a benchmark is a regression if its median is this much slower than the baseline
+DEFAULT_THRESHOLD = 0.2
+
+# concurrent reads per activity in the async load benchmark
+ASYNC_CONCURRENCY = 10
+
+
+class BenchmarkResult(pydantic.BaseModel):
+    """Timing statistics of one benchmark."""
+
+    name: str
+    rounds: int
+    min_s: float
+    max_s: float
+    mean_s: float
+    median_s: float
+    stddev_s: float
+    throughput: dict[str, float] = pydantic.Field(default_factory=dict)  # unit -> per second (based on the median)
+
+
+class BenchmarkComparison(pydantic.BaseModel):
+    """Median of a benchmark compared to the baseline."""
+
+    name: str
+    baseline_s: float
+    median_s: float
+
+    @property
+    def change(self) -> float:
+        return self.median_s / self.baseline_s - 1 if self.baseline_s else 0.0
+
+
+def benchmark(name: str, function: Callable[[], Any], rounds: int = 5, warmup: int = 1, setup: Callable[[], Any] | None = None, units: dict[str, float] | None = None) -> BenchmarkResult:
+    """Time a function over several rounds.
+
+    Args:
+        name: Name of the benchmark, e.g. "convert.single"
+        function: Function to time
+        rounds: Number of timed rounds
+        warmup: Number of untimed rounds before
+        setup: Called (untimed) before every round
+        units: Work done per call, e.g. {"activities": 20, "samples": 72000}, reported per second
+
+    Returns:
+        Timing statistics
+    """
+    timings = []
+    for round_number in range(warmup + rounds):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        if round_number >= warmup:
+            timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    result = BenchmarkResult(
+        name=name,
+        rounds=rounds,
+        min_s=min(timings),
+        max_s=max(timings),
+        mean_s=statistics.mean(timings),
+        median_s=median,
+        stddev_s=statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        throughput={unit: amount / median for unit, amount in (units or {}).items() if median > 0},
+    )
+    logger.info(f"{name}: median {median * 1000:.1f}ms over {rounds} rounds")
+    return result
+
+
+class BenchContext:
+    """Synthetic data and scratch databases shared by the suites."""
+
+    def __init__(self, n_activities: int = 20, duration_s: int = 3600, latency_ms: float = 0.0, rounds: int = 5):
+        self.activities: list[SyntheticActivity] = generate_activities(n_activities, duration_s=duration_s)
+        self.latency_ms = latency_ms
+        self.rounds = rounds
+        self.workdir = Path(tempfile.mkdtemp(prefix="stride-bench-"))
+        self.raw = [(activity.to_response_model(), StravaJSONStreamResponseModel.model_validate(activity.stream_json(list(activity.streams)))) for activity in self.activities]
+        self.n_samples = sum(len(samples) for activity in self.activities for samples in activity.streams.values())
+        self._db_counter = 0
+
+    def convert(self) -> list[Activity]:
+        return StrideConverterService.process_strava_batch([summary for summary, _ in self.raw], [streams for _, streams in self.raw])
+
+    def new_db(self) -> StrideDBService:
+        """Create an empty database with all tables."""
+        self._db_counter += 1
+        db_service = StrideDBService(url=f"sqlite:///{self.workdir / f'bench_{self._db_counter}.db'}")
+        sqlmodel.SQLModel.metadata.create_all(db_service.engine)
+        return db_service
+
+    def filled_db(self) -> tuple[StrideDBService, list[Activity]]:
+        """Create a database with all activities saved."""
+        db_service = self.new_db()
+        return db_service, db_service.save_activities(self.convert(), verbose=False)
+
+
+def fetch_suite(context: BenchContext) -> list[BenchmarkResult]:
+    """List activities and fetch their summaries and streams from the mock Strava API."""
+    n = len(context.activities)
+    results = []
+    with MockStravaServer(context.activities, latency_ms=context.latency_ms) as server:
+        strava_service = StravaService(base_url=server.base_url)
+        results.append(benchmark("fetch.list", lambda: strava_service.get_activities(per_page=200), rounds=context.rounds, units={"activities": n}))
+        results.append(benchmark("fetch.activity", lambda: [strava_service.get_activity(activity.id) for activity in context.activities], rounds=context.rounds, units={"requests": n}))
+        stream_types = [StravaStreamType.HEARTRATE, StravaStreamType.DISTANCE, StravaStreamType.TIME, StravaStreamType.VELOCITY_SMOOTH]
+        results.append(
+            benchmark(
+                "fetch.streams",
+                lambda: [strava_service.get_streams(activity.id, stream_types) for activity in context.activities],
+                rounds=context.rounds,
+                units={"requests": n},
+            )
+        )
+    return results
+
+
+def convert_suite(context: BenchContext) -> list[BenchmarkResult]:
+    """Convert Strava responses one activity at a time and as one batch."""
+    units: dict[str, float] = {"activities": len(context.activities), "samples": context.n_samples}
+    return [
+        benchmark("convert.single", lambda: [StrideConverterService.process_strava_data(summary, streams) for summary, streams in context.raw], rounds=context.rounds, units=units),
+        benchmark("convert.batch", context.convert, rounds=context.rounds, units=units),
+    ]
+
+
+def save_suite(context: BenchContext) -> list[BenchmarkResult]:
+    """Save converted activities into an empty database."""
+    state: dict[str, Any] = {}
+
+    def setup() -> None:
+        state["db"] = context.new_db()
+        state["activities"] = context.convert()
+
+    return [
+        benchmark(
+            "save.batch",
+            lambda: state["db"].save_activities(state["activities"], verbose=False),
+            rounds=context.rounds,
+            setup=setup,
+            units={"activities": len(context.activities), "samples": context.n_samples},
+        )
+    ]
+
+
+def load_suite(context: BenchContext) -> list[BenchmarkResult]:
+    """Load activities with their streams, and decode streams."""
+    db_service, saved = context.filled_db()
+    ids = [activity.id for activity in saved]
+    url = db_service.engine.url.render_as_string(hide_password=False)
+    cached_service = StrideDBService(url=url, cache_bytes=256 * 1024 * 1024)
+
+    # the async service reads every activity ASYNC_CONCURRENCY times, concurrently, like API requests
+    async_service = AsyncStrideDBService(url=url)
+    loop = asyncio.new_event_loop()
+
+    async def read_concurrently() -> None:
+        await asyncio.gather(*(async_service.get_activity(id) for id in ids * ASYNC_CONCURRENCY))
+
+    results = [
+        benchmark("load.activity", lambda: [db_service.get_activity(id) for id in ids], rounds=context.rounds, units={"activities": len(ids)}),
+        benchmark("load.activity_cached", lambda: [cached_service.get_activity(id) for id in ids], rounds=context.rounds, units={"activities": len(ids)}),
+        benchmark("load.activities", lambda: db_service.get_activities(limit=len(ids)), rounds=context.rounds, units={"activities": len(ids)}),
+        benchmark(
+            "load.activities_summary",
+            lambda: db_service.get_activities(limit=len(ids), projection=ActivityProjection.SUMMARY),
+            rounds=context.rounds,
+            units={"activities": len(ids)},
+        ),
+        benchmark("load.stream_values", lambda: [db_service.get_stream_values(id, StreamType.HEARTRATE) for id in ids], rounds=context.rounds, units={"streams": len(ids)}),
+        benchmark("load.activity_async", lambda: loop.run_until_complete(read_concurrently()), rounds=context.rounds, units={"activities": len(ids) * ASYNC_CONCURRENCY}),
+    ]
+    loop.run_until_complete(async_service.dispose())
+    loop.close()
+    return results
+
+
+def query_suite(context: BenchContext) -> list[BenchmarkResult]:
+    """Spatial, similarity and downsampling queries."""
+    db_service, saved = context.filled_db()
+    ids = [activity.id for activity in saved]
+    return [
+        benchmark("query.area", lambda: db_service.get_activities_in_area(52.36, 4.88, 52.38, 4.90), rounds=context.rounds),
+        benchmark("query.near", lambda: db_service.get_activities_near(52.37, 4.89, radius_m=500), rounds=context.rounds),
+        benchmark("query.similar_routes", lambda: [db_service.find_similar_routes(id) for id in ids], rounds=context.rounds, units={"activities": len(ids)}),
+        benchmark("query.downsampled", lambda: [db_service.get_downsampled_stream(id, StreamType.HEARTRATE, n_points=500) for id in ids], rounds=context.rounds, units={"streams": len(ids)}),
+    ]
+
+
+SUITES: dict[str, Callable[[BenchContext], list[BenchmarkResult]]] = {
+    "fetch": fetch_suite,
+    "convert": convert_suite,
+    "save": save_suite,
+    "load": load_suite,
+    "query": query_suite,
+}
+
+
+def run_suites(names: list[str], context: BenchContext) -> list[BenchmarkResult]:
+    """Run benchmark suites by name."""
+    unknown = set(names) - SUITES.keys()
+    if unknown:
+        raise ValueError(f"Unknown suites: {sorted(unknown)}, choose from {sorted(SUITES)}")
+    return [result for name in names for result in SUITES[name](context)]
+
+
+def save_baseline(results: list[BenchmarkResult], path: Path = DEFAULT_BASELINE_PATH) -> None:
+    """Store results as the baseline, merged into the benchmarks already stored there."""
+    baseline = load_baseline(path)
+    baseline.update({result.name: result for result in results})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({name: result.model_dump() for name, result in sorted(baseline.items())}, indent=2) + "\n")
+
+
+def load_baseline(path: Path = DEFAULT_BASELINE_PATH) -> dict[str, BenchmarkResult]:
+    """Read the stored baseline, empty if there is none."""
+    if not path.exists():
+        return {}
+    return {name: BenchmarkResult(**result) for name, result in json.loads(path.read_text()).items()}
+
+
+def compare_to_baseline(results: list[BenchmarkResult], baseline: dict[str, BenchmarkResult]) -> list[BenchmarkComparison]:
+    """Compare the medians of results to the baseline (benchmarks without a baseline are skipped)."""
+    return [BenchmarkComparison(name=result.name, baseline_s=baseline[result.name].median_s, median_s=result.median_s) for result in results if result.name in baseline]
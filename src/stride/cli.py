@@ -1,8 +1,100 @@
 import typer
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+from stride.profiling import ProfileMode
+
+if TYPE_CHECKING:
+    from stride.metrics import MetricsRegistry
+    from stride.profiling import CommandProfiler
+    from stride.stridedb import StrideDBService
+    from stride.stridedb.sharding import ShardedStrideDBService
 
 app = typer.Typer(help="Stride CLI - Strava activity tracking tool")
 
 
+def _ingest_db_service(prod: bool, sharded: bool) -> "StrideDBService | ShardedStrideDBService":
+    """Get the database ingest commands write to, the single database or the athlete shards."""
+    from stride.stridedb import StrideDBService, create_database
+    from stride.stridedb.sharding import ShardedStrideDBService
+
+    if sharded:
+        return ShardedStrideDBService(prod=prod)
+    create_database(prod)
+    return StrideDBService(prod=prod)
+
+
+def _print_metrics_table(registry: "MetricsRegistry", title: str) -> None:
+    """Print the timed operations (spans) of a metrics registry as a table."""
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title=title)
+    for column in ("span", "labels", "calls", "total s", "mean ms", "p50 ms", "p95 ms", "throughput"):
+        table.add_column(column, justify="right" if column not in ("span", "labels", "throughput") else "left")
+    for row in registry.summary():
+        table.add_row(
+            row["span"],
+            " ".join(f"{name}={value}" for name, value in row["labels"].items()),
+            str(row["calls"]),
+            f"{row['total_s']:.2f}",
+            f"{row['mean_ms']:.1f}",
+            f"<={row['p50_ms']:.0f}",
+            f"<={row['p95_ms']:.0f}",
+            " ".join(f"{value:,.0f} {counter}/s" for counter, value in row["per_second"].items()),
+        )
+    Console().print(table)
+
+
+def _report_profile(profiler: "CommandProfiler") -> None:
+    """Print the stage timings and SQL statements of a profiled command."""
+    from rich.console import Console
+    from rich.table import Table
+
+    from stride import metrics
+
+    profiler.stop()
+    _print_metrics_table(metrics.REGISTRY, f"stride {profiler.name}: {profiler.wall_time:.2f}s wall time")
+    if profiler.tracer is None:
+        return
+    statements = profiler.tracer.statements()
+    table = Table(title=f"{sum(row['count'] for row in statements)} SQL statements, {len(statements)} distinct")
+    for column in ("count", "total ms", "rows", "statement"):
+        table.add_column(column, justify="left" if column == "statement" else "right")
+    for row in statements[:20]:
+        table.add_row(str(row["count"]), f"{row['total_s'] * 1000:.1f}", str(row["rows"]), row["statement"][:160])
+    console = Console()
+    console.print(table)
+    for row in profiler.tracer.repeated():
+        console.print(f"[yellow]Possible N+1: executed {row['count']} times:[/yellow] {row['statement'][:160]}")
+
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    profile: ProfileMode | None = typer.Option(None, help="Profile the command: cprofile (.prof) or sample (collapsed stacks for flamegraphs)"),
+    trace: bool = typer.Option(False, help="Record the SQL statements the command executes and their counts"),
+    profile_dir: str = typer.Option("profiles", help="Directory profiles and SQL traces are written to"),
+) -> None:
+    """Stride CLI - Strava activity tracking tool"""
+    if ctx.invoked_subcommand != "stats":
+        import atexit
+
+        from stride import metrics
+
+        # keep the metrics of this run for `stride stats`
+        atexit.register(metrics.REGISTRY.save)
+
+    if profile is not None or trace:
+        from pathlib import Path
+
+        from stride.profiling import CommandProfiler
+
+        profiler = CommandProfiler(ctx.invoked_subcommand or "stride", profile, trace, Path(profile_dir))
+        profiler.start()
+        ctx.call_on_close(lambda: _report_profile(profiler))
+
+
 @app.command("strava-setup")
 def strava_setup() -> None:
     """Run Strava setup and update the config."""
@@ -11,6 +103,264 @@ def strava_setup() -> None:
     update_strava_config()
 
 
+@app.command("coros-import")
+def coros_import(
+    export_dir: str = typer.Argument(..., help="Directory with Coros FIT files"),
+    workers: int = typer.Option(0, help="Number of parser processes (0: one per core)"),
+    batch_size: int = typer.Option(100, help="Number of activities saved per transaction"),
+    prod: bool = typer.Option(False, help="Use the prod database"),
+) -> None:
+    """Import a directory of Coros FIT files into stridedb."""
+    from stride.provider.coros import CorosService
+    from stride.stridedb import StrideDBService, create_database
+    from stride.stridedb.converters import StrideConverterService
+
+    create_database(prod)
+    db_service = StrideDBService(prod=prod)
+    batch = []
+    for activity_file in CorosService(export_dir).iter_activities(max_workers=workers or None):
+        batch.append(activity_file)
+        if len(batch) >= batch_size:
+            db_service.save_activities(StrideConverterService.process_coros_batch(batch), verbose=False)
+            batch = []
+    if batch:
+        db_service.save_activities(StrideConverterService.process_coros_batch(batch), verbose=False)
+
+
+@app.command("import-archive")
+def import_archive(
+    archive_path: str = typer.Argument(..., help="Strava bulk export zip"),
+    workers: int = typer.Option(0, help="Number of parser processes (0: one per core)"),
+    batch_size: int = typer.Option(50, help="Number of activities saved per transaction"),
+    prod: bool = typer.Option(False, help="Use the prod database"),
+    sharded: bool = typer.Option(False, help="Save to the per-athlete shard databases"),
+) -> None:
+    """Import a Strava bulk export archive into stridedb, resuming where a previous run stopped."""
+    from stride.stridedb.importer import ArchiveImporter
+
+    ArchiveImporter(_ingest_db_service(prod, sharded), max_workers=workers or None, batch_size=batch_size).import_strava_archive(archive_path)
+
+
+@app.command("sync")
+def sync(
+    start: datetime | None = typer.Option(None, formats=["%Y-%m-%d"], help="Sync activities started after this date"),
+    end: datetime | None = typer.Option(None, formats=["%Y-%m-%d"], help="Sync activities started before this date (default: now)"),
+    resume: bool = typer.Option(False, help="Continue the previous sync where it stopped"),
+    retry_failed: bool = typer.Option(False, help="Retry jobs that ran out of attempts"),
+    workers: int = typer.Option(1, help="Number of worker threads"),
+    prod: bool = typer.Option(False, help="Use the prod database"),
+    sharded: bool = typer.Option(False, help="Save to the per-athlete shard databases"),
+) -> None:
+    """Backfill Strava activities into stridedb through the durable sync queue."""
+    from stride.stridedb.sync import StravaSync
+
+    if not resume and start is None:
+        raise typer.BadParameter("--start is required unless --resume is given")
+    strava_sync = StravaSync(_ingest_db_service(prod, sharded))
+    if retry_failed:
+        strava_sync.queue.retry_failed()
+    counts = strava_sync.run(start_date=start, end_date=end, resume=resume, workers=workers)
+    print(", ".join(f"{count} {status}" for status, count in counts.items()))
+
+
+@app.command("webhook-worker")
+def webhook_worker(
+    once: bool = typer.Option(False, help="Process the queued events and exit"),
+    prod: bool = typer.Option(False, help="Use the prod database"),
+    sharded: bool = typer.Option(False, help="Save to the per-athlete shard databases"),
+) -> None:
+    """Process queued Strava webhook events."""
+    from stride.stridedb.webhooks import WebhookWorker
+
+    worker = WebhookWorker(_ingest_db_service(prod, sharded))
+    if once:
+        while worker.run_once():
+            pass
+    else:
+        worker.run()
+
+
+@app.command("webhook-simulate")
+def webhook_simulate(
+    object_id: int = typer.Argument(..., help="Strava activity ID"),
+    aspect_type: str = typer.Option("create", help="create, update or delete"),
+    sport: str | None = typer.Option(None, help="New activity type, for update events"),
+    url: str = typer.Option("http://localhost:8000/webhooks/strava", help="Webhook receiver URL"),
+    validate: bool = typer.Option(False, help="Also simulate the subscription validation request"),
+) -> None:
+    """Send a Strava-style webhook event to a local receiver."""
+    from stride.config import get_strava_config
+    from stride.provider.strava.models import StravaWebhookAspectType
+    from stride.stridedb.webhooks import simulate_event, simulate_subscription_validation
+
+    if validate:
+        verify_token = get_strava_config().webhook_verify_token
+        if verify_token is None:
+            raise typer.BadParameter("STRAVA_WEBHOOK_VERIFY_TOKEN is not set", param_hint="--validate")
+        print(f"Subscription validation: {'ok' if simulate_subscription_validation(url, verify_token) else 'failed'}")
+    simulate_event(url, object_id, StravaWebhookAspectType(aspect_type), updates={"type": sport} if sport else None)
+
+
+@app.command("training-load")
+def training_load(
+    period: str = typer.Option("week", help="Period of the volume table: day, week or month"),
+    last: int = typer.Option(12, help="Number of periods shown"),
+    rebuild: bool = typer.Option(False, help="Recompute the rollups of all activities first"),
+    prod: bool = typer.Option(False, help="Use the prod database"),
+) -> None:
+    """Show training volume and the CTL/ATL/TSB fitness curves from the rollups."""
+    from stride.stridedb import StrideDBService, create_database
+    from stride.stridedb.models import RollupPeriod
+
+    create_database(prod)
+    db_service = StrideDBService(prod=prod)
+    if rebuild:
+        db_service.rebuild_training_rollups()
+    print(db_service.get_training_volume(RollupPeriod(period)).tail(last))
+    print(db_service.get_fitness().tail(14))
+
+
+@app.command("compute")
+def compute(
+    metric: str = typer.Argument(..., help="Built-in metric (hr_zones, best_efforts, decoupling) or module:function of a stream frame"),
+    workers: int = typer.Option(0, help="Number of worker processes (0: one per core)"),
+    chunk_size: int = typer.Option(50, help="Number of activities per task"),
+    recompute: bool = typer.Option(False, help="Also recompute activities that already have the metric"),
+    prod: bool = typer.Option(False, help="Use the prod database"),
+) -> None:
+    """Compute a metric for every stored activity on all cores and store the results."""
+    from stride.stridedb import StrideDBService, create_database
+    from stride.stridedb.analytics import BatchRunner
+
+    create_database(prod)
+    report = BatchRunner(StrideDBService(prod=prod), max_workers=workers or None, chunk_size=chunk_size).run(metric, recompute=recompute)
+    print(f"{report.metric}: {report.activities} computed, {report.skipped} skipped, {report.failed} failed in {report.seconds:.1f}s ({report.activities_per_second:.0f}/s)")
+    for stats in report.workers:
+        print(f"  worker {stats.pid}: {stats.activities} activities, {stats.activities_per_second:.0f}/s")
+
+
+@app.command("migrate")
+def migrate(
+    status: bool = typer.Option(False, help="Only show the state of every migration"),
+    batch_size: int = typer.Option(200, help="Rows per data migration batch"),
+    max_batches: int = typer.Option(0, help="Stop every data migration after this many batches, the next run resumes (0: run to completion)"),
+    pause: float = typer.Option(0.0, help="Seconds to sleep between batches, to leave the database to other writers"),
+    prod: bool = typer.Option(False, help="Use the prod database"),
+) -> None:
+    """Apply pending schema migrations and run pending data migrations in resumable batches."""
+    from stride.stridedb.database import get_engine
+    from stride.stridedb.migrations import Migrator
+
+    migrator = Migrator(get_engine(prod))
+    states = migrator.status() if status else migrator.migrate(batch_size=batch_size, max_batches=max_batches or None, pause_s=pause)
+    for state in states:
+        progress = "applied" if state.applied else f"in progress (at id {state.cursor})" if state.cursor else "pending"
+        print(f"{state.version:>4} {state.kind:<6} {state.name:<40} {progress}")
+
+
+@app.command("export")
+def export(
+    destination: str = typer.Argument(..., help="Directory of the Parquet dataset"),
+    full: bool = typer.Option(False, help="Rewrite all partitions instead of only the changed ones"),
+    row_group_size: int = typer.Option(64 * 1024, help="Maximum rows per Parquet row group"),
+    prod: bool = typer.Option(False, help="Use the prod database"),
+) -> None:
+    """Export activities and streams to a Parquet dataset partitioned by athlete, year and month."""
+    from pathlib import Path
+
+    from stride.stridedb import StrideDBService
+    from stride.stridedb.export import ParquetExporter
+
+    result = ParquetExporter(StrideDBService(prod=prod), Path(destination), row_group_size=row_group_size).export(full=full)
+    print(f"Wrote {len(result.written)} partitions ({result.activities} activities, {result.samples} samples), removed {len(result.removed)}, {result.unchanged} unchanged")
+
+
+@app.command("stream-store")
+def stream_store(
+    compact: bool = typer.Option(False, help="Only reclaim the space of replaced and removed streams"),
+    prod: bool = typer.Option(False, help="Use the prod database"),
+) -> None:
+    """Build the memory-mapped stream store from the database, for scans over the whole history."""
+    from stride.stridedb.database import StrideDBService, get_stream_store_dir
+    from stride.stridedb.streamstore import StreamStore
+
+    store = StreamStore(get_stream_store_dir(prod))
+    if not compact:
+        StrideDBService(prod=prod).build_stream_store(store)
+    store.compact()
+    print(f"Stream store at {store.root}: {store.size_bytes() / 1e6:.1f} MB")
+
+
+@app.command("stats")
+def stats() -> None:
+    """Summarize the timings and throughput recorded by the last stride command."""
+    from rich.console import Console
+
+    from stride.metrics import SNAPSHOT_PATH, MetricsRegistry
+
+    if not SNAPSHOT_PATH.exists():
+        print("No metrics recorded yet, run a stride command first")
+        raise typer.Exit(1)
+    registry = MetricsRegistry.load(SNAPSHOT_PATH)
+
+    _print_metrics_table(registry, f"stride metrics ({SNAPSHOT_PATH})")
+    console = Console()
+    for name, series in sorted(registry.gauges.items()):
+        for labels, value in series.items():
+            console.print(f"{name} {' '.join(f'{k}={v}' for k, v in labels)}: {value:g}")
+
+
+@app.command("bench")
+def bench(
+    suites: str = typer.Option("fetch,convert,save,load,query", help="Comma separated suites to run"),
+    activities: int = typer.Option(20, help="Number of synthetic activities"),
+    duration: int = typer.Option(3600, help="Duration of every activity in seconds"),
+    rounds: int = typer.Option(5, help="Timed rounds per benchmark"),
+    latency_ms: float = typer.Option(0.0, help="Latency of the mock Strava API"),
+    baseline: str = typer.Option("benchmarks/baseline.json", help="Baseline file"),
+    save_baseline: bool = typer.Option(False, help="Store the results as the new baseline"),
+    threshold: float = typer.Option(0.2, help="Fail if a median is this much slower than the baseline"),
+) -> None:
+    """Run the benchmark suites against synthetic data and a mock Strava API, and compare to the baseline."""
+    from pathlib import Path
+
+    from rich.console import Console
+    from rich.table import Table
+
+    from stride.bench import BenchContext, compare_to_baseline, load_baseline, run_suites
+    from stride.bench import save_baseline as store_baseline
+
+    context = BenchContext(n_activities=activities, duration_s=duration, latency_ms=latency_ms, rounds=rounds)
+    results = run_suites(suites.split(","), context)
+    comparisons = {comparison.name: comparison for comparison in compare_to_baseline(results, load_baseline(Path(baseline)))}
+
+    table = Table(title=f"{activities} activities of {duration}s, {rounds} rounds")
+    for column in ("benchmark", "median ms", "min ms", "stddev ms", "throughput", "vs baseline"):
+        table.add_column(column, justify="left" if column in ("benchmark", "throughput") else "right")
+    for result in results:
+        comparison = comparisons.get(result.name)
+        change = f"{comparison.change:+.0%}" if comparison else "-"
+        if comparison and comparison.change > threshold:
+            change = f"[red]{change}[/red]"
+        table.add_row(
+            result.name,
+            f"{result.median_s * 1000:.1f}",
+            f"{result.min_s * 1000:.1f}",
+            f"{result.stddev_s * 1000:.1f}",
+            " ".join(f"{value:,.0f} {unit}/s" for unit, value in result.throughput.items()),
+            change,
+        )
+    Console().print(table)
+
+    if save_baseline:
+        store_baseline(results, Path(baseline))
+        print(f"Saved baseline to {baseline}")
+    regressions = [comparison for comparison in comparisons.values() if comparison.change > threshold]
+    if regressions and not save_baseline:
+        print(f"{len(regressions)} benchmarks regressed more than {threshold:.0%}: {', '.join(comparison.name for comparison in regressions)}")
+        raise typer.Exit(1)
+
+
 @app.command("test")
 def test_command() -> None:
     """Test command to verify CLI is working."""
@@ -20,6 +20,8 @@ class StravaConfig(pydantic_settings.BaseSettings):
     access_token: str = Field(alias="STRAVA_ACCESS_TOKEN")
     refresh_token: str = Field(alias="STRAVA_REFRESH_TOKEN")
     expires_at: datetime = Field(alias="STRAVA_ACCESS_TOKEN_EXPIRES_AT")
+    # token Strava echoes when validating a webhook subscription, validation is refused while it is not set
+    webhook_verify_token: str | None = Field(default=None, alias="STRAVA_WEBHOOK_VERIFY_TOKEN")
 
     model_config = pydantic_settings.SettingsConfigDict(env_file=".env")
 
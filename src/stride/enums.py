@@ -1,4 +1,5 @@
-from enum import StrEnum
+from enum import IntFlag, StrEnum
+from typing import Iterable
 
 
 class Provider(StrEnum):
@@ -22,3 +23,40 @@ class StreamType(StrEnum):
     ALTITUDE = "altitude"
     VELOCITY_SMOOTH = "velocity_smooth"
     TIME = "time"
+
+
+class StreamMask(IntFlag):
+    """Set of stream types as bits, persisted as Activity.stream_mask (never renumber the bits)."""
+
+    DISTANCE = 1 << 0
+    HEARTRATE = 1 << 1
+    CADENCE = 1 << 2
+    WATTS = 1 << 3
+    TEMP = 1 << 4
+    MOVING = 1 << 5
+    GRADE_SMOOTH = 1 << 6
+    LATLNG = 1 << 7
+    ALTITUDE = 1 << 8
+    VELOCITY_SMOOTH = 1 << 9
+    TIME = 1 << 10
+
+    @classmethod
+    def of(cls, stream_types: Iterable[StreamType]) -> "StreamMask":
+        """Get the mask of some stream types."""
+        mask = cls(0)
+        for stream_type in stream_types:
+            mask |= cls[stream_type.name]
+        return mask
+
+    @property
+    def stream_types(self) -> list[StreamType]:
+        """Stream types in the mask."""
+        return [stream_type for stream_type in StreamType if self & StreamMask[stream_type.name]]
+
+
+class ActivityProjection(StrEnum):
+    """Part of an activity a read loads."""
+
+    SUMMARY = "summary"  # activity columns only, touching streams raises
+    STREAM_TYPES = "stream_types"  # plus type and sample count of its streams, touching samples raises
+    FULL = "full"  # plus the samples of its streams
@@ -0,0 +1,256 @@
+import bisect
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, ParamSpec, TypeVar
+
+from loguru import logger
+
+# snapshot of the last CLI run, read by `stride stats`
+SNAPSHOT_PATH = Path(__file__).parent / "data" / "metrics.json"
+
+PREFIX = "stride_"
+
+# upper bounds in seconds, +Inf is implicit
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = tuple[tuple[str, str], ...]
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as exposed by Prometheus."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile from the buckets (upper bound of the bucket it falls in)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Span:
+    """Timing of one operation, labels and counters can be added while it runs."""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: dict[str, Any]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.counts: dict[str, float] = {}
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    def set(self, **labels: Any) -> None:
+        """Add labels known only once the operation ran, e.g. a status code."""
+        self.labels.update(labels)
+
+    def add(self, counter: str, value: float = 1) -> None:
+        """Count something the operation processed, e.g. bytes or rows, exported as <span>_<counter>_total."""
+        self.counts[counter] = self.counts.get(counter, 0) + value
+
+
+class MetricsRegistry:
+    """In-process registry of counters, gauges and histograms."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.gauges: dict[str, dict[Labels, float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Increase a counter."""
+        key = _labels(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        """Set a gauge."""
+        with self._lock:
+            self.gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Add an observation to a histogram."""
+        key = _labels(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def span(self, name: str, **labels: Any) -> Iterator[Span]:
+        """Time an operation.
+
+        Records <name>_seconds (histogram) and the span's counters (<name>_<counter>_total),
+        labelled with the span's labels plus error="true" if it raised, and logs the span
+        as a structured debug record.
+
+        Args:
+            name: Name of the operation, e.g. "http_request"
+            labels: Labels of the operation, e.g. endpoint="/activities/{id}"
+        """
+        span = Span(self, name, labels)
+        error = False
+        try:
+            yield span
+        except BaseException:
+            error = True
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            if error:
+                span.labels["error"] = "true"
+            self.observe(f"{name}_seconds", span.duration, **span.labels)
+            for counter, value in span.counts.items():
+                self.inc(f"{name}_{counter}_total", value, **span.labels)
+            logger.bind(span=name, duration=span.duration, **span.labels, **span.counts).debug(f"{name} took {span.duration * 1000:.1f}ms {span.labels} {span.counts}")
+
+    def timed(self, name: str) -> Callable[[Callable[P, R]], Callable[P, R]]:
+        """Decorator that wraps every call of a function in a span labelled with the function name."""
+
+        def decorator(function: Callable[P, R]) -> Callable[P, R]:
+            if inspect.iscoroutinefunction(function):
+                # time the awaited call, not the creation of the coroutine
+                @functools.wraps(function)
+                async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> Any:
+                    with self.span(name, operation=function.__name__):
+                        return await function(*args, **kwargs)
+
+                return async_wrapper  # type: ignore[return-value]
+
+            @functools.wraps(function)
+            def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+                with self.span(name, operation=function.__name__):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                lines += [f"{PREFIX}{name}{_format_labels(labels)} {value}" for labels, value in series.items()]
+            for name, series in sorted(self.gauges.items()):
+                lines.append(f"# TYPE {PREFIX}{name} gauge")
+                lines += [f"{PREFIX}{name}{_format_labels(labels)} {value}" for labels, value in series.items()]
+            for name, hist_series in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for labels, histogram in hist_series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict[str, Any]:
+        """Get all metrics as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "counters": {name: [[dict(labels), value] for labels, value in series.items()] for name, series in self.counters.items()},
+                "gauges": {name: [[dict(labels), value] for labels, value in series.items()] for name, series in self.gauges.items()},
+                "histograms": {name: [[dict(labels), {"buckets": list(h.buckets), "counts": h.counts, "sum": h.sum, "count": h.count}] for labels, h in series.items()] for name, series in self.histograms.items()},
+            }
+
+    def save(self, path: Path = SNAPSHOT_PATH) -> None:
+        """Write a snapshot of all metrics to a JSON file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.snapshot()))
+
+    @classmethod
+    def load(cls, path: Path = SNAPSHOT_PATH) -> "MetricsRegistry":
+        """Read a registry from a snapshot file."""
+        registry = cls()
+        data = json.loads(path.read_text())
+        for name, series in data["counters"].items():
+            registry.counters[name] = {_labels(labels): value for labels, value in series}
+        for name, series in data["gauges"].items():
+            registry.gauges[name] = {_labels(labels): value for labels, value in series}
+        for name, series in data["histograms"].items():
+            registry.histograms[name] = {}
+            for labels, state in series:
+                histogram = Histogram(tuple(state["buckets"]))
+                histogram.counts, histogram.sum, histogram.count = state["counts"], state["sum"], state["count"]
+                registry.histograms[name][_labels(labels)] = histogram
+        return registry
+
+    def summary(self) -> list[dict[str, Any]]:
+        """Summarize every timed operation: calls, total and mean time, p50/p95 and throughput of its counters."""
+        rows = []
+        with self._lock:
+            for name, series in sorted(self.histograms.items()):
+                if not name.endswith("_seconds"):
+                    continue
+                span = name.removesuffix("_seconds")
+                for labels, histogram in sorted(series.items(), key=lambda item: -item[1].sum):
+                    counters = {counter.removeprefix(f"{span}_").removesuffix("_total"): values[labels] for counter, values in self.counters.items() if counter.startswith(f"{span}_") and labels in values}
+                    rows.append(
+                        {
+                            "span": span,
+                            "labels": dict(labels),
+                            "calls": histogram.count,
+                            "total_s": histogram.sum,
+                            "mean_ms": 1000 * histogram.sum / histogram.count if histogram.count else 0.0,
+                            "p50_ms": 1000 * histogram.quantile(0.5),
+                            "p95_ms": 1000 * histogram.quantile(0.95),
+                            "per_second": {counter: value / histogram.sum for counter, value in counters.items() if histogram.sum},
+                        }
+                    )
+        return rows
+
+
+REGISTRY = MetricsRegistry()
+
+# module level shortcuts to the default registry
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set
+observe = REGISTRY.observe
+span = REGISTRY.span
+timed = REGISTRY.timed
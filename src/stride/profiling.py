@@ -0,0 +1,196 @@
+import cProfile
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from enum import StrEnum
+from pathlib import Path
+from types import FrameType
+from typing import Any
+
+from loguru import logger
+
+
+class ProfileMode(StrEnum):
+    """Profiler used by `stride --profile`."""
+
+    CPROFILE = "cprofile"  # deterministic, writes a .prof file (snakeviz, flameprof, pstats)
+    SAMPLE = "sample"  # statistical, writes collapsed stacks (flamegraph.pl, speedscope)
+
+
+def _frame_label(frame: FrameType) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads at a fixed interval.
+
+    Cheap enough to leave on for a full sync, and unlike cProfile it keeps
+    whole call stacks, so the output can be drawn as a flamegraph.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stride-sampler", daemon=True)
+
+    def _sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._thread.ident:
+                continue
+            stack: list[str] = []
+            current: FrameType | None = frame
+            while current is not None:
+                stack.append(_frame_label(current))
+                current = current.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed(self, path: Path) -> None:
+        """Write the samples in the collapsed stack format ("frame;frame;frame count" per line)."""
+        path.write_text("".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()))
+
+
+class SQLTracer:
+    """Records every SQL statement SQLAlchemy executes, grouped by statement text.
+
+    Statements that only differ in their parameters end up in one group, so a
+    query issued once per activity (an N+1 pattern) shows up as one statement
+    with a high count.
+    """
+
+    def __init__(self) -> None:
+        self.counts: Counter[str] = Counter()
+        self.seconds: Counter[str] = Counter()
+        self.rows: Counter[str] = Counter()
+
+    @staticmethod
+    def normalize(statement: str) -> str:
+        """Collapse whitespace and variable length parameter lists, e.g. IN (?, ?, ?) -> IN (?, ...)."""
+        statement = re.sub(r"\s+", " ", statement).strip()
+        return re.sub(r"\?(?:, \?)+", "?, ...", statement)
+
+    def _before_cursor_execute(self, conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        conn.info.setdefault("trace_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        key = self.normalize(statement)
+        self.counts[key] += 1
+        self.seconds[key] += time.perf_counter() - conn.info["trace_start"].pop()
+        if cursor.rowcount > 0:
+            self.rows[key] += cursor.rowcount
+
+    def start(self) -> None:
+        import sqlalchemy
+
+        sqlalchemy.event.listen(sqlalchemy.Engine, "before_cursor_execute", self._before_cursor_execute)
+        sqlalchemy.event.listen(sqlalchemy.Engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def stop(self) -> None:
+        import sqlalchemy
+
+        sqlalchemy.event.remove(sqlalchemy.Engine, "before_cursor_execute", self._before_cursor_execute)
+        sqlalchemy.event.remove(sqlalchemy.Engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def statements(self) -> list[dict[str, Any]]:
+        """Get the statements, most executed first."""
+        return [{"statement": statement, "count": count, "total_s": self.seconds[statement], "rows": self.rows[statement]} for statement, count in self.counts.most_common()]
+
+    def repeated(self, min_count: int = 10) -> list[dict[str, Any]]:
+        """Get the SELECTs executed at least min_count times, likely issued per item in a loop."""
+        return [row for row in self.statements() if row["count"] >= min_count and row["statement"].upper().startswith("SELECT")]
+
+    def write(self, path: Path) -> None:
+        path.write_text(json.dumps(self.statements(), indent=2))
+
+
+class CommandProfiler:
+    """Profiles and traces one CLI command, started before and stopped after it runs.
+
+    Args:
+        name: Name of the command, used in the output file names
+        mode: Profiler to run, None for no profiling
+        trace: Record the SQL statements
+        output_dir: Directory the profile and trace are written to
+        interval: Sampling interval in seconds (sample mode)
+    """
+
+    def __init__(self, name: str, mode: ProfileMode | None = None, trace: bool = False, output_dir: Path = Path("profiles"), interval: float = 0.005):
+        self.name = name
+        self.mode = mode
+        self.output_dir = output_dir
+        self.prefix = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}"
+        self.cprofile = cProfile.Profile() if mode == ProfileMode.CPROFILE else None
+        self.sampler = SamplingProfiler(interval) if mode == ProfileMode.SAMPLE else None
+        self.tracer = SQLTracer() if trace else None
+        self.wall_time = 0.0
+        self._start = 0.0
+
+    def start(self) -> None:
+        self._start = time.perf_counter()
+        if self.tracer:
+            self.tracer.start()
+        if self.sampler:
+            self.sampler.start()
+        if self.cprofile:
+            self.cprofile.enable()
+
+    def stop(self) -> list[Path]:
+        """Stop profiling and write the output files.
+
+        Returns:
+            Paths of the written files
+        """
+        if self.cprofile:
+            self.cprofile.disable()
+        if self.sampler:
+            self.sampler.stop()
+        if self.tracer:
+            self.tracer.stop()
+        self.wall_time = time.perf_counter() - self._start
+
+        written = []
+        if self.cprofile or self.sampler or self.tracer:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.cprofile:
+            written.append(self.output_dir / f"{self.prefix}.prof")
+            self.cprofile.dump_stats(written[-1])
+        if self.sampler:
+            written.append(self.output_dir / f"{self.prefix}.folded")
+            self.sampler.write_collapsed(written[-1])
+        if self.tracer:
+            written.append(self.output_dir / f"{self.prefix}.sql.json")
+            self.tracer.write(written[-1])
+        for path in written:
+            logger.info(f"Wrote {path}")
+        return written
+
+
+if __name__ == "__main__":
+    # profile a small import of synthetic activities into a scratch database
+    from stride.bench import BenchContext
+
+    context = BenchContext(n_activities=5, duration_s=600, rounds=1)
+    profiler = CommandProfiler("example", ProfileMode.SAMPLE, trace=True, output_dir=context.workdir)
+    profiler.start()
+    db_service = context.new_db()
+    db_service.save_activities(context.convert(), verbose=False)
+    profiler.stop()
+    assert profiler.tracer is not None
+    for row in profiler.tracer.statements()[:5]:
+        print(row["count"], row["statement"][:100])
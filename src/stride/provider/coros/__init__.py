@@ -0,0 +1,5 @@
+from .main import CorosService
+
+__all__ = [
+    "CorosService",
+]
@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+from loguru import logger
+
+from stride.enums import Provider
+from stride.provider.files.fit import read_fit_file
+from stride.provider.files.models import ActivityFile
+
+FIT_SUFFIXES = {".fit"}
+
+
+def _read_coros_fit_file(path: Path) -> ActivityFile:
+    """Read a Coros FIT file, module level so it can run in worker processes."""
+    return read_fit_file(path, provider=Provider.COROS)
+
+
+class CorosService:
+    """Service for reading activities from a local Coros export (a directory of FIT files)."""
+
+    def __init__(self, export_dir: str | Path):
+        self.export_dir = Path(export_dir)
+
+    def list_activity_files(self) -> list[Path]:
+        """List the FIT files in the export directory, including subdirectories.
+
+        Returns:
+            Sorted list of paths.
+        """
+        return sorted(path for path in self.export_dir.rglob("*") if path.is_file() and path.suffix.lower() in FIT_SUFFIXES)
+
+    def get_activity(self, path: str | Path) -> ActivityFile:
+        """Read a single activity from a FIT file.
+
+        Args:
+            path: Path of the FIT file.
+
+        Returns:
+            ActivityFile object.
+        """
+        logger.debug(f"Reading Coros activity from {path}")
+        return _read_coros_fit_file(Path(path))
+
+    def iter_activities(
+        self,
+        paths: list[Path] | None = None,
+        max_workers: int | None = None,
+    ) -> Iterator[ActivityFile]:
+        """Read many activities, parsing files in parallel across cores.
+
+        Args:
+            paths: FIT files to read (default: every FIT file in the export directory).
+            max_workers: Number of worker processes (default: number of cores).
+
+        Yields:
+            ActivityFile objects, in the order of paths.
+        """
+        paths = self.list_activity_files() if paths is None else paths
+        max_workers = max_workers or os.cpu_count() or 1
+        logger.debug(f"Reading {len(paths)} Coros activities with {max_workers} workers")
+        if max_workers == 1 or len(paths) <= 1:
+            yield from (_read_coros_fit_file(path) for path in paths)
+            return
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            yield from executor.map(_read_coros_fit_file, paths, chunksize=max(1, len(paths) // (4 * max_workers)))
+
+    def get_activities(
+        self,
+        paths: list[Path] | None = None,
+        max_workers: int | None = None,
+    ) -> list[ActivityFile]:
+        """Read many activities, parsing files in parallel across cores.
+
+        Args:
+            paths: FIT files to read (default: every FIT file in the export directory).
+            max_workers: Number of worker processes (default: number of cores).
+
+        Returns:
+            List of ActivityFile objects, in the order of paths.
+        """
+        return list(self.iter_activities(paths, max_workers=max_workers))
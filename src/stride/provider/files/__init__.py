@@ -0,0 +1,16 @@
+from .models import ActivityFile
+from .fit import FitDecodeError, iter_fit_messages, read_fit_file
+from .gpx import read_gpx_file
+from .tcx import read_tcx_file
+from .reader import is_activity_file, read_activity_file
+
+__all__ = [
+    "ActivityFile",
+    "FitDecodeError",
+    "iter_fit_messages",
+    "read_fit_file",
+    "read_gpx_file",
+    "read_tcx_file",
+    "is_activity_file",
+    "read_activity_file",
+]
@@ -0,0 +1,82 @@
+import math
+from array import array
+
+from stride.enums import StreamType
+
+NAN = math.nan
+
+# column name -> stream type, for the columns that map one to one
+COLUMN_STREAM_TYPES = {
+    "altitude": StreamType.ALTITUDE,
+    "heartrate": StreamType.HEARTRATE,
+    "cadence": StreamType.CADENCE,
+    "distance": StreamType.DISTANCE,
+    "velocity_smooth": StreamType.VELOCITY_SMOOTH,
+    "watts": StreamType.WATTS,
+    "temp": StreamType.TEMP,
+}
+
+
+class ColumnBuffers:
+    """Aligned float64 columns, filled one sample at a time.
+
+    A column that is missing from a sample gets NaN, so all columns have the same
+    length. Columns are created on first use.
+    """
+
+    def __init__(self) -> None:
+        self.columns: dict[str, array[float]] = {}
+        self.n_rows = 0
+
+    def column(self, name: str) -> array[float]:
+        """Get a column padded up to the current row, ready for appending the current row's value."""
+        samples = self.columns.get(name)
+        if samples is None:
+            samples = self.columns[name] = array("d")
+        if len(samples) < self.n_rows:
+            samples.extend([NAN] * (self.n_rows - len(samples)))
+        return samples
+
+    def append_row(self, row: dict[str, float]) -> None:
+        """Append a sample given as {column: value}."""
+        for name, value in row.items():
+            self.column(name).append(value)
+        self.n_rows += 1
+
+    def to_streams(self) -> dict[StreamType, array[float]]:
+        """Convert the columns to streams.
+
+        Gaps are forward filled (leading gaps take the first valid value), columns
+        without any valid value are dropped, timestamps become seconds since the first
+        sample and lat/lng are interleaved into one latlng stream.
+        """
+        columns = {}
+        for name, samples in self.columns.items():
+            samples.extend([NAN] * (self.n_rows - len(samples)))
+            fill_gaps(samples)
+            if samples and not math.isnan(samples[0]):
+                columns[name] = samples
+
+        streams: dict[StreamType, array[float]] = {}
+        if "timestamp" in columns:
+            first_timestamp = columns["timestamp"][0]
+            streams[StreamType.TIME] = array("d", [value - first_timestamp for value in columns["timestamp"]])
+        if "lat" in columns and "lng" in columns:
+            latlng = array("d", bytes(16 * self.n_rows))
+            latlng[0::2] = columns["lat"]
+            latlng[1::2] = columns["lng"]
+            streams[StreamType.LATLNG] = latlng
+        for name, stream_type in COLUMN_STREAM_TYPES.items():
+            if name in columns:
+                streams[stream_type] = columns[name]
+        return streams
+
+
+def fill_gaps(samples: array[float]) -> None:
+    """Forward fill NaN samples in place, leading NaNs take the first valid sample."""
+    previous = next((value for value in samples if not math.isnan(value)), NAN)
+    for position, value in enumerate(samples):
+        if math.isnan(value):
+            samples[position] = previous
+        else:
+            previous = value
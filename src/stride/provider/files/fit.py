@@ -0,0 +1,265 @@
+import math
+import struct
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, NamedTuple
+
+from stride.enums import Provider, StreamType
+from stride.provider.files.columns import ColumnBuffers
+from stride.provider.files.models import ActivityFile
+
+FIT_EPOCH = datetime(1989, 12, 31, tzinfo=timezone.utc)
+SEMICIRCLES_TO_DEGREES = 180 / 2**31
+
+# global message numbers
+FILE_ID = 0
+SESSION = 18
+RECORD = 20
+
+# base type -> (struct format, invalid value)
+_BASE_TYPES: dict[int, tuple[str, Any]] = {
+    0x00: ("B", 0xFF),  # enum
+    0x01: ("b", 0x7F),  # sint8
+    0x02: ("B", 0xFF),  # uint8
+    0x83: ("h", 0x7FFF),  # sint16
+    0x84: ("H", 0xFFFF),  # uint16
+    0x85: ("i", 0x7FFFFFFF),  # sint32
+    0x86: ("I", 0xFFFFFFFF),  # uint32
+    0x88: ("f", None),  # float32
+    0x89: ("d", None),  # float64
+    0x0A: ("B", 0x00),  # uint8z
+    0x8B: ("H", 0x0000),  # uint16z
+    0x8C: ("I", 0x00000000),  # uint32z
+    0x0D: ("B", 0xFF),  # byte
+    0x8E: ("q", 0x7FFFFFFFFFFFFFFF),  # sint64
+    0x8F: ("Q", 0xFFFFFFFFFFFFFFFF),  # uint64
+    0x90: ("Q", 0),  # uint64z
+}
+
+# record field number -> (column, scale, offset, decimals)
+_RECORD_COLUMNS: dict[int, tuple[str, float, float, int]] = {
+    0: ("lat", 1 / SEMICIRCLES_TO_DEGREES, 0, 7),
+    1: ("lng", 1 / SEMICIRCLES_TO_DEGREES, 0, 7),
+    2: ("altitude", 5, 500, 1),
+    78: ("altitude", 5, 500, 1),  # enhanced_altitude
+    3: ("heartrate", 1, 0, 0),
+    4: ("cadence", 1, 0, 0),
+    5: ("distance", 100, 0, 2),
+    6: ("velocity_smooth", 1000, 0, 3),
+    73: ("velocity_smooth", 1000, 0, 3),  # enhanced_speed
+    7: ("watts", 1, 0, 0),
+    13: ("temp", 1, 0, 0),
+}
+
+# enhanced fields replace their 16 bit counterpart when both are recorded
+_ENHANCED_FIELDS = {78: 2, 73: 6}
+
+# FIT sport enum -> Strava activity type
+FIT_SPORTS = {
+    0: "Workout",
+    1: "Run",
+    2: "Ride",
+    4: "Workout",
+    5: "Swim",
+    10: "WeightTraining",
+    11: "Walk",
+    12: "NordicSki",
+    13: "AlpineSki",
+    14: "Snowboard",
+    15: "Rowing",
+    17: "Hike",
+}
+
+
+class FitDecodeError(ValueError):
+    """Raised when a FIT file is malformed or truncated."""
+
+
+class FitDefinition(NamedTuple):
+    """Layout of the data messages of one local message type."""
+
+    global_number: int
+    struct: struct.Struct
+    field_numbers: tuple[int, ...]
+    invalid_values: tuple[Any, ...]
+
+
+def _read(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise FitDecodeError("Unexpected end of FIT file")
+    return data
+
+
+def _read_definition(stream: BinaryIO, has_developer_fields: bool) -> tuple[FitDefinition, int]:
+    """Read a definition message, returns the definition and the number of bytes read."""
+    _, architecture, global_number_bytes, n_fields = struct.unpack("<BB2sB", _read(stream, 5))
+    endian = ">" if architecture == 1 else "<"
+    global_number = struct.unpack(endian + "H", global_number_bytes)[0]
+
+    formats = []
+    field_numbers = []
+    invalid_values = []
+    for field_number, field_size, base_type in struct.iter_unpack("<BBB", _read(stream, 3 * n_fields)):
+        base_format, invalid = _BASE_TYPES.get(base_type, ("B", None))
+        if struct.calcsize(base_format) == field_size:
+            formats.append(base_format)
+            invalid_values.append(invalid)
+        else:
+            # strings, arrays and unknown types are kept as raw bytes
+            formats.append(f"{field_size}s")
+            invalid_values.append(None)
+        field_numbers.append(field_number)
+
+    size = 5 + 3 * n_fields
+    if has_developer_fields:
+        (n_developer_fields,) = _read(stream, 1)
+        developer_size = sum(field_size for _, field_size, _ in struct.iter_unpack("<BBB", _read(stream, 3 * n_developer_fields)))
+        if developer_size:
+            formats.append(f"{developer_size}x")
+        size += 1 + 3 * n_developer_fields
+
+    return FitDefinition(global_number, struct.Struct(endian + "".join(formats)), tuple(field_numbers), tuple(invalid_values)), size
+
+
+def iter_fit_data(stream: BinaryIO) -> Iterator[tuple[FitDefinition, tuple[Any, ...], int | None]]:
+    """Decode a FIT file one data message at a time.
+
+    Only the current message is held in memory, so files with hundreds of
+    thousands of records are decoded with constant memory.
+
+    Args:
+        stream: Binary file object positioned at the start of the FIT file
+
+    Yields:
+        Tuple of the message definition, the unpacked field values (in definition
+        order, invalid values not replaced) and the current FIT timestamp
+    """
+    header_size = _read(stream, 1)[0]
+    header = _read(stream, header_size - 1)
+    data_size = struct.unpack_from("<I", header, 3)[0]
+    if header[7:11] != b".FIT":
+        raise FitDecodeError("Not a FIT file")
+
+    definitions: dict[int, FitDefinition] = {}
+    timestamp_positions: dict[int, int | None] = {}
+    timestamp: int | None = None
+    remaining = data_size
+
+    while remaining > 0:
+        record_header = _read(stream, 1)[0]
+
+        if record_header & 0x80:
+            # compressed timestamp header: 5 bit offset relative to the last full timestamp
+            local_type = (record_header >> 5) & 0x03
+            if timestamp is None:
+                raise FitDecodeError("Compressed timestamp before any full timestamp")
+            timestamp += ((record_header & 0x1F) - timestamp) & 0x1F
+            definition = definitions[local_type]
+            values = definition.struct.unpack(_read(stream, definition.struct.size))
+            yield definition, values, timestamp
+            remaining -= 1 + definition.struct.size
+
+        elif record_header & 0x40:
+            local_type = record_header & 0x0F
+            definition, size = _read_definition(stream, has_developer_fields=bool(record_header & 0x20))
+            definitions[local_type] = definition
+            timestamp_positions[local_type] = definition.field_numbers.index(253) if 253 in definition.field_numbers else None
+            remaining -= 1 + size
+
+        else:
+            local_type = record_header & 0x0F
+            if local_type not in definitions:
+                raise FitDecodeError(f"Data message for undefined local message type {local_type}")
+            definition = definitions[local_type]
+            values = definition.struct.unpack(_read(stream, definition.struct.size))
+            position = timestamp_positions[local_type]
+            if position is not None and values[position] != 0xFFFFFFFF:
+                timestamp = values[position]
+            yield definition, values, timestamp
+            remaining -= 1 + definition.struct.size
+
+
+def iter_fit_messages(stream: BinaryIO) -> Iterator[tuple[int, dict[int, Any]]]:
+    """Decode a FIT file into (global message number, {field number: value}) pairs.
+
+    Invalid values are returned as None. Convenient for inspecting files, use
+    read_fit_file to load activities.
+    """
+    for definition, values, timestamp in iter_fit_data(stream):
+        fields = {number: (None if value == invalid else value) for number, value, invalid in zip(definition.field_numbers, values, definition.invalid_values)}
+        if 253 not in fields and timestamp is not None:
+            fields[253] = timestamp
+        yield definition.global_number, fields
+
+
+def _record_plan(definition: FitDefinition) -> list[tuple[str, int, Any, float, float, int]]:
+    """Get (column, position, invalid, scale, offset, decimals) for the record fields we keep."""
+    replaced = {base for enhanced, base in _ENHANCED_FIELDS.items() if enhanced in definition.field_numbers}
+    plan = []
+    for position, (field_number, invalid) in enumerate(zip(definition.field_numbers, definition.invalid_values)):
+        if field_number not in _RECORD_COLUMNS or field_number in replaced:
+            continue
+        column, scale, offset, decimals = _RECORD_COLUMNS[field_number]
+        plan.append((column, position, invalid, scale, offset, decimals))
+    return plan
+
+
+def read_fit_file(source: str | Path | BinaryIO, provider: Provider = Provider.COROS) -> ActivityFile:
+    """Read an activity from a FIT file.
+
+    Record messages are decoded straight into columnar float64 buffers; summary
+    values come from the session message when present, and are derived from the
+    records otherwise.
+
+    Args:
+        source: Path or binary file object of the FIT file
+        provider: Provider the file was exported from
+
+    Returns:
+        Parsed activity file
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as stream:
+            return read_fit_file(stream, provider)
+
+    buffers = ColumnBuffers()
+    plans: dict[FitDefinition, list[tuple[str, int, Any, float, float, int]]] = {}
+    session: dict[int, Any] = {}
+    file_id: dict[int, Any] = {}
+    nan = math.nan
+
+    for definition, values, timestamp in iter_fit_data(source):
+        if definition.global_number == RECORD:
+            plan = plans.get(definition)
+            if plan is None:
+                plan = plans[definition] = _record_plan(definition)
+            for column, position, invalid, scale, offset, decimals in plan:
+                value = values[position]
+                buffers.column(column).append(nan if value == invalid else round(value / scale - offset, decimals))
+            buffers.column("timestamp").append(nan if timestamp is None else timestamp)
+            buffers.n_rows += 1
+        elif definition.global_number in (SESSION, FILE_ID):
+            fields = {number: value for number, value, invalid in zip(definition.field_numbers, values, definition.invalid_values) if value != invalid}
+            (session if definition.global_number == SESSION else file_id).update(fields)
+
+    timestamps = buffers.columns.get("timestamp")
+    first_timestamp = next((value for value in timestamps or [] if not math.isnan(value)), None)
+    streams = buffers.to_streams()
+
+    start_timestamp = session.get(2, file_id.get(4, first_timestamp))
+    elapsed_time = session[7] / 1000 if 7 in session else (streams[StreamType.TIME][-1] if StreamType.TIME in streams else 0)
+    distance = session[9] / 100 if 9 in session else (streams[StreamType.DISTANCE][-1] if StreamType.DISTANCE in streams else 0.0)
+    start_date = FIT_EPOCH + timedelta(seconds=start_timestamp) if start_timestamp is not None else None
+
+    return ActivityFile(
+        provider=provider,
+        # the creation time of the file identifies a recording of one device
+        provider_activity_id=int((FIT_EPOCH + timedelta(seconds=file_id.get(4, start_timestamp or 0))).timestamp()),
+        sport=FIT_SPORTS.get(session.get(5, -1)),
+        start_date=start_date,
+        distance=distance,
+        moving_time=round(session[8] / 1000 if 8 in session else elapsed_time),
+        elapsed_time=round(elapsed_time),
+        streams=streams,
+    )
@@ -0,0 +1,110 @@
+import math
+from array import array
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import BinaryIO
+
+from stride.enums import Provider, StreamType
+from stride.provider.files.columns import NAN, ColumnBuffers
+from stride.provider.files.models import ActivityFile
+
+EARTH_RADIUS_M = 6_371_000.0
+
+# extension element (local name) -> column, covers the Garmin TrackPointExtension and plain variants
+_EXTENSION_COLUMNS = {
+    "hr": "heartrate",
+    "heartrate": "heartrate",
+    "cad": "cadence",
+    "cadence": "cadence",
+    "atemp": "temp",
+    "temp": "temp",
+    "power": "watts",
+    "watts": "watts",
+}
+
+
+def local_name(tag: str) -> str:
+    """Strip the namespace of an XML tag."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_timestamp(value: str) -> float:
+    """Parse an ISO 8601 timestamp into seconds since epoch."""
+    return datetime.fromisoformat(value.strip()).timestamp()
+
+
+def add_distance_column(buffers: ColumnBuffers) -> None:
+    """Derive a cumulative distance column from lat/lng when the file has none."""
+    if "distance" in buffers.columns or "lat" not in buffers.columns or "lng" not in buffers.columns:
+        return
+    distance = buffers.columns["distance"] = array("d")
+    total = 0.0
+    previous: tuple[float, float] | None = None
+    for lat, lng in zip(buffers.columns["lat"], buffers.columns["lng"]):
+        if not math.isnan(lat) and not math.isnan(lng):
+            if previous is not None:
+                phi1, phi2 = math.radians(previous[0]), math.radians(lat)
+                a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng - previous[1]) / 2) ** 2
+                total += 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+            previous = (lat, lng)
+        distance.append(round(total, 1))
+
+
+def activity_file_from_buffers(buffers: ColumnBuffers, provider: Provider, provider_activity_id: int | None, sport: str | None) -> ActivityFile:
+    """Build an ActivityFile from the trackpoint columns of a GPX or TCX file."""
+    add_distance_column(buffers)
+    timestamps = buffers.columns.get("timestamp")
+    first_timestamp = next((value for value in timestamps or [] if not math.isnan(value)), None)
+    streams = buffers.to_streams()
+    elapsed_time = streams[StreamType.TIME][-1] if StreamType.TIME in streams else 0
+    return ActivityFile(
+        provider=provider,
+        provider_activity_id=provider_activity_id if provider_activity_id is not None else int(first_timestamp or 0),
+        sport=sport,
+        start_date=datetime.fromtimestamp(first_timestamp, tz=timezone.utc) if first_timestamp is not None else None,
+        distance=streams[StreamType.DISTANCE][-1] if StreamType.DISTANCE in streams else 0.0,
+        moving_time=round(elapsed_time),
+        elapsed_time=round(elapsed_time),
+        streams=streams,
+    )
+
+
+def read_gpx_file(source: str | Path | BinaryIO, provider: Provider = Provider.STRAVA, provider_activity_id: int | None = None) -> ActivityFile:
+    """Read an activity from a GPX file.
+
+    The file is parsed incrementally, every trackpoint is appended to the column
+    buffers and dropped from the element tree right away.
+
+    Args:
+        source: Path or binary file object of the GPX file
+        provider: Provider the file was exported from
+        provider_activity_id: ID of the activity at the provider (default: start time)
+
+    Returns:
+        Parsed activity file
+    """
+    buffers = ColumnBuffers()
+    sport = None
+    for _, element in ElementTree.iterparse(source, events=("end",)):
+        name = local_name(element.tag)
+        if name == "trkpt":
+            row = {"lat": float(element.get("lat", NAN)), "lng": float(element.get("lon", NAN))}
+            for child in element.iter():
+                child_name = local_name(child.tag)
+                if child.text is None or child is element:
+                    continue
+                if child_name == "ele":
+                    row["altitude"] = float(child.text)
+                elif child_name == "time":
+                    row["timestamp"] = parse_timestamp(child.text)
+                elif child_name in _EXTENSION_COLUMNS and child.text.strip():
+                    row[_EXTENSION_COLUMNS[child_name]] = float(child.text)
+            buffers.append_row(row)
+            element.clear()
+        elif name == "type" and sport is None and element.text:
+            sport = element.text.strip()
+        elif name == "trkseg":
+            element.clear()
+
+    return activity_file_from_buffers(buffers, provider, provider_activity_id, sport)
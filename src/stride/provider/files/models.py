@@ -0,0 +1,33 @@
+from array import array
+from datetime import datetime
+
+import pydantic
+
+from stride.enums import Provider, StreamType
+
+
+class ActivityFile(pydantic.BaseModel):
+    """Activity parsed from a recording file (FIT, GPX, TCX).
+
+    Samples are kept in columnar float64 buffers, one per stream type, so large
+    files never turn into one Python object per sample. Latlng is interleaved
+    as [lat, lng, lat, lng, ...].
+    """
+
+    model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
+
+    provider: Provider
+    provider_activity_id: int
+    sport: str | None = None
+    start_date: datetime | None = None
+    distance: float = 0.0  # in meters
+    moving_time: int = 0  # in seconds
+    elapsed_time: int = 0  # in seconds
+    streams: dict[StreamType, array[float]] = pydantic.Field(default_factory=dict)
+
+    @property
+    def sample_count(self) -> int:
+        """Number of samples in the time stream (or the longest stream)."""
+        if StreamType.TIME in self.streams:
+            return len(self.streams[StreamType.TIME])
+        return max((len(samples) for samples in self.streams.values()), default=0)
@@ -0,0 +1,46 @@
+import gzip
+import io
+
+from stride.enums import Provider
+from stride.provider.files.fit import read_fit_file
+from stride.provider.files.gpx import read_gpx_file
+from stride.provider.files.models import ActivityFile
+from stride.provider.files.tcx import read_tcx_file
+
+ACTIVITY_FILE_SUFFIXES = (".fit", ".gpx", ".tcx")
+
+
+def is_activity_file(filename: str) -> bool:
+    """Check if a file name is a (possibly gzipped) FIT, GPX or TCX file."""
+    name = filename.lower().removesuffix(".gz")
+    return name.endswith(ACTIVITY_FILE_SUFFIXES)
+
+
+def read_activity_file(data: bytes, filename: str, provider: Provider, provider_activity_id: int | None = None) -> ActivityFile:
+    """Read an activity from the contents of a FIT, GPX or TCX file, gzipped or not.
+
+    Args:
+        data: Contents of the file
+        filename: Name of the file, selects the format
+        provider: Provider the file was exported from
+        provider_activity_id: ID of the activity at the provider (default: derived from the file)
+
+    Returns:
+        Parsed activity file
+    """
+    name = filename.lower()
+    if name.endswith(".gz"):
+        data = gzip.decompress(data)
+        name = name.removesuffix(".gz")
+
+    if name.endswith(".fit"):
+        activity_file = read_fit_file(io.BytesIO(data), provider=provider)
+        if provider_activity_id is not None:
+            activity_file.provider_activity_id = provider_activity_id
+        return activity_file
+    # exports sometimes have whitespace before the XML declaration
+    if name.endswith(".gpx"):
+        return read_gpx_file(io.BytesIO(data.lstrip()), provider=provider, provider_activity_id=provider_activity_id)
+    if name.endswith(".tcx"):
+        return read_tcx_file(io.BytesIO(data.lstrip()), provider=provider, provider_activity_id=provider_activity_id)
+    raise ValueError(f"Unsupported activity file: {filename}")
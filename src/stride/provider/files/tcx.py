@@ -0,0 +1,70 @@
+from pathlib import Path
+from typing import BinaryIO
+import xml.etree.ElementTree as ElementTree
+
+from stride.enums import Provider
+from stride.provider.files.columns import ColumnBuffers
+from stride.provider.files.gpx import activity_file_from_buffers, local_name, parse_timestamp
+from stride.provider.files.models import ActivityFile
+
+# TCX sport attribute -> Strava activity type
+TCX_SPORTS = {
+    "Running": "Run",
+    "Biking": "Ride",
+    "Other": "Workout",
+}
+
+# trackpoint element (local name) -> column
+_TRACKPOINT_COLUMNS = {
+    "LatitudeDegrees": "lat",
+    "LongitudeDegrees": "lng",
+    "AltitudeMeters": "altitude",
+    "DistanceMeters": "distance",
+    "Cadence": "cadence",
+    "RunCadence": "cadence",
+    "Speed": "velocity_smooth",
+    "Watts": "watts",
+}
+
+
+def read_tcx_file(source: str | Path | BinaryIO, provider: Provider = Provider.STRAVA, provider_activity_id: int | None = None) -> ActivityFile:
+    """Read an activity from a TCX file.
+
+    The file is parsed incrementally, every trackpoint is appended to the column
+    buffers and dropped from the element tree right away.
+
+    Args:
+        source: Path or binary file object of the TCX file
+        provider: Provider the file was exported from
+        provider_activity_id: ID of the activity at the provider (default: start time)
+
+    Returns:
+        Parsed activity file
+    """
+    buffers = ColumnBuffers()
+    sport = None
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        name = local_name(element.tag)
+        if event == "start":
+            if name == "Activity" and sport is None:
+                sport = TCX_SPORTS.get(element.get("Sport", ""), element.get("Sport"))
+            continue
+
+        if name == "Trackpoint":
+            row = {}
+            for child in element.iter():
+                child_name = local_name(child.tag)
+                if child.text is None or not child.text.strip():
+                    continue
+                if child_name == "Time":
+                    row["timestamp"] = parse_timestamp(child.text)
+                elif child_name in _TRACKPOINT_COLUMNS:
+                    row[_TRACKPOINT_COLUMNS[child_name]] = float(child.text)
+                elif child_name == "Value" and "heartrate" not in row:  # HeartRateBpm/Value
+                    row["heartrate"] = float(child.text)
+            buffers.append_row(row)
+            element.clear()
+        elif name == "Track":
+            element.clear()
+
+    return activity_file_from_buffers(buffers, provider, provider_activity_id, sport)
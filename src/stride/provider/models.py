@@ -0,0 +1,102 @@
+from array import array
+from datetime import datetime
+from typing import Iterable, Mapping
+
+import pydantic
+
+from stride.enums import Provider, StreamType
+
+
+class RawStreamColumn(pydantic.BaseModel):
+    """Samples of one stream type for all activities of a batch.
+
+    The samples of all activities are concatenated into one float64 buffer, activity i
+    owns values[offsets[i]:offsets[i + 1]]. An activity without the stream has an
+    empty slice. Latlng is interleaved as [lat, lng, lat, lng, ...].
+    """
+
+    model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
+
+    values: array[float] = pydantic.Field(default_factory=lambda: array("d"))
+    offsets: array[int] = pydantic.Field(default_factory=lambda: array("q", [0]))
+
+    def slice(self, index: int) -> array[float]:
+        """Get the samples of one activity."""
+        return self.values[self.offsets[index] : self.offsets[index + 1]]
+
+
+class RawActivityBatch(pydantic.BaseModel):
+    """Provider-neutral, columnar batch of activities and their streams.
+
+    Every provider response (Strava API, FIT/GPX/TCX files, ...) is collected into
+    this type, so converters handle thousands of activities per call and samples
+    never become one Python object each.
+    """
+
+    model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
+
+    provider: Provider
+    provider_activity_ids: array[int] = pydantic.Field(default_factory=lambda: array("q"))
+    distances: array[float] = pydantic.Field(default_factory=lambda: array("d"))  # in meters
+    moving_times: array[int] = pydantic.Field(default_factory=lambda: array("q"))  # in seconds
+    elapsed_times: array[int] = pydantic.Field(default_factory=lambda: array("q"))  # in seconds
+    start_dates: list[datetime | None] = pydantic.Field(default_factory=list)
+    sports: list[str | None] = pydantic.Field(default_factory=list)
+    athlete_ids: list[int | None] = pydantic.Field(default_factory=list)
+    streams: dict[StreamType, RawStreamColumn] = pydantic.Field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.provider_activity_ids)
+
+    def append(
+        self,
+        provider_activity_id: int,
+        distance: float = 0.0,
+        moving_time: int = 0,
+        elapsed_time: int = 0,
+        start_date: datetime | None = None,
+        sport: str | None = None,
+        athlete_id: int | None = None,
+        streams: Mapping[StreamType, Iterable[float]] | None = None,
+    ) -> None:
+        """Append one activity to the batch.
+
+        Args:
+            provider_activity_id: ID of the activity at the provider
+            distance: Distance in meters
+            moving_time: Moving time in seconds
+            elapsed_time: Elapsed time in seconds
+            start_date: Start of the activity
+            sport: Activity type, e.g. "Run"
+            athlete_id: ID of the athlete at the provider
+            streams: Samples per stream type (latlng interleaved)
+        """
+        streams = streams or {}
+        for stream_type in streams:
+            if stream_type not in self.streams:
+                # activities appended before this stream type showed up get empty slices
+                self.streams[stream_type] = RawStreamColumn(offsets=array("q", [0] * (len(self) + 1)))
+        for stream_type, column in self.streams.items():
+            column.values.extend(streams.get(stream_type, ()))
+            column.offsets.append(len(column.values))
+
+        self.provider_activity_ids.append(provider_activity_id)
+        self.distances.append(distance)
+        self.moving_times.append(moving_time)
+        self.elapsed_times.append(elapsed_time)
+        self.start_dates.append(start_date)
+        self.sports.append(sport)
+        self.athlete_ids.append(athlete_id)
+
+    def activity_streams(self, index: int) -> dict[StreamType, array[float]]:
+        """Get the non-empty streams of one activity."""
+        streams = {}
+        for stream_type, column in self.streams.items():
+            if column.offsets[index + 1] > column.offsets[index]:
+                streams[stream_type] = column.slice(index)
+        return streams
+
+    @property
+    def sample_count(self) -> int:
+        """Total number of samples over all streams."""
+        return sum(len(column.values) for column in self.streams.values())
@@ -6,7 +6,7 @@ from typing import Optional, Any
 from loguru import logger
 
 from stride.config import get_strava_config
-from stride.connections.strava import StravaEndpoint
+from stride.provider.strava.endpoints import StravaEndpoints as StravaEndpoint
 
 import requests  # type: ignore
 
@@ -169,20 +169,21 @@ def get_strava_activity_stream_by_type(activity_id: int, stream_type: StreamType
 
 
 def get_strava_activity_streams(activity_id: int, stream_types: list[StreamType] | None = None) -> list[Stream]:
-    """Get all streams for a specific Strava activity by ID."""
-    streams = []
-    for stream_type in stream_types or StreamType:
-        try:
-            stream = get_strava_activity_stream_by_type(activity_id, stream_type)
-            streams.append(stream)
-        except (ValueError, KeyError) as e:
-            logger.warning(f"Failed to retrieve {stream_type.value} stream for activity {activity_id}: {str(e)[:100]}...")
-    return streams
+    """Get the streams of a specific Strava activity by ID in a single request.
+
+    Streams the activity did not record are left out by Strava. The default is every
+    type except latlng, whose coordinate pairs do not fit Stream.
+    """
+    stream_types = stream_types or [stream_type for stream_type in StreamType if stream_type != StreamType.LATLNG]
+    url = StravaEndpoint.ACTIVITY_STREAMS.value.format(activity_id=activity_id)
+    params = {"keys": ",".join(stream_type.value for stream_type in stream_types), "key_by_type": "true"}
+    response = _strava_request(url, params).json()
+    # Strava also returns the distance stream as the series of the others, even if it was not requested
+    return [StreamTypeToStream[StreamType(key)](type=key, data=stream["data"]) for key, stream in response.items() if StreamType(key) in stream_types]
 
 
 def get_strava_activity_series(activity_id: int, stream_types: list[StreamType] | None = None) -> pl.DataFrame:
     """Get all streams for a specific Strava activity by ID."""
-    stream_types = stream_types or StreamType
     streams = get_strava_activity_streams(activity_id, stream_types)
 
     # Convert streams to a DataFrame
@@ -0,0 +1,98 @@
+import csv
+import io
+import zipfile
+from pathlib import Path
+
+import pydantic
+from loguru import logger
+
+from stride.provider.files.reader import is_activity_file
+
+ACTIVITIES_CSV = "activities.csv"
+
+
+class StravaArchiveEntry(pydantic.BaseModel):
+    """Activity listed in the activities.csv of a Strava bulk export."""
+
+    activity_id: int
+    name: str | None = None
+    activity_type: str | None = None
+    filename: str | None = None  # path of the recording inside the archive, None for manual activities
+    checksum: str | None = None  # CRC32 and size of the recording, as stored in the zip directory
+
+
+class StravaArchive:
+    """Reader for a Strava bulk export archive (a zip of activities.csv and the recordings).
+
+    Members are read from the zip one at a time, nothing is extracted to disk.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(self.path)
+
+    def __enter__(self) -> "StravaArchive":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the archive."""
+        self._zip.close()
+
+    def _find_member(self, name: str) -> zipfile.ZipInfo | None:
+        """Find a member by name, exports are sometimes wrapped in a top level directory."""
+        for info in self._zip.infolist():
+            if info.filename == name or info.filename.endswith("/" + name):
+                return info
+        return None
+
+    def entries(self) -> list[StravaArchiveEntry]:
+        """List the activities of the archive.
+
+        Returns:
+            List of StravaArchiveEntry objects, in the order of activities.csv.
+        """
+        csv_info = self._find_member(ACTIVITIES_CSV)
+        if csv_info is None:
+            raise ValueError(f"{self.path} has no {ACTIVITIES_CSV}, is it a Strava export?")
+
+        prefix = csv_info.filename.removesuffix(ACTIVITIES_CSV)
+        members = {info.filename: info for info in self._zip.infolist()}
+        with self._zip.open(csv_info) as raw:
+            reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8-sig"))
+            header = next(reader)
+            # some columns (e.g. Distance) appear twice, the first one is the summary value
+            columns = {name: header.index(name) for name in header}
+            entries = []
+            for row in reader:
+                if not row:
+                    continue
+                filename = row[columns["Filename"]] if "Filename" in columns and row[columns["Filename"]] else None
+                info = members.get(prefix + filename) if filename else None
+                if filename and info is None:
+                    logger.warning(f"Activity {row[columns['Activity ID']]} references {filename}, which is not in the archive")
+                entries.append(
+                    StravaArchiveEntry(
+                        activity_id=int(row[columns["Activity ID"]]),
+                        name=row[columns["Activity Name"]] if "Activity Name" in columns else None,
+                        activity_type=row[columns["Activity Type"]] if "Activity Type" in columns else None,
+                        filename=info.filename if info is not None and is_activity_file(info.filename) else None,
+                        checksum=f"{info.CRC:08x}-{info.file_size}" if info is not None else None,
+                    )
+                )
+        return entries
+
+    def read(self, entry: StravaArchiveEntry) -> bytes:
+        """Read the (possibly gzipped) recording of an activity.
+
+        Args:
+            entry: Activity with a recording
+
+        Returns:
+            Contents of the recording
+        """
+        if entry.filename is None:
+            raise ValueError(f"Activity {entry.activity_id} has no recording in the archive")
+        return self._zip.read(entry.filename)
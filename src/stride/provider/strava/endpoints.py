@@ -1,5 +1,7 @@
 import enum
 
+STRAVA_API_BASE_URL = "https://www.strava.com/api/v3"
+
 
 class StravaEndpoints(str, enum.Enum):
     TOKEN = "https://www.strava.com/oauth/token"
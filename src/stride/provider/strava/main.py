@@ -1,26 +1,80 @@
+import re
 import requests
 import datetime
 from loguru import logger
-from typing import Any
+from typing import Any, Sequence
+from urllib.parse import urlparse
+from stride import metrics
 from stride.config import get_strava_config
 from stride.constants import DAYS_IN_MONTH, MAX_ACTIVITIES_PER_DAY
 
-from stride.provider.strava.endpoints import StravaEndpoints
+from stride.provider.strava.endpoints import STRAVA_API_BASE_URL, StravaEndpoints
 from stride.provider.strava.models import (
     StravaActivityResponseModel,
-    StravaJSONStreamDataResponseModel,
     StravaJSONStreamResponseModel,
+    StravaRateLimit,
     StravaStreamType,
 )
+from stride.provider.strava.streams import DEFAULT_STREAMS
 
 strava_config = get_strava_config()
 
+# Strava reports its rate limits as "<15 minute>,<daily>" in these headers
+RATE_LIMIT_HEADERS = {
+    "X-RateLimit-Limit": ("strava_rate_limit", "overall"),
+    "X-RateLimit-Usage": ("strava_rate_limit_usage", "overall"),
+    "X-ReadRateLimit-Limit": ("strava_rate_limit", "read"),
+    "X-ReadRateLimit-Usage": ("strava_rate_limit_usage", "read"),
+}
+
+
+def _endpoint_label(url: str) -> str:
+    """Path of a URL with IDs replaced, so requests for different activities share a label."""
+    return re.sub(r"/\d+", "/{id}", urlparse(url).path)
+
+
+def _record_rate_limits(response: requests.Response) -> dict[str, StravaRateLimit]:
+    """Record the rate limit headers of a response as gauges.
+
+    Returns:
+        Rate limit and usage per scope found in the headers
+    """
+    limits: dict[str, dict[str, int]] = {}
+    for header, (gauge, scope) in RATE_LIMIT_HEADERS.items():
+        value = response.headers.get(header)
+        if not value:
+            continue
+        kind = "limit" if gauge == "strava_rate_limit" else "usage"
+        for window, number in zip(("15min", "daily"), value.split(",")):
+            metrics.set_gauge(gauge, float(number), scope=scope, window=window)
+            limits.setdefault(scope, {})[f"{kind}_{window}"] = int(number)
+    return {scope: StravaRateLimit(**fields) for scope, fields in limits.items()}
+
 
 class StravaService:
     """Service for interacting with the Strava API."""
 
-    def __init__(self):
+    def __init__(self, base_url: str | None = None) -> None:
+        """Create a Strava API client.
+
+        Args:
+            base_url: Base URL of the API to use instead of Strava's, e.g. a local mock server
+        """
         self.config = get_strava_config()
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.rate_limits: dict[str, StravaRateLimit] = {}  # per scope, from the last response
+
+    def remaining_requests(self) -> int | None:
+        """Requests left before a rate limit is hit according to the last response, None if unknown or unlimited."""
+        remaining = [limit.remaining for limit in self.rate_limits.values() if limit.remaining is not None]
+        return min(remaining) if remaining else None
+
+    def _endpoint_url(self, endpoint: StravaEndpoints, **params: Any) -> str:
+        """Get the URL of an endpoint, on the configured base URL."""
+        url = endpoint.value.format(**params)
+        if self.base_url is not None:
+            url = url.replace(STRAVA_API_BASE_URL, self.base_url, 1)
+        return url
 
     def _generic_request(
         self,
@@ -41,8 +95,12 @@ class StravaService:
         params = params or {}
         logger.debug(f"Making request to {url} with params {params}")
         headers = {"Authorization": self.config.get_bearer_token()}
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
+        with metrics.span("http_request", endpoint=_endpoint_label(url)) as span:
+            response = requests.get(url, headers=headers, params=params)
+            span.set(status=response.status_code)
+            span.add("bytes", len(response.content))
+            self.rate_limits.update(_record_rate_limits(response))
+            response.raise_for_status()
         return response
 
     def _split_date_range(
@@ -92,7 +150,7 @@ class StravaService:
         Returns:
             List of StravaActivityResponseModel objects.
         """
-        url = StravaEndpoints.ATHLETE_ACTIVITIES.value
+        url = self._endpoint_url(StravaEndpoints.ATHLETE_ACTIVITIES)
         params = {
             "per_page": per_page,
             "page": page,
@@ -144,7 +202,7 @@ class StravaService:
         Returns:
             StravaActivityResponseModel object.
         """
-        url = StravaEndpoints.ACTIVITY.value.format(activity_id=activity_id)
+        url = self._endpoint_url(StravaEndpoints.ACTIVITY, activity_id=activity_id)
         response = self._generic_request(url)
         return StravaActivityResponseModel(**response.json())
 
@@ -171,7 +229,7 @@ class StravaService:
         self,
         activity_id: int,
         stream_type: StravaStreamType,
-    ) -> StravaJSONStreamDataResponseModel:
+    ) -> StravaJSONStreamResponseModel:
         """Get a specific stream for a Strava activity by type.
 
         Args:
@@ -179,34 +237,30 @@ class StravaService:
             stream_type: The type of stream to get.
 
         Returns:
-            StravaJSONStreamDataResponseModel object.
+            StravaJSONStreamResponseModel with the stream.
         """
         logger.debug(f"Getting {stream_type.value} stream for activity {activity_id}")
-        url = StravaEndpoints.ACTIVITY_STREAMS_BY_TYPE.value.format(activity_id=activity_id, stream_type=stream_type.value)
+        url = self._endpoint_url(StravaEndpoints.ACTIVITY_STREAMS_BY_TYPE, activity_id=activity_id, stream_type=stream_type.value)
         stream_response = StravaJSONStreamResponseModel(streams=self._generic_request(url).json())
         return stream_response
 
-    def get_streams(
-        self,
-        activity_id: int,
-        stream_types: list[StravaStreamType] = [
-            StravaStreamType.HEARTRATE,
-            StravaStreamType.DISTANCE,
-            StravaStreamType.TIME,
-            StravaStreamType.VELOCITY_SMOOTH,
-        ],
-    ) -> list[StravaJSONStreamDataResponseModel]:
-        """Get all streams for a Strava activity.
+    def get_streams(self, activity_id: int, stream_types: Sequence[StravaStreamType] | None = None) -> StravaJSONStreamResponseModel:
+        """Get streams of a Strava activity in a single request.
+
+        Strava leaves out requested streams the activity did not record, use plan_streams()
+        to request only the streams an activity has and needs.
 
         Args:
-        activity_id: The ID of the activity to get streams for.
-        stream_types: The types of streams to get.
+            activity_id: The ID of the activity to get streams for.
+            stream_types: The types of streams to get (default: DEFAULT_STREAMS), no request is made if empty.
 
         Returns:
-            List of StravaJSONStreamDataResponseModel objects.
+            StravaJSONStreamResponseModel with the streams found.
         """
-        logger.debug(f"Getting all streams for activity {activity_id}")
-        return sum(
-            [self.get_stream(activity_id, stream_type) for stream_type in stream_types],
-            start=StravaJSONStreamResponseModel(streams=[]),
-        )
+        stream_types = DEFAULT_STREAMS if stream_types is None else stream_types
+        if not stream_types:
+            return StravaJSONStreamResponseModel(streams=[])
+        logger.debug(f"Getting {len(stream_types)} streams for activity {activity_id}")
+        url = self._endpoint_url(StravaEndpoints.ACTIVITY_STREAMS, activity_id=activity_id)
+        params = {"keys": ",".join(stream_type.value for stream_type in stream_types), "key_by_type": "true"}
+        return StravaJSONStreamResponseModel.model_validate(self._generic_request(url, params).json())
@@ -6,6 +6,7 @@ from pydantic import ConfigDict, model_validator, Field
 from typing import Any
 
 StravaStreamDataType = float
+StravaCoordinateType = tuple[float, float]
 
 
 class StravaStreamType(enum.StrEnum):
@@ -34,6 +35,27 @@ class StravaAccessTokenResponse(sqlmodel.SQLModel, table=False):
     expires_in: int
 
 
+class StravaRateLimit(sqlmodel.SQLModel, table=False):
+    """Rate limit of one scope (overall or read) and its usage, as reported by the last response (0: no limit)."""
+
+    limit_15min: int = 0
+    usage_15min: int = 0
+    limit_daily: int = 0
+    usage_daily: int = 0
+
+    @property
+    def remaining(self) -> int | None:
+        """Requests left before the first limit is hit, None if there is no limit."""
+        remaining = [limit - usage for limit, usage in ((self.limit_15min, self.usage_15min), (self.limit_daily, self.usage_daily)) if limit]
+        return max(min(remaining), 0) if remaining else None
+
+
+class StravaMetaAthlete(sqlmodel.SQLModel, table=False):
+    """Athlete reference embedded in activity responses."""
+
+    id: int
+
+
 class StravaActivityResponseModel(sqlmodel.SQLModel, table=False):
     """Model representing a Strava activity."""
 
@@ -67,13 +89,21 @@ class StravaActivityResponseModel(sqlmodel.SQLModel, table=False):
     device_watts: bool | None = None
     average_temp: float | None = None
     suffer_score: int | None = None
+    athlete: StravaMetaAthlete | None = None
+    manual: bool = False  # entered by hand, without any streams
+    start_latlng: list[float] | None = None  # empty for activities recorded without GPS
+
+    @property
+    def has_gps(self) -> bool:
+        """Whether the activity has a GPS track, assumed when the summary does not say."""
+        return not self.manual and self.start_latlng != []
 
 
 class StravaJSONStreamDataResponseModel(sqlmodel.SQLModel, table=False):
     """Model for parsing individual stream data from Strava API JSON."""
 
     stream_type: StravaStreamType = Field(alias="type")
-    stream_data: list[float] = Field(alias="data")  # Keep as list[float] for JSON parsing
+    stream_data: list[float] | list[StravaCoordinateType] = Field(alias="data")  # [[lat, lng], ...] for latlng streams
 
     def __rich_repr__(self) -> rich.repr.Result:
         yield "stream_type", self.stream_type.value
@@ -92,6 +122,10 @@ class StravaJSONStreamResponseModel(sqlmodel.SQLModel, table=False):
         if isinstance(data, dict) and "streams" in data:
             return data
 
+        # key_by_type=true responses are keyed by stream type instead of listing typed streams
+        if isinstance(data, dict) and "type" not in data:
+            return {"streams": [{"type": stream_type, **stream} for stream_type, stream in data.items()]}
+
         # Convert single dict to list if necessary
         streams = [data] if isinstance(data, dict) else data
         return {"streams": streams}
@@ -103,3 +137,30 @@ class StravaJSONStreamResponseModel(sqlmodel.SQLModel, table=False):
     def __add__(self, other: "StravaJSONStreamResponseModel") -> "StravaJSONStreamResponseModel":
         """Add two StravaJSONStreamResponseModel objects together."""
         return StravaJSONStreamResponseModel(streams=([stream for stream in self.streams if stream not in other.streams] + other.streams))
+
+
+class StravaWebhookObjectType(enum.StrEnum):
+    """Object types of Strava webhook events."""
+
+    ACTIVITY = "activity"
+    ATHLETE = "athlete"
+
+
+class StravaWebhookAspectType(enum.StrEnum):
+    """Aspect types of Strava webhook events."""
+
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class StravaWebhookEvent(sqlmodel.SQLModel, table=False):
+    """Event pushed by a Strava webhook subscription."""
+
+    object_type: StravaWebhookObjectType
+    object_id: int
+    aspect_type: StravaWebhookAspectType
+    owner_id: int
+    subscription_id: int
+    event_time: int  # unix timestamp
+    updates: dict[str, Any] = Field(default_factory=dict)  # e.g. {"title": ..., "type": ...} for updates
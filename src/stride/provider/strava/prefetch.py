@@ -0,0 +1,155 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Mapping, Sequence
+
+from loguru import logger
+
+from stride import metrics
+from stride.provider.strava.main import StravaService
+from stride.provider.strava.models import StravaJSONStreamResponseModel, StravaStreamType
+
+# bounds of the number of activities whose streams are fetched ahead
+MIN_DEPTH = 1
+MAX_DEPTH = 16
+
+# requests left to everything else (listing pages, webhooks), prefetching never uses them
+RATE_LIMIT_RESERVE = 20
+
+# weight of a new measurement in the moving averages of fetch and processing time
+SMOOTHING = 0.3
+
+
+class StreamPrefetcher:
+    """Fetches the streams of upcoming activities in the background while the current one is processed.
+
+    The number of activities fetched ahead (K) follows from the measured times: with a
+    fetch taking L seconds and processing an activity P seconds, K = ceil(L / P) + 1
+    fetches in flight keep the network busy without the queue running dry. K is capped
+    by the rate limit budget left according to the last response (minus a reserve),
+    counted in requests per fetch, so prefetching never spends the quota on its own.
+
+    Args:
+        strava_service: Client whose rate limit headers are watched
+        fetch: Gets the given streams of an activity (default: strava_service.get_streams)
+        requests_per_fetch: API requests one fetch makes, for the budget
+        min_depth: Lowest K (while there is budget)
+        max_depth: Highest K, also the number of fetch threads
+        reserve: Requests of the rate limit left to other callers
+    """
+
+    def __init__(
+        self,
+        strava_service: StravaService,
+        fetch: Callable[[int, Sequence[StravaStreamType] | None], StravaJSONStreamResponseModel] | None = None,
+        requests_per_fetch: int = 1,
+        min_depth: int = MIN_DEPTH,
+        max_depth: int = MAX_DEPTH,
+        reserve: int = RATE_LIMIT_RESERVE,
+    ):
+        self.strava_service = strava_service
+        self.fetch = fetch or strava_service.get_streams
+        self.requests_per_fetch = requests_per_fetch
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.reserve = reserve
+        self.executor = ThreadPoolExecutor(max_depth, thread_name_prefix="stream-prefetch")
+        self._upcoming: list[int] = []
+        self._stream_types: dict[int, Sequence[StravaStreamType]] = {}
+        self._futures: OrderedDict[int, Future[StravaJSONStreamResponseModel]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.fetch_seconds: float | None = None
+        self.process_seconds: float | None = None
+
+    def _average(self, current: float | None, value: float) -> float:
+        return value if current is None else (1 - SMOOTHING) * current + SMOOTHING * value
+
+    def _timed_fetch(self, activity_id: int, stream_types: Sequence[StravaStreamType] | None) -> StravaJSONStreamResponseModel:
+        start = time.perf_counter()
+        streams = self.fetch(activity_id, stream_types)
+        with self._lock:
+            self.fetch_seconds = self._average(self.fetch_seconds, time.perf_counter() - start)
+        return streams
+
+    def record_processing(self, seconds: float) -> None:
+        """Report the time spent converting and saving an activity, the time prefetches have to hide."""
+        with self._lock:
+            self.process_seconds = self._average(self.process_seconds, seconds)
+
+    def depth(self) -> int:
+        """Number of activities to fetch ahead, from the measured times and the remaining rate limit budget."""
+        if self.fetch_seconds is None or not self.process_seconds:
+            depth = self.min_depth
+        else:
+            depth = math.ceil(self.fetch_seconds / self.process_seconds) + 1
+        depth = min(max(depth, self.min_depth), self.max_depth)
+
+        remaining = self.strava_service.remaining_requests()
+        if remaining is not None:
+            # fetches in flight are not counted in the usage of the last response yet
+            depth = min(depth, max((remaining - self.reserve) // self.requests_per_fetch, 0))
+        return depth
+
+    def schedule(self, activity_ids: list[int], stream_types: Mapping[int, Sequence[StravaStreamType]] | None = None) -> None:
+        """Set the activities that will be processed next, in order, and start fetching ahead.
+
+        Args:
+            activity_ids: Activities in processing order
+            stream_types: Streams to fetch per activity, e.g. from plan_streams() (default: the fetch's default)
+        """
+        with self._lock:
+            self._upcoming = list(activity_ids)
+            self._stream_types = dict(stream_types or {})
+            stale = [activity_id for activity_id in self._futures if activity_id not in self._upcoming]
+            for activity_id in stale:
+                self._futures.pop(activity_id).cancel()
+        self._top_up()
+
+    def _top_up(self) -> None:
+        depth = self.depth()
+        metrics.set_gauge("stream_prefetch_depth", depth)
+        with self._lock:
+            for activity_id in self._upcoming:
+                if len(self._futures) >= depth:
+                    break
+                if activity_id not in self._futures:
+                    self._futures[activity_id] = self.executor.submit(self._timed_fetch, activity_id, self._stream_types.get(activity_id))
+
+    def get(self, activity_id: int, stream_types: Sequence[StravaStreamType] | None = None) -> StravaJSONStreamResponseModel:
+        """Get the streams of an activity, from its prefetch if it was started, then prefetch further ahead.
+
+        The streams of a prefetch are the ones scheduled, stream_types is only used when the activity was not prefetched.
+        Raises the error of the fetch, e.g. requests.HTTPError when rate limited.
+        """
+        with self._lock:
+            if activity_id in self._upcoming:
+                self._upcoming.remove(activity_id)
+            future = self._futures.pop(activity_id, None)
+        metrics.inc("stream_prefetch_total", result="hit" if future is not None else "miss")
+        self._top_up()
+        if future is None:
+            return self._timed_fetch(activity_id, stream_types)
+        return future.result()
+
+    def discard(self, activity_id: int) -> None:
+        """Drop an activity that will not be processed (e.g. it is saved already), its fetch is cancelled if it did not start."""
+        with self._lock:
+            if activity_id in self._upcoming:
+                self._upcoming.remove(activity_id)
+            future = self._futures.pop(activity_id, None)
+        if future is not None:
+            future.cancel()
+
+    def cancel(self) -> None:
+        """Drop all upcoming activities, e.g. after a rate limit error."""
+        with self._lock:
+            futures, self._futures, self._upcoming = list(self._futures.values()), OrderedDict(), []
+        for future in futures:
+            future.cancel()
+
+    def close(self) -> None:
+        self.cancel()
+        self.executor.shutdown(wait=True)
+        logger.debug(f"Stream prefetcher closed, fetch {self.fetch_seconds}s, processing {self.process_seconds}s")
@@ -0,0 +1,61 @@
+from stride.provider.strava.models import StravaActivityResponseModel, StravaStreamType
+
+# streams of a sport without an entry in SPORT_STREAMS, what the converter needs for any activity
+DEFAULT_STREAMS: tuple[StravaStreamType, ...] = (
+    StravaStreamType.TIME,
+    StravaStreamType.DISTANCE,
+    StravaStreamType.VELOCITY_SMOOTH,
+    StravaStreamType.HEARTRATE,
+)
+
+# streams that only exist for activities recorded with GPS
+GPS_STREAMS = frozenset({StravaStreamType.LATLNG, StravaStreamType.ALTITUDE, StravaStreamType.GRADE_SMOOTH})
+
+# streams worth fetching per Strava sport type, streams the activity did not record are dropped by plan_streams
+SPORT_STREAMS: dict[str, tuple[StravaStreamType, ...]] = {
+    "Run": DEFAULT_STREAMS + (StravaStreamType.CADENCE, StravaStreamType.LATLNG, StravaStreamType.ALTITUDE),
+    "TrailRun": DEFAULT_STREAMS + (StravaStreamType.CADENCE, StravaStreamType.LATLNG, StravaStreamType.ALTITUDE, StravaStreamType.GRADE_SMOOTH),
+    "Walk": DEFAULT_STREAMS + (StravaStreamType.LATLNG, StravaStreamType.ALTITUDE),
+    "Hike": DEFAULT_STREAMS + (StravaStreamType.LATLNG, StravaStreamType.ALTITUDE, StravaStreamType.GRADE_SMOOTH),
+    "Ride": DEFAULT_STREAMS + (StravaStreamType.WATTS, StravaStreamType.CADENCE, StravaStreamType.LATLNG, StravaStreamType.ALTITUDE),
+    "GravelRide": DEFAULT_STREAMS + (StravaStreamType.WATTS, StravaStreamType.CADENCE, StravaStreamType.LATLNG, StravaStreamType.ALTITUDE),
+    "MountainBikeRide": DEFAULT_STREAMS + (StravaStreamType.WATTS, StravaStreamType.CADENCE, StravaStreamType.LATLNG, StravaStreamType.ALTITUDE),
+    "VirtualRide": DEFAULT_STREAMS + (StravaStreamType.WATTS, StravaStreamType.CADENCE),
+    "VirtualRun": DEFAULT_STREAMS + (StravaStreamType.CADENCE,),
+    "Swim": (StravaStreamType.TIME, StravaStreamType.DISTANCE, StravaStreamType.HEARTRATE),
+    "WeightTraining": (StravaStreamType.TIME, StravaStreamType.HEARTRATE),
+    "Workout": (StravaStreamType.TIME, StravaStreamType.HEARTRATE),
+    "Yoga": (StravaStreamType.TIME, StravaStreamType.HEARTRATE),
+}
+
+
+def plan_streams(activity: StravaActivityResponseModel, sport_streams: dict[str, tuple[StravaStreamType, ...]] | None = None) -> list[StravaStreamType]:
+    """Get the streams to fetch for an activity, the streams its sport needs minus the ones it cannot have.
+
+    Manual activities have no streams at all, activities without a GPS track have no
+    position, altitude or grade, and sensor streams (heartrate, power, cadence,
+    temperature) are only fetched when the summary shows the sensor was recording.
+
+    Args:
+        activity: Summary of the activity
+        sport_streams: Streams per sport type (default: SPORT_STREAMS)
+
+    Returns:
+        Stream types to request, empty if the activity has no streams
+    """
+    if activity.manual:
+        return []
+    wanted = (sport_streams if sport_streams is not None else SPORT_STREAMS).get(activity.type, DEFAULT_STREAMS)
+    missing: set[StravaStreamType] = set()
+    if not activity.has_gps:
+        missing |= GPS_STREAMS
+    if not activity.has_heartrate:
+        missing.add(StravaStreamType.HEARTRATE)
+    if not activity.device_watts:
+        # without a power meter Strava only has an estimate, which is not worth a stream
+        missing.add(StravaStreamType.WATTS)
+    if activity.average_cadence is None:
+        missing.add(StravaStreamType.CADENCE)
+    if activity.average_temp is None:
+        missing.add(StravaStreamType.TEMP)
+    return [stream_type for stream_type in wanted if stream_type not in missing]
@@ -1,10 +1,12 @@
-from stride.stridedb.models import Activity, Stream, StreamEntry, StreamType, Provider
+from stride.stridedb.models import Activity, ProviderActivityLink, Stream, StreamEntry, StreamType, Provider
 from stride.stridedb.converters import ConverterFactory
 from stride.stridedb.database import create_database, StrideDBService
+from stride.stridedb.async_database import AsyncStrideDBService
 
 __all__ = [
     # Models
     "Activity",
+    "ProviderActivityLink",
     "Stream",
     "StreamEntry",
     "StreamType",
@@ -14,4 +16,5 @@ __all__ = [
     # Database
     "create_database",
     "StrideDBService",
+    "AsyncStrideDBService",
 ]
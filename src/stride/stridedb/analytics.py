@@ -0,0 +1,252 @@
+import importlib
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Iterable
+
+import polars as pl
+import pydantic
+import sqlalchemy
+import sqlmodel
+from loguru import logger
+from sqlalchemy.dialects.sqlite import insert
+
+from stride import metrics
+from stride.enums import StreamType
+from stride.stridedb.codecs import decode_stream
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.models import Activity, ActivityMetric, Stream, StreamEntry
+from stride.stridedb.training import ZONE_FIELDS, trimp
+
+MetricValue = float | dict[str, float | None] | None
+
+# function of an activity's streams, one column per stream type (latlng as lat and lng), one row per sample
+MetricFunction = Callable[[pl.DataFrame], MetricValue]
+
+BEST_EFFORT_DISTANCES = {"1k": 1000.0, "5k": 5000.0, "10k": 10000.0}
+
+
+def hr_zones(frame: pl.DataFrame) -> MetricValue:
+    """Seconds spent per heartrate zone."""
+    if "heartrate" not in frame.columns or frame["heartrate"].null_count() == len(frame):
+        return None
+    time = frame["time"].to_list() if "time" in frame.columns else None
+    _, zones = trimp(frame["heartrate"].fill_null(0.0).to_list(), time)
+    return dict(zip((field.removesuffix("_s") for field in ZONE_FIELDS), zones))
+
+
+def best_efforts(frame: pl.DataFrame) -> MetricValue:
+    """Fastest time in seconds over 1, 5 and 10 km, None for distances not covered."""
+    if "distance" not in frame.columns or "time" not in frame.columns:
+        return None
+    samples = frame.select("distance", "time").drop_nulls()
+    distance, time = samples["distance"].to_list(), samples["time"].to_list()
+    efforts: dict[str, float | None] = {}
+    for name, target in BEST_EFFORT_DISTANCES.items():
+        best = None
+        start = 0
+        for end in range(len(distance)):
+            # shortest window ending here that still covers the target distance
+            while start < end and distance[end] - distance[start + 1] >= target:
+                start += 1
+            if distance[end] - distance[start] >= target and (best is None or time[end] - time[start] < best):
+                best = time[end] - time[start]
+        efforts[name] = best
+    return efforts
+
+
+def decoupling(frame: pl.DataFrame) -> MetricValue:
+    """Aerobic decoupling: drop of speed per heartbeat from the first to the second half (0.05 = 5%)."""
+    if "heartrate" not in frame.columns or "velocity_smooth" not in frame.columns:
+        return None
+    samples = frame.select("velocity_smooth", "heartrate").drop_nulls().filter(pl.col("heartrate") > 0)
+    if len(samples) < 2:
+        return None
+    half = len(samples) // 2
+    first, second = samples[:half], samples[half:]
+    efficiency: list[float] = [part["velocity_smooth"].mean() / part["heartrate"].mean() for part in (first, second)]  # type: ignore[operator, misc]
+    return (efficiency[0] - efficiency[1]) / efficiency[0] if efficiency[0] else None
+
+
+BUILTIN_METRICS: dict[str, MetricFunction] = {
+    "hr_zones": hr_zones,
+    "best_efforts": best_efforts,
+    "decoupling": decoupling,
+}
+
+
+def resolve_metric(name: str) -> MetricFunction:
+    """Get a built-in metric by name, or a custom one as "package.module:function"."""
+    if name in BUILTIN_METRICS:
+        return BUILTIN_METRICS[name]
+    if ":" not in name:
+        raise ValueError(f"Unknown metric {name}, choose from {sorted(BUILTIN_METRICS)} or pass module:function")
+    module, attribute = name.split(":", 1)
+    return getattr(importlib.import_module(module), attribute)  # type: ignore[no-any-return]
+
+
+def stream_frame(streams: dict[str, list[float]]) -> pl.DataFrame:
+    """Build the frame of an activity from its decoded streams, shorter streams are padded with nulls."""
+    n_samples = max((len(values) for values in streams.values()), default=0)
+    return pl.DataFrame({name: values + [None] * (n_samples - len(values)) for name, values in streams.items()}, schema={name: pl.Float64 for name in streams})
+
+
+class WorkerStats(pydantic.BaseModel):
+    """Work done by one worker process."""
+
+    pid: int
+    activities: int = 0
+    seconds: float = 0.0
+
+    @property
+    def activities_per_second(self) -> float:
+        return self.activities / self.seconds if self.seconds else 0.0
+
+
+class BatchReport(pydantic.BaseModel):
+    """Result of a batch run."""
+
+    metric: str
+    activities: int = 0
+    skipped: int = 0  # computed by a previous run
+    failed: int = 0
+    seconds: float = 0.0
+    workers: list[WorkerStats] = pydantic.Field(default_factory=list)
+
+    @property
+    def activities_per_second(self) -> float:
+        return self.activities / self.seconds if self.seconds else 0.0
+
+
+# engine of a worker process, created once by _init_worker
+_worker_engine: sqlalchemy.Engine | None = None
+
+
+def _init_worker(url: str) -> None:
+    global _worker_engine
+    _worker_engine = sqlmodel.create_engine(url)
+
+
+def _compute_chunk(activity_ids: list[int], function: MetricFunction) -> tuple[int, float, list[tuple[int, MetricValue]], list[int]]:
+    """Read the streams of some activities straight from the database and apply a metric, in a worker process.
+
+    Returns:
+        pid, seconds, (activity id, value) of the computed activities and the ids of the failed ones
+    """
+    assert _worker_engine is not None, "worker not initialized"
+    start = time.perf_counter()
+    streams: dict[int, dict[str, list[float]]] = {activity_id: {} for activity_id in activity_ids}
+    with sqlmodel.Session(_worker_engine) as session:
+        statement = sqlmodel.select(Stream.id, Stream.activity_id, Stream.stream_type, Stream.payload).where(Stream.activity_id.in_(activity_ids))  # type: ignore[union-attr]
+        for stream_id, activity_id, stream_name, payload in session.exec(statement).all():
+            if activity_id is None:
+                continue
+            stream_type = StreamType(stream_name)
+            if payload is None:
+                legacy = sqlmodel.select(StreamEntry.stream_entry).where(StreamEntry.stream_id == stream_id).order_by(sqlmodel.col(StreamEntry.index))
+                values = list(session.exec(legacy))
+            else:
+                values = decode_stream(payload)
+            if stream_type == StreamType.LATLNG:
+                streams[activity_id]["lat"], streams[activity_id]["lng"] = values[0::2], values[1::2]
+            else:
+                streams[activity_id][stream_type.value] = values
+
+    results, failed = [], []
+    for activity_id in activity_ids:
+        try:
+            results.append((activity_id, function(stream_frame(streams[activity_id]))))
+        except Exception as e:
+            logger.warning(f"Metric failed for activity {activity_id}: {e}")
+            failed.append(activity_id)
+    return os.getpid(), time.perf_counter() - start, results, failed
+
+
+class BatchRunner:
+    """Computes a metric for many stored activities on all cores and writes the results back in bulk.
+
+    Activity ids are split into chunks that worker processes handle on their own: each
+    worker opens its own connection and reads and decodes the stream payloads itself, so
+    only ids go to the workers and only the (small) results come back. Results are
+    upserted into ActivityMetric per chunk, activities that already have the metric are
+    skipped, so an interrupted run resumes where it stopped.
+
+    Args:
+        db_service: Database with the activities, must be a file database the workers can open
+        max_workers: Number of worker processes (default: one per core)
+        chunk_size: Number of activities per task
+    """
+
+    def __init__(self, db_service: StrideDBService, max_workers: int | None = None, chunk_size: int = 50):
+        self.db_service = db_service
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def pending_activity_ids(self, metric: str, activity_ids: Iterable[int] | None = None, recompute: bool = False) -> tuple[list[int], int]:
+        """Get the activities the metric still has to be computed for, and the number skipped."""
+        with sqlmodel.Session(self.db_service.engine) as session:
+            candidates = list(activity_ids) if activity_ids is not None else list(session.exec(sqlmodel.select(Activity.id).order_by(sqlmodel.col(Activity.id))))
+            if recompute:
+                return candidates, 0
+            done = set(session.exec(sqlmodel.select(ActivityMetric.activity_id).where(ActivityMetric.name == metric)))
+        pending = [activity_id for activity_id in candidates if activity_id not in done]
+        return pending, len(candidates) - len(pending)
+
+    def _write(self, metric: str, results: list[tuple[int, MetricValue]]) -> None:
+        """Upsert the results of a chunk, a metric returning several values gets a row per key plus a marker row."""
+        computed_at = datetime.now(timezone.utc)
+        rows = []
+        for activity_id, value in results:
+            rows.append({"activity_id": activity_id, "name": metric, "value": value if isinstance(value, (int, float)) else None, "computed_at": computed_at})
+            if isinstance(value, dict):
+                rows += [{"activity_id": activity_id, "name": f"{metric}.{key}", "value": item, "computed_at": computed_at} for key, item in value.items()]
+        if not rows:
+            return
+        statement = insert(ActivityMetric).values(rows)
+        statement = statement.on_conflict_do_update(index_elements=["activity_id", "name"], set_={"value": statement.excluded.value, "computed_at": statement.excluded.computed_at})
+        with sqlmodel.Session(self.db_service.engine) as session:
+            session.execute(statement)
+            session.commit()
+
+    def run(self, metric: str, function: MetricFunction | None = None, activity_ids: Iterable[int] | None = None, recompute: bool = False) -> BatchReport:
+        """Compute a metric for all (or some) activities.
+
+        Args:
+            metric: Name the results are stored under, a built-in metric or "module:function"
+            function: Function of an activity's stream frame (default: resolved from the name), must be importable by the workers
+            activity_ids: Only these activities (default: all)
+            recompute: Also recompute activities that already have the metric
+
+        Returns:
+            Counts, duration and per-worker throughput
+        """
+        function = function or resolve_metric(metric)
+        pending, skipped = self.pending_activity_ids(metric, activity_ids, recompute)
+        report = BatchReport(metric=metric, skipped=skipped)
+        workers: dict[int, WorkerStats] = {}
+        chunks = [pending[start : start + self.chunk_size] for start in range(0, len(pending), self.chunk_size)]
+        logger.info(f"Computing {metric} for {len(pending)} activities in {len(chunks)} chunks on {self.max_workers} workers ({skipped} already computed)")
+
+        start = time.perf_counter()
+        url = self.db_service.engine.url.render_as_string(hide_password=False)
+        with metrics.span("batch_metric", metric=metric) as span, ProcessPoolExecutor(self.max_workers, initializer=_init_worker, initargs=(url,)) as executor:
+            in_flight: deque[Future[tuple[int, float, list[tuple[int, MetricValue]], list[int]]]] = deque()
+            queue = deque(chunks)
+            while queue or in_flight:
+                # keep a few chunks per worker queued so results are written while others compute
+                while queue and len(in_flight) < 2 * self.max_workers:
+                    in_flight.append(executor.submit(_compute_chunk, queue.popleft(), function))
+                pid, seconds, results, failed = in_flight.popleft().result()
+                self._write(metric, results)
+                stats = workers.setdefault(pid, WorkerStats(pid=pid))
+                stats.activities += len(results)
+                stats.seconds += seconds
+                report.activities += len(results)
+                report.failed += len(failed)
+            span.add("activities", report.activities)
+        report.seconds = time.perf_counter() - start
+        report.workers = sorted(workers.values(), key=lambda stats: stats.pid)
+        logger.info(f"Computed {metric} for {report.activities} activities in {report.seconds:.1f}s ({report.activities_per_second:.0f}/s), {report.failed} failed")
+        return report
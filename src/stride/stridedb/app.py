@@ -1,8 +1,138 @@
-from fastapi import FastAPI
+import secrets
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
-app = FastAPI()
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+
+from stride import metrics
+from stride.config import get_strava_config
+from stride.enums import ActivityProjection, StreamType
+from stride.provider.strava.models import StravaWebhookEvent
+from stride.stridedb.async_database import AsyncStrideDBService
+from stride.stridedb.database import StrideDBService, create_database
+from stride.stridedb.models import Activity
+from stride.stridedb.downsampling import MIN_DOWNSAMPLE_POINTS, DownsampledStream, DownsampleMethod
+from stride.stridedb.cache import CacheStats
+from stride.stridedb.webhooks import WebhookQueue, WebhookWorker
+
+API_CACHE_BYTES = 128 * 1024 * 1024
+
+# the API reads the same recent activities over and over
+db_service = StrideDBService(cache_bytes=API_CACHE_BYTES)
+# activity reads are awaited on pooled connections instead of blocking a threadpool thread,
+# the cache is shared so writes of the webhook worker invalidate what the async reads cached
+async_db_service = AsyncStrideDBService(cache=db_service.cache)
+webhook_queue = WebhookQueue(db_service.engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Create the database schema if needed and run the webhook worker next to the API."""
+    create_database(db_service.prod)
+    app.state.webhook_worker = WebhookWorker(db_service)
+    app.state.webhook_worker.start()
+    yield
+    app.state.webhook_worker.stop()
+    await async_db_service.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):  # type: ignore[no-untyped-def]
+    """Time every API request, labelled with its route template."""
+    with metrics.span("api_request", method=request.method) as span:
+        response: Response = await call_next(request)
+        route = request.scope.get("route")
+        span.set(route=getattr(route, "path", "unmatched"), status=response.status_code)
+    return response
 
 
 @app.get("/")
 def read_root():
     return {"message": "Hello, World!"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics() -> str:
+    """Expose the metrics registry in the Prometheus text format."""
+    return metrics.REGISTRY.render_prometheus()
+
+
+@app.get("/cache/stats")
+def get_cache_stats() -> CacheStats | None:
+    """Hit rate and size of the activity cache."""
+    return db_service.cache.stats() if db_service.cache is not None else None
+
+
+@app.get("/activities")
+async def get_activities(limit: int = Query(100, le=1000), offset: int = 0) -> list[Activity]:
+    """Get the summaries of stored activities, without reading any samples."""
+    return await async_db_service.get_activities(limit=limit, offset=offset, projection=ActivityProjection.STREAM_TYPES)
+
+
+@app.get("/activities/{activity_id}")
+async def get_activity(activity_id: int) -> Activity:
+    """Get the summary of an activity."""
+    try:
+        return await async_db_service.get_activity(activity_id, projection=ActivityProjection.STREAM_TYPES)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/activities/{activity_id}/streams/downsampled")
+def get_downsampled_streams(
+    activity_id: int,
+    points: int = Query(800, ge=MIN_DOWNSAMPLE_POINTS),
+    method: DownsampleMethod = DownsampleMethod.LTTB,
+) -> list[DownsampledStream]:
+    """Get all streams of an activity reduced to `points` representative points each."""
+    try:
+        return db_service.get_downsampled_streams(activity_id, n_points=points, method=method)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/activities/{activity_id}/streams/{stream_type}/downsampled")
+def get_downsampled_stream(
+    activity_id: int,
+    stream_type: StreamType,
+    points: int = Query(800, ge=MIN_DOWNSAMPLE_POINTS),
+    method: DownsampleMethod = DownsampleMethod.LTTB,
+    start: int | None = Query(None, ge=0),
+    end: int | None = Query(None, ge=1),
+) -> DownsampledStream:
+    """Get a stream reduced to `points` representative points, optionally zoomed into [start, end)."""
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=422, detail=f"start ({start}) must be before end ({end})")
+    try:
+        return db_service.get_downsampled_stream(activity_id, stream_type, n_points=points, method=method, start=start, end=end)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/webhooks/strava")
+def validate_strava_subscription(
+    mode: str = Query(alias="hub.mode"),
+    verify_token: str = Query(alias="hub.verify_token"),
+    challenge: str = Query(alias="hub.challenge"),
+) -> dict[str, str]:
+    """Validate a Strava webhook subscription by echoing the challenge."""
+    expected_token = get_strava_config().webhook_verify_token
+    if expected_token is None:
+        raise HTTPException(status_code=503, detail="STRAVA_WEBHOOK_VERIFY_TOKEN is not set, refusing subscription validation")
+    if mode != "subscribe" or not secrets.compare_digest(verify_token, expected_token):
+        raise HTTPException(status_code=403, detail="Invalid verify token")
+    return {"hub.challenge": challenge}
+
+
+@app.post("/webhooks/strava")
+def receive_strava_event(event: StravaWebhookEvent) -> dict[str, str]:
+    """Queue a Strava webhook event, Strava expects an answer within 2 seconds so processing happens in the worker."""
+    if webhook_queue.enqueue(event):
+        worker: WebhookWorker | None = getattr(app.state, "webhook_worker", None)
+        if worker is not None:
+            worker.notify()
+    return {"status": "ok"}
@@ -0,0 +1,208 @@
+import asyncio
+from typing import Any, Sequence
+
+import sqlalchemy
+import sqlmodel
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from stride import metrics
+from stride.enums import ActivityProjection, Provider, StreamType
+from stride.stridedb.cache import ActivityCache, activity_key, activity_size
+from stride.stridedb.database import activity_load_options, get_sqlite_url, insert_activity, replace_activity
+from stride.stridedb.models import Activity, ProviderActivityLink
+from stride.stridedb.streamstore import StreamStore
+
+# connections kept open by the pool, and extra ones opened under load
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_OVERFLOW = 20
+
+# seconds a connection waits for the write lock of another one before failing
+SQLITE_BUSY_TIMEOUT_S = 30.0
+
+
+def to_async_url(url: str) -> str:
+    """Use the asyncio driver for a SQLite URL, e.g. sqlite:///stride.db -> sqlite+aiosqlite:///stride.db."""
+    return url.replace("sqlite://", "sqlite+aiosqlite://", 1) if url.startswith("sqlite://") else url
+
+
+def _enable_wal(dbapi_connection: Any, connection_record: Any) -> None:
+    """Switch a new SQLite connection to write-ahead logging, so reads do not wait for a writer (and the writer not for reads)."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+class AsyncStrideDBService:
+    """Service for interacting with the stridedb from asyncio code, e.g. the API.
+
+    Queries run on pooled aiosqlite connections, so a handler awaiting the database
+    does not block the event loop (or a threadpool thread) and one API worker can
+    serve many requests at once. SQLite connections use write-ahead logging, so the
+    pooled reads keep going while a save is writing. Writes reuse the indexing code
+    of StrideDBService inside the async session (run_sync), so both services store
+    the same rows.
+
+    Args:
+        prod: Use the prod database instead of the dev database
+        url: SQLAlchemy URL of another database (overrides prod), sqlite:// URLs get the aiosqlite driver
+        cache_bytes: Memory budget of the in-process cache of activities (0: no cache)
+        cache: Cache to share with a StrideDBService writing to the same database (overrides cache_bytes)
+        stream_store: Memory-mapped copy of the streams, kept up to date by saves
+        pool_size: Number of connections kept open
+        max_overflow: Number of extra connections opened under load
+    """
+
+    def __init__(
+        self,
+        prod: bool = False,
+        url: str | None = None,
+        cache_bytes: int = 0,
+        cache: ActivityCache | None = None,
+        stream_store: StreamStore | None = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_overflow: int = DEFAULT_MAX_OVERFLOW,
+    ):
+        self.prod = prod
+        self.engine: AsyncEngine = create_async_engine(
+            to_async_url(url or get_sqlite_url(prod)),
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_pre_ping=True,
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT_S},
+        )
+        if self.engine.dialect.name == "sqlite":
+            sqlalchemy.event.listen(self.engine.sync_engine, "connect", _enable_wal)
+        self.cache = cache if cache is not None else ActivityCache(cache_bytes) if cache_bytes > 0 else None
+        self.stream_store = stream_store
+
+    def session(self) -> AsyncSession:
+        # keep loaded activities usable after the session is closed, lazy loads are not possible in async code
+        return AsyncSession(self.engine, expire_on_commit=False)
+
+    async def dispose(self) -> None:
+        """Close all pooled connections."""
+        await self.engine.dispose()
+
+    def _invalidate(self, activity_id: int | None) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(activity_id)
+
+    async def resolve_activity_id(self, provider_activity_id: int, provider: Provider) -> int | None:
+        """Get the stride activity ID a provider activity ID is linked to."""
+        async with self.session() as session:
+            link = await session.get(ProviderActivityLink, (provider, provider_activity_id))
+            return link.activity_id if link is not None else None
+
+    @metrics.timed("db_operation")
+    async def get_activity(self, id: int, projection: ActivityProjection = ActivityProjection.FULL, stream_types: Sequence[StreamType] | None = None) -> Activity:
+        """Get an activity by ID.
+
+        With a cache, repeated reads of an activity are served from memory (per projection and
+        stream filter), the returned activity is then shared with other readers and must not be modified.
+
+        Args:
+            id: ID of the activity
+            projection: Part of the activity to load, e.g. SUMMARY for its columns only
+            stream_types: Only load streams of these types (default: all)
+
+        Returns:
+            Activity from the database if found, raises an error otherwise
+        """
+        key = activity_key(id, projection, stream_types)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached  # type: ignore[no-any-return]
+
+        async with self.session() as session:
+            statement = sqlmodel.select(Activity).options(*activity_load_options(projection, stream_types)).where(Activity.id == id)
+            activity = (await session.exec(statement)).first()
+
+        if activity is None:
+            raise ValueError(f"Activity {id} not found in the database")
+        if self.cache is not None:
+            self.cache.put(key, activity, activity_size(activity))
+        return activity
+
+    @metrics.timed("db_operation")
+    async def get_activities(self, limit: int = 100, offset: int = 0, projection: ActivityProjection = ActivityProjection.FULL, stream_types: Sequence[StreamType] | None = None) -> list[Activity]:
+        """Get activities from the database.
+
+        Args:
+            limit: Maximum number of activities to return
+            offset: Number of activities to skip, for pages
+            projection: Part of the activities to load
+            stream_types: Only load streams of these types (default: all)
+
+        Returns:
+            List of activities, ordered by ID
+        """
+        async with self.session() as session:
+            statement = sqlmodel.select(Activity).options(*activity_load_options(projection, stream_types)).order_by(Activity.id).offset(offset).limit(limit)  # type: ignore[arg-type]
+            return list(await session.exec(statement))
+
+    @metrics.timed("db_operation")
+    async def save_activity(self, activity: Activity, update: bool = False, verbose: bool = True, deduplicate: bool = True) -> Activity:
+        """Save an activity and its streams to the database, like StrideDBService.save_activity.
+
+        An update replaces the stored activity in a single transaction, keeping its ID and
+        the links of other providers.
+
+        Args:
+            activity: Activity to save
+            update: Whether to update the activity if it already exists
+            verbose: Whether to print debug messages
+            deduplicate: Whether to link activities that duplicate a stored activity instead of saving them
+
+        Returns:
+            Saved activity with updated IDs
+        """
+        activity_id = await self.resolve_activity_id(activity.provider_activity_id, activity.provider)
+        if activity_id is not None and not update:
+            if verbose:
+                logger.warning(f"Activity {activity.provider_activity_id} already exists in the database, skipping. (set update=True to update)")
+            return activity
+
+        async with self.session() as session:
+            if activity_id is None:
+                saved = await session.run_sync(insert_activity, activity, deduplicate, verbose)  # type: ignore[arg-type]  # run_sync passes the sqlmodel Session
+            else:
+                if verbose:
+                    logger.debug(f"Updating activity {activity_id} in stridedb")
+                saved = await session.run_sync(replace_activity, activity_id, activity)  # type: ignore[arg-type]  # run_sync passes the sqlmodel Session
+            await session.commit()
+        self._invalidate(saved.id)
+        # a linked duplicate is already in the stream store, appending is a local file write, not worth a thread hop
+        if self.stream_store is not None and saved is activity:
+            self.stream_store.append_activity(saved)
+        return saved
+
+
+async def _load_check(url: str, n_requests: int = 500, concurrency: int = 50) -> None:
+    """Read random activities with many concurrent tasks and log the throughput."""
+    import random
+    import time
+
+    service = AsyncStrideDBService(url=url)
+    async with service.session() as session:
+        ids = list(await session.exec(sqlmodel.select(Activity.id)))
+    if not ids:
+        logger.warning("No activities to read")
+        return
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def read(activity_id: int) -> None:
+        async with semaphore:
+            await service.get_activity(activity_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(read(random.choice(ids)) for _ in range(n_requests)))
+    seconds = time.perf_counter() - start
+    logger.info(f"{n_requests} reads with {concurrency} concurrent tasks in {seconds:.2f}s ({n_requests / seconds:.0f}/s)")
+    await service.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_load_check(get_sqlite_url()))
@@ -0,0 +1,122 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Sequence
+
+import pydantic
+
+from stride import metrics
+from stride.enums import ActivityProjection, StreamType
+from stride.stridedb.models import Activity
+
+# rough size of the python objects around the payloads of an activity (model, streams, state)
+ACTIVITY_OVERHEAD_BYTES = 2048
+STREAM_OVERHEAD_BYTES = 512
+
+# size of a float object plus its slot in the list
+DECODED_SAMPLE_BYTES = 24 + 8
+
+
+class CacheStats(pydantic.BaseModel):
+    """Counters of an activity cache."""
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+    @pydantic.computed_field  # type: ignore[prop-decorator]
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def activity_key(activity_id: int, projection: ActivityProjection = ActivityProjection.FULL, stream_types: Sequence[StreamType] | None = None) -> tuple[Hashable, ...]:
+    """Get the cache key of an activity read, every projection (and stream filter) is cached on its own."""
+    return ("activity", activity_id, projection, tuple(sorted(stream_types)) if stream_types is not None else None)
+
+
+def activity_size(activity: Activity) -> int:
+    """Estimate the memory held by an activity with its (encoded) streams, counting only what was loaded."""
+    size = ACTIVITY_OVERHEAD_BYTES
+    for stream in activity.__dict__.get("streams") or []:
+        size += STREAM_OVERHEAD_BYTES
+        if "payload" in stream.__dict__:
+            size += len(stream.payload) if stream.payload is not None else stream.sample_count * DECODED_SAMPLE_BYTES
+    return size
+
+
+def values_size(values: list[Any]) -> int:
+    """Estimate the memory held by a list of decoded samples."""
+    return sys.getsizeof(values) + len(values) * 24
+
+
+class ActivityCache:
+    """Thread-safe LRU cache of activities and decoded streams, bounded by their estimated size in bytes.
+
+    Keys are tuples that start with the kind of the entry and the activity ID, e.g.
+    ("activity", 12, ActivityProjection.FULL, None) or ("values", 12, StreamType.HEARTRATE),
+    so all entries of an activity can be invalidated at once.
+
+    Cached objects are shared between callers and must not be modified.
+    The cache only sees writes made through its StrideDBService, writes by other
+    processes are not noticed until the entry is evicted.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[Hashable, ...], tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple[Hashable, ...]) -> Any | None:
+        """Get an entry and mark it as most recently used, None if it is not cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        metrics.inc("activity_cache_lookups_total", kind=key[0], result="miss" if entry is None else "hit")
+        return entry[0] if entry is not None else None
+
+    def put(self, key: tuple[Hashable, ...], value: Any, size: int) -> None:
+        """Add an entry, evicting the least recently used ones if the cache is full.
+
+        Entries larger than the whole cache are not stored.
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+        metrics.set_gauge("activity_cache_bytes", self.size_bytes)
+
+    def invalidate(self, activity_id: int | None) -> None:
+        """Drop all entries of an activity."""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == activity_id]:
+                self.size_bytes -= self._entries.pop(key)[1]
+        metrics.set_gauge("activity_cache_bytes", self.size_bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self.hits, misses=self.misses, evictions=self.evictions, entries=len(self._entries), size_bytes=self.size_bytes, max_bytes=self.max_bytes)
@@ -0,0 +1,278 @@
+import struct
+import sys
+import zlib
+from array import array
+from enum import IntEnum
+from typing import NamedTuple, Sequence
+
+import polars as pl
+
+from stride.enums import StreamType
+
+StreamDataType = float
+
+# codec id, number of decimals (fixed-point scale), delta stride, number of samples
+HEADER = struct.Struct("<BBBI")
+
+ZLIB_LEVEL = 6
+
+# fixed-point integers of a column are computed as int64, larger values are encoded one stream at a time
+MAX_COLUMN_INTEGER = 2**62
+
+
+class StreamCodec(IntEnum):
+    """Encoding of the samples of a stream payload."""
+
+    RAW = 0  # little endian float64
+    VARINT = 1  # fixed-point, zigzag varint
+    DELTA_VARINT = 2  # fixed-point, delta, zigzag varint
+
+
+class CodecSpec(NamedTuple):
+    """How the samples of a stream type are encoded."""
+
+    delta: bool
+    max_decimals: int
+    stride: int = 1  # distance between samples that are delta'd against each other
+
+
+STREAM_CODEC_SPECS: dict[StreamType, CodecSpec] = {
+    # monotonic / slowly changing series: store differences
+    StreamType.TIME: CodecSpec(delta=True, max_decimals=3),
+    StreamType.DISTANCE: CodecSpec(delta=True, max_decimals=3),
+    StreamType.ALTITUDE: CodecSpec(delta=True, max_decimals=3),
+    StreamType.VELOCITY_SMOOTH: CodecSpec(delta=True, max_decimals=4),
+    StreamType.GRADE_SMOOTH: CodecSpec(delta=True, max_decimals=3),
+    # interleaved [lat, lng, lat, lng, ...] pairs, delta'd per column
+    StreamType.LATLNG: CodecSpec(delta=True, max_decimals=7, stride=2),
+    # small integers stored as float
+    StreamType.HEARTRATE: CodecSpec(delta=False, max_decimals=1),
+    StreamType.CADENCE: CodecSpec(delta=False, max_decimals=1),
+    StreamType.WATTS: CodecSpec(delta=False, max_decimals=1),
+    StreamType.TEMP: CodecSpec(delta=False, max_decimals=1),
+    StreamType.MOVING: CodecSpec(delta=False, max_decimals=0),
+}
+
+
+def _to_fixed_point(values: Sequence[StreamDataType], max_decimals: int) -> tuple[int, list[int]] | None:
+    """Find the smallest number of decimals that represents every value exactly.
+
+    Returns:
+        Tuple of decimals and scaled integers, or None if max_decimals is not enough
+    """
+    for decimals in range(max_decimals + 1):
+        scale = 10**decimals
+        try:
+            integers = [round(value * scale) for value in values]
+        except (OverflowError, ValueError):  # inf / nan
+            return None
+        # the decoder divides by the same scale, so this guarantees an exact round trip
+        if all(integer / scale == value for integer, value in zip(integers, values)):
+            return decimals, integers
+    return None
+
+
+def _encode_varints(integers: Sequence[int]) -> bytes:
+    """Encode signed integers as zigzag varints."""
+    out = bytearray()
+    for integer in integers:
+        zigzag = integer << 1 if integer >= 0 else (~integer << 1) | 1
+        while zigzag >= 0x80:
+            out.append((zigzag & 0x7F) | 0x80)
+            zigzag >>= 7
+        out.append(zigzag)
+    return bytes(out)
+
+
+def _decode_varints(data: bytes, count: int) -> list[int]:
+    """Decode count zigzag varints."""
+    integers = [0] * count
+    position = 0
+    for i in range(count):
+        zigzag = 0
+        shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            zigzag |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        integers[i] = (zigzag >> 1) ^ -(zigzag & 1)
+    return integers
+
+
+def _encode_raw(values: Sequence[StreamDataType]) -> bytes:
+    """Encode samples as raw float64, for streams without an exact fixed-point representation."""
+    header = HEADER.pack(StreamCodec.RAW, 0, 0, len(values))
+    samples = array("d", values)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return header + zlib.compress(samples.tobytes(), ZLIB_LEVEL)
+
+
+def _encode_fixed_point(spec: CodecSpec, decimals: int, integers: Sequence[int]) -> bytes:
+    """Encode fixed-point integers that are already delta encoded if the spec says so."""
+    if spec.delta:
+        header = HEADER.pack(StreamCodec.DELTA_VARINT, decimals, spec.stride, len(integers))
+    else:
+        header = HEADER.pack(StreamCodec.VARINT, decimals, 0, len(integers))
+    return header + zlib.compress(_encode_varints(integers), ZLIB_LEVEL)
+
+
+def encode_stream(stream_type: StreamType, values: Sequence[StreamDataType]) -> bytes:
+    """Encode the samples of a stream into a compact, self-describing payload.
+
+    Values are converted to fixed-point integers with the fewest decimals that
+    round-trip exactly, optionally delta encoded, written as zigzag varints and
+    compressed with zlib. Streams that can't be represented exactly (e.g. more
+    decimals than the spec allows) fall back to raw float64, so decoding always
+    returns exactly the input.
+
+    Args:
+        stream_type: Type of the stream, selects the codec spec
+        values: Samples of the stream
+
+    Returns:
+        Encoded payload
+    """
+    spec = STREAM_CODEC_SPECS.get(stream_type, CodecSpec(delta=False, max_decimals=0))
+    fixed_point = _to_fixed_point(values, spec.max_decimals)
+    if fixed_point is None:
+        return _encode_raw(values)
+
+    decimals, integers = fixed_point
+    if spec.delta:
+        stride = spec.stride
+        integers = integers[:stride] + [integers[i] - integers[i - stride] for i in range(stride, len(integers))]
+    return _encode_fixed_point(spec, decimals, integers)
+
+
+def encode_stream_column(stream_type: StreamType, values: Sequence[StreamDataType], offsets: Sequence[int]) -> list[bytes]:
+    """Encode the streams of many activities from one column of concatenated samples.
+
+    The fixed-point search and the delta step run over the whole column at once in
+    Polars, grouped by activity. Only the varint and zlib steps run per stream. The
+    payloads are identical to those of encode_stream.
+
+    Args:
+        stream_type: Type of the streams, selects the codec spec
+        values: Samples of all activities, concatenated
+        offsets: Activity i owns values[offsets[i]:offsets[i + 1]], one more offset than activities
+
+    Returns:
+        Payload of every activity, in order (also for activities without samples)
+    """
+    spec = STREAM_CODEC_SPECS.get(stream_type, CodecSpec(delta=False, max_decimals=0))
+    n_activities = len(offsets) - 1
+    value, scale = pl.col("value"), pl.col("scale")
+    frame = pl.DataFrame({"value": pl.Series(values, dtype=pl.Float64)}).with_columns(
+        activity=pl.Series(offsets[1:], dtype=pl.Int64).search_sorted(pl.int_range(len(values), eager=True), side="right"),
+    )
+
+    # fewest decimals that round-trip every sample of an activity (-1: none, raw float64), empty streams take 0 like encode_stream
+    activity_decimals = dict.fromkeys(range(n_activities), 0)
+    pending = frame.filter(value.is_finite().all().over("activity"))
+    activity_decimals.update(dict.fromkeys(frame.filter(~value.is_finite())["activity"].unique().to_list(), -1))
+    for decimals in range(spec.max_decimals + 1):
+        # the scale is a real column: Polars multiplies by the reciprocal when dividing by a literal, which is not exact
+        scales = pl.Series("scale", [10.0**decimals]).new_from_index(0, pending.height)
+        exact = pending.with_columns(scales).group_by("activity").agg(((value * scale).round() / scale == value).all().alias("exact"))
+        activity_decimals.update(dict.fromkeys(exact.filter("exact")["activity"].to_list(), decimals))
+        pending = pending.join(exact.filter(~pl.col("exact")), on="activity", how="semi")
+    activity_decimals.update(dict.fromkeys(pending["activity"].unique().to_list(), -1))
+
+    integer = (value * pl.col("activity").replace_strict({activity: 10.0**decimals for activity, decimals in activity_decimals.items()}, return_dtype=pl.Float64)).round()
+    frame = frame.with_columns(integer=pl.when(integer.abs() < MAX_COLUMN_INTEGER).then(integer).cast(pl.Int64))
+    if spec.delta:
+        previous = pl.col("integer").shift(spec.stride).over("activity")
+        frame = frame.with_columns(integer=pl.when(pl.int_range(pl.len()).over("activity") >= spec.stride).then(pl.col("integer") - previous).otherwise(pl.col("integer")))
+    integers = frame["integer"].to_list()
+
+    payloads = []
+    for index in range(n_activities):
+        start, end = offsets[index], offsets[index + 1]
+        decimals = activity_decimals[index]
+        stream_integers = integers[start:end]
+        if decimals < 0:
+            payloads.append(_encode_raw(values[start:end]))
+        elif None in stream_integers:
+            # too large for int64, Python integers have no limit
+            payloads.append(encode_stream(stream_type, values[start:end]))
+        else:
+            payloads.append(_encode_fixed_point(spec, decimals, stream_integers))
+    return payloads
+
+
+def decode_stream(payload: bytes) -> list[StreamDataType]:
+    """Decode a payload created by encode_stream.
+
+    Args:
+        payload: Encoded payload
+
+    Returns:
+        Samples of the stream
+    """
+    codec, decimals, stride, count = HEADER.unpack_from(payload)
+    body = zlib.decompress(payload[HEADER.size :])
+
+    match codec:
+        case StreamCodec.RAW:
+            samples = array("d")
+            samples.frombytes(body)
+            if sys.byteorder == "big":
+                samples.byteswap()
+            return samples.tolist()
+        case StreamCodec.VARINT | StreamCodec.DELTA_VARINT:
+            integers = _decode_varints(body, count)
+            if codec == StreamCodec.DELTA_VARINT:
+                for i in range(stride, count):
+                    integers[i] += integers[i - stride]
+            scale = 10**decimals
+            return [integer / scale for integer in integers]
+        case _:
+            raise ValueError(f"Unknown stream codec: {codec}")
+
+
+def stream_sample_count(payload: bytes) -> int:
+    """Get the number of samples in a payload without decoding it."""
+    sample_count: int = HEADER.unpack_from(payload)[3]
+    return sample_count
+
+
+if __name__ == "__main__":
+    import json
+    import math
+    import random
+    import time
+
+    # benchmark encode / decode speed and compression ratio on a synthetic 2h activity
+    random.seed(0)
+    n = 7200
+    distance = [0.0]
+    for _ in range(n - 1):
+        distance.append(round(distance[-1] + random.uniform(2.0, 3.5), 1))
+    latlng: list[float] = []
+    for i in range(n):
+        latlng += [round(52.37 + 0.01 * math.sin(i / 500), 6), round(4.89 + 0.01 * math.cos(i / 500), 6)]
+    streams: dict[StreamType, list[float]] = {
+        StreamType.TIME: [float(i + (i // 1000)) for i in range(n)],
+        StreamType.DISTANCE: distance,
+        StreamType.HEARTRATE: [float(random.randint(120, 175)) for _ in range(n)],
+        StreamType.CADENCE: [float(random.randint(80, 92)) for _ in range(n)],
+        StreamType.ALTITUDE: [round(10 + 5 * math.sin(i / 300), 1) for i in range(n)],
+        StreamType.VELOCITY_SMOOTH: [round(random.uniform(2.5, 3.5), 3) for _ in range(n)],
+        StreamType.LATLNG: latlng,
+    }
+
+    print(f"{'stream':<16}{'samples':>8}{'json':>10}{'float64':>10}{'encoded':>10}{'ratio':>8}{'enc ms':>9}{'dec ms':>9}")
+    for stream_type, values in streams.items():
+        start = time.perf_counter()
+        payload = encode_stream(stream_type, values)
+        encode_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        decoded = decode_stream(payload)
+        decode_ms = (time.perf_counter() - start) * 1000
+        assert decoded == values, f"{stream_type} did not round trip"
+        raw_size = 8 * len(values)
+        print(f"{stream_type:<16}{len(values):>8}{len(json.dumps(values)):>10}{raw_size:>10}{len(payload):>10}{raw_size / len(payload):>8.1f}{encode_ms:>9.2f}{decode_ms:>9.2f}")
@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Any, List
+from typing import Any, List, Sequence
+from stride.provider.models import RawActivityBatch
+from stride.stridedb.codecs import encode_stream_column
 from stride.stridedb.models import Activity, Stream
 
 
@@ -17,6 +19,49 @@ class BaseConverter(ABC):
         pass
 
     @abstractmethod
-    def to_streams(self, data: List[Any]) -> List[Stream]:
+    def to_streams(self, data: Any) -> List[Stream]:
         """Convert multiple raw streams to unified Stream models."""
         pass
+
+    @abstractmethod
+    def to_batch(self, raw_activities: Sequence[Any], raw_streams: Sequence[Any] | None = None) -> RawActivityBatch:
+        """Collect raw activities (and their streams, in the same order) into a columnar batch."""
+        pass
+
+    def convert_batch(self, batch: RawActivityBatch) -> list[Activity]:
+        """Convert a columnar batch to unified Activity models with their streams.
+
+        Summary fields are read column by column, and the streams of a type are
+        encoded from their whole column at once (see encode_stream_column), so only
+        the final varint and zlib steps run per stream.
+
+        Args:
+            batch: Batch of raw activities
+
+        Returns:
+            Unified Activity models with streams, in batch order
+        """
+        activities = [
+            Activity(  # type: ignore[call-arg]  # id is generated when it is saved
+                provider=batch.provider,
+                provider_activity_id=provider_activity_id,
+                distance=distance,
+                moving_time=moving_time,
+                duration=elapsed_time,
+                start_date=start_date,
+                sport=sport,
+                athlete_id=athlete_id,
+                streams=[],
+            )
+            for provider_activity_id, distance, moving_time, elapsed_time, start_date, sport, athlete_id in zip(
+                batch.provider_activity_ids, batch.distances, batch.moving_times, batch.elapsed_times, batch.start_dates, batch.sports, batch.athlete_ids
+            )
+        ]
+        for stream_type, column in batch.streams.items():
+            offsets = column.offsets
+            payloads = encode_stream_column(stream_type, column.values, offsets)
+            for index, (activity, payload) in enumerate(zip(activities, payloads)):
+                sample_count = offsets[index + 1] - offsets[index]
+                if sample_count:
+                    activity.streams.append(Stream(stream_type=stream_type, payload=payload, sample_count=sample_count))  # type: ignore[union-attr,call-arg]  # activity_id is set when it is attached
+        return activities
@@ -0,0 +1,25 @@
+from .base import BaseConverter
+from .coros import CorosConverter
+from .strava import StravaConverter
+from stride.enums import Provider
+
+
+class ConverterFactory:
+    """Factory to get the appropriate converter for a data source."""
+
+    _converters: dict[Provider, type[BaseConverter]] = {
+        Provider.STRAVA: StravaConverter,
+        Provider.COROS: CorosConverter,
+    }
+
+    @classmethod
+    def get_converter(cls, source: Provider) -> BaseConverter:
+        """Get a new converter for the specified source."""
+        if source not in cls._converters:
+            raise ValueError(f"No converter available for source: {source}")
+        return cls._converters[source]()
+
+    @classmethod
+    def register(cls, source: Provider, converter: type[BaseConverter]) -> None:
+        """Register the converter class of a source."""
+        cls._converters[source] = converter
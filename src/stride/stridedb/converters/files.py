@@ -0,0 +1,71 @@
+from typing import Mapping, Sequence
+from .base import BaseConverter
+from stride.provider.files.models import ActivityFile
+from stride.provider.models import RawActivityBatch
+from stride.enums import Provider, StreamType
+from stride.stridedb.models import Stream, Activity
+
+
+class ActivityFileConverter(BaseConverter):
+    """Converts parsed recording files (FIT, GPX, TCX) to unified stridedb format."""
+
+    def __init__(self, provider: Provider):
+        self.provider = provider
+
+    def to_stream(self, raw_stream: tuple[StreamType, Sequence[float]]) -> Stream:
+        """Convert a column of samples to unified Stream model.
+
+        Args:
+            raw_stream: Tuple of the stream type and its samples (latlng interleaved)
+
+        Returns:
+            Unified Stream model
+        """
+        stream_type, samples = raw_stream
+        return Stream.from_values(stream_type, samples)
+
+    def to_activity(self, raw_activity: ActivityFile) -> Activity:
+        """Convert a parsed recording file to unified Activity model.
+
+        Args:
+            raw_activity: ActivityFile instance
+
+        Returns:
+            Unified Activity model
+        """
+        return Activity(  # type: ignore[call-arg]  # id is generated when it is saved
+            provider_activity_id=raw_activity.provider_activity_id,
+            provider=self.provider,
+            distance=raw_activity.distance,
+            moving_time=raw_activity.moving_time,
+            duration=raw_activity.elapsed_time,
+            start_date=raw_activity.start_date,
+            sport=raw_activity.sport,
+        )
+
+    def to_streams(self, raw_streams: Mapping[StreamType, Sequence[float]]) -> list[Stream]:
+        """Convert the sample columns of a parsed recording file to unified Stream models."""
+        return [self.to_stream(raw_stream) for raw_stream in raw_streams.items()]
+
+    def to_batch(self, raw_activities: Sequence[ActivityFile], raw_streams: Sequence[dict[StreamType, Sequence[float]]] | None = None) -> RawActivityBatch:
+        """Collect parsed recording files into a columnar batch.
+
+        Args:
+            raw_activities: ActivityFile instances
+            raw_streams: Sample columns per file, in the same order (default: the columns of each file)
+
+        Returns:
+            RawActivityBatch with the files in the given order
+        """
+        batch = RawActivityBatch(provider=self.provider)
+        for index, raw_activity in enumerate(raw_activities):
+            batch.append(
+                provider_activity_id=raw_activity.provider_activity_id,
+                distance=raw_activity.distance,
+                moving_time=raw_activity.moving_time,
+                elapsed_time=raw_activity.elapsed_time,
+                start_date=raw_activity.start_date,
+                sport=raw_activity.sport,
+                streams=raw_streams[index] if raw_streams is not None else raw_activity.streams,
+            )
+        return batch
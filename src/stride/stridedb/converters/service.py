@@ -1,38 +1,64 @@
-from typing import List, Any
-from stride.stridedb.converters import ConverterFactory
-from stride.stridedb.models import Activity, Provider
+from typing import Any, Sequence
+from .factory import ConverterFactory
+from stride import metrics
+from stride.enums import Provider, StreamType
+from stride.stridedb.models import Activity
+from stride.provider.files.models import ActivityFile
+from stride.provider.strava.models import StravaActivityResponseModel, StravaJSONStreamResponseModel
 
 
 class StrideConverterService:
     """High-level service for processing activity data from various sources."""
 
     @staticmethod
-    def process_activity_data(provider: Provider, raw_activity: Any, raw_streams: List[Any]) -> Activity:
+    def process_activity_data(provider: Provider, raw_activity: Any, raw_streams: Any) -> Activity:
         """Generic method to process activity data from any source.
 
         Args:
             source: Data source (STRAVA, COROS, etc.)
             raw_activity: Raw activity data
-            raw_streams: List of raw stream data
+            raw_streams: Raw stream data, in the format of the provider's converter
 
         Returns:
             Unified Activity model with streams
         """
         converter = ConverterFactory.get_converter(provider)
 
-        activity = converter.to_activity(raw_activity)
-        streams = converter.to_streams(raw_streams)
-        activity.streams = streams
+        with metrics.span("convert", provider=provider) as span:
+            activity = converter.to_activity(raw_activity)
+            streams = converter.to_streams(raw_streams)
+            activity.streams = streams
+            span.add("activities")
+            span.add("samples", sum(stream.sample_count for stream in streams))
 
         return activity
 
     @staticmethod
-    def process_strava_data(raw_activity: Any, raw_streams: List[Any]) -> Activity:
+    def process_activity_batch(provider: Provider, raw_activities: Sequence[Any], raw_streams: Sequence[Any] | None = None) -> list[Activity]:
+        """Generic method to process many activities from any source in one call.
+
+        Args:
+            provider: Data source (STRAVA, COROS, etc.)
+            raw_activities: Raw activity data
+            raw_streams: Raw stream data per activity, in the same order
+
+        Returns:
+            Unified Activity models with streams, in the given order
+        """
+        converter = ConverterFactory.get_converter(provider)
+        with metrics.span("convert", provider=provider) as span:
+            activities = converter.convert_batch(converter.to_batch(raw_activities, raw_streams))
+            span.add("activities", len(activities))
+            span.add("samples", sum(stream.sample_count for activity in activities for stream in activity.streams or []))
+        return activities
+
+    @staticmethod
+    def process_strava_data(raw_activity: StravaActivityResponseModel, raw_streams: StravaJSONStreamResponseModel) -> Activity:
         """Process raw Strava data into unified format.
 
         Args:
             raw_activity: Raw Strava activity data
-            raw_streams: List of raw Strava stream data
+            raw_streams: Raw Strava streams of the activity
 
         Returns:
             Unified Activity model with streams
@@ -40,16 +66,39 @@ class StrideConverterService:
         return StrideConverterService.process_activity_data(Provider.STRAVA, raw_activity, raw_streams)
 
     @staticmethod
-    def process_coros_data(raw_activity: Any, raw_streams: List[Any]) -> Activity:
+    def process_strava_batch(raw_activities: Sequence[StravaActivityResponseModel], raw_streams: Sequence[StravaJSONStreamResponseModel] | None = None) -> list[Activity]:
+        """Process many raw Strava activities into unified format.
+
+        Args:
+            raw_activities: Raw Strava activities
+            raw_streams: Raw Strava streams per activity, in the same order
+
+        Returns:
+            Unified Activity models with streams
+        """
+        return StrideConverterService.process_activity_batch(Provider.STRAVA, raw_activities, raw_streams)
+
+    @staticmethod
+    def process_coros_data(raw_activity: ActivityFile, raw_streams: dict[StreamType, Sequence[float]] | None = None) -> Activity:
         """Process raw Coros data into unified format.
 
         Args:
-            raw_activity: Raw Coros activity data
-            raw_streams: List of raw Coros stream data
+            raw_activity: Parsed Coros FIT file
+            raw_streams: Sample columns of the file (default: the columns of raw_activity)
 
         Returns:
             Unified Activity model with streams
         """
-        # TODO: uncomment when Coros is added
-        raise NotImplementedError("Coros processing not yet implemented")
-        # return StrideConverterService.process_activity_data(Provider.COROS, raw_activity, raw_streams)
+        return StrideConverterService.process_activity_data(Provider.COROS, raw_activity, raw_streams if raw_streams is not None else raw_activity.streams)
+
+    @staticmethod
+    def process_coros_batch(raw_activities: Sequence[ActivityFile]) -> list[Activity]:
+        """Process many parsed Coros FIT files into unified format.
+
+        Args:
+            raw_activities: Parsed Coros FIT files
+
+        Returns:
+            Unified Activity models with streams
+        """
+        return StrideConverterService.process_activity_batch(Provider.COROS, raw_activities)
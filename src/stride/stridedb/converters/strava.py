@@ -1,5 +1,8 @@
+from itertools import chain
+from typing import Iterable, Sequence
 from .base import BaseConverter
-from stride.stridedb.models import Stream, StreamEntry, Activity, StreamType, Provider
+from stride.provider.models import RawActivityBatch
+from stride.stridedb.models import Stream, Activity, StreamType, Provider
 from stride.provider.strava.models import StravaJSONStreamDataResponseModel, StravaActivityResponseModel, StravaStreamType, StravaJSONStreamResponseModel
 
 
@@ -27,10 +30,10 @@ class StravaConverter(BaseConverter):
             raw_stream.stream_type,  # fallback to original
         )
 
-        # Create stream entries
-        stream_entries = [StreamEntry(index=index, stream_type=unified_stream_type, stream_entry=value) for index, value in enumerate(raw_stream.stream_data)]
+        if unified_stream_type == StreamType.LATLNG:
+            return Stream.from_coordinates(raw_stream.stream_data)  # type: ignore[arg-type]
 
-        return Stream(stream_type=unified_stream_type, stream_entries=stream_entries)
+        return Stream.from_values(unified_stream_type, raw_stream.stream_data)  # type: ignore[arg-type]
 
     def to_activity(self, raw_activity: StravaActivityResponseModel) -> Activity:
         """Convert Strava activity to unified Activity model.
@@ -41,8 +44,49 @@ class StravaConverter(BaseConverter):
         Returns:
             Unified Activity model
         """
-        return Activity(provider_activity_id=raw_activity.id, provider=Provider.STRAVA, distance=raw_activity.distance, moving_time=raw_activity.moving_time, duration=raw_activity.elapsed_time)
+        return Activity(
+            provider_activity_id=raw_activity.id,
+            provider=Provider.STRAVA,
+            distance=raw_activity.distance,
+            moving_time=raw_activity.moving_time,
+            duration=raw_activity.elapsed_time,
+            start_date=raw_activity.start_date,
+            sport=raw_activity.type,
+            athlete_id=raw_activity.athlete.id if raw_activity.athlete is not None else None,
+        )
 
     def to_streams(self, raw_streams: StravaJSONStreamResponseModel) -> list[Stream]:
         """Convert multiple Strava streams to unified Stream models."""
         return [self.to_stream(raw_stream) for raw_stream in raw_streams.streams]
+
+    def to_batch(self, raw_activities: Sequence[StravaActivityResponseModel], raw_streams: Sequence[StravaJSONStreamResponseModel] | None = None) -> RawActivityBatch:
+        """Collect Strava activities and their streams into a columnar batch.
+
+        Args:
+            raw_activities: StravaActivityResponseModel instances
+            raw_streams: StravaJSONStreamResponseModel per activity, in the same order (default: no streams)
+
+        Returns:
+            RawActivityBatch with the activities in the given order
+        """
+        if raw_streams is not None and len(raw_streams) != len(raw_activities):
+            raise ValueError(f"Got {len(raw_streams)} stream responses for {len(raw_activities)} activities")
+
+        batch = RawActivityBatch(provider=Provider.STRAVA)
+        for index, raw_activity in enumerate(raw_activities):
+            streams: dict[StreamType, Iterable[float]] = {}
+            for raw_stream in raw_streams[index].streams if raw_streams is not None else []:
+                stream_type = StreamType(self.STREAM_TYPE_MAPPING.get(raw_stream.stream_type, raw_stream.stream_type))
+                # coordinate pairs are flattened into interleaved lat/lng at C speed
+                streams[stream_type] = chain.from_iterable(raw_stream.stream_data) if stream_type == StreamType.LATLNG else raw_stream.stream_data  # type: ignore[arg-type, assignment]  # latlng samples are pairs
+            batch.append(
+                provider_activity_id=raw_activity.id,  # type: ignore[arg-type]
+                distance=raw_activity.distance,
+                moving_time=raw_activity.moving_time,
+                elapsed_time=raw_activity.elapsed_time,
+                start_date=raw_activity.start_date,
+                sport=raw_activity.type,
+                athlete_id=raw_activity.athlete.id if raw_activity.athlete is not None else None,
+                streams=streams,
+            )
+        return batch
@@ -1,13 +1,32 @@
 import sqlmodel
 import sqlalchemy
+import polars as pl
 import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timezone
 from pathlib import Path
+from typing import Any, Iterator, Sequence
 from loguru import logger
-from sqlalchemy.orm import selectinload
-from stride.stridedb.models import Activity
+from sqlalchemy.orm import raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from stride import metrics
+from stride.stridedb.models import Activity, ActivityMetric, ProviderActivityLink, RollupPeriod, Stream, StreamEntry
+from stride.stridedb import similarity, spatial, training
+from stride.stridedb.cache import ActivityCache, activity_key, activity_size, values_size
+from stride.stridedb.streamstore import StreamStore
+from stride.stridedb.codecs import decode_stream
+from stride.stridedb.downsampling import DownsampledStream, DownsampleMethod, StreamPyramid
 from stride.provider.strava.main import StravaService
 from stride.stridedb.converters import StrideConverterService
-from stride.enums import Provider
+from stride.enums import ActivityProjection, Provider, StreamType
+
+# number of candidate tracks a near-point query decodes at once when checking them exactly
+EXACT_NEAR_BATCH_SIZE = 500
+
+# pyramids of downsampled streams kept in memory, least recently used ones are dropped
+MAX_CACHED_PYRAMIDS = 256
 
 # Get the path to the data directory relative to this file
 package_root = Path(__file__).parent.parent
@@ -18,6 +37,34 @@ db_path = data_dir / "stridedb.db"
 os.makedirs(data_dir, exist_ok=True)
 
 
+@sqlalchemy.event.listens_for(sqlalchemy.Engine, "before_cursor_execute")
+def _before_cursor_execute(conn: sqlalchemy.Connection, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.Engine, "after_cursor_execute")
+def _after_cursor_execute(conn: sqlalchemy.Connection, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    """Record the latency of every statement, and the rows written by inserts, updates and deletes."""
+    duration = time.perf_counter() - conn.info["statement_start"].pop()
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    metrics.observe("db_statement_seconds", duration, statement=kind)
+    if kind in ("INSERT", "UPDATE", "DELETE") and cursor.rowcount > 0:
+        metrics.inc("db_rows_written_total", cursor.rowcount, statement=kind)
+
+
+@sqlalchemy.event.listens_for(sqlmodel.Session, "before_commit")
+def _before_commit(session: sqlmodel.Session) -> None:
+    session.info["commit_start"] = time.perf_counter()
+
+
+@sqlalchemy.event.listens_for(sqlmodel.Session, "after_commit")
+def _after_commit(session: sqlmodel.Session) -> None:
+    """Record the time of session commits (including the final flush)."""
+    start = session.info.pop("commit_start", None)
+    if start is not None:
+        metrics.observe("db_commit_seconds", time.perf_counter() - start)
+
+
 def get_sqlite_url(prod: bool = False) -> str:
     """Get the SQLite URL for the database."""
     prefix = "prod" if prod else "dev"
@@ -25,49 +72,217 @@ def get_sqlite_url(prod: bool = False) -> str:
     return f"sqlite:///{db_file.absolute()}"
 
 
+def get_stream_store_dir(prod: bool = False) -> Path:
+    """Get the directory of the memory-mapped stream store."""
+    return data_dir / "streams" / ("prod" if prod else "dev")
+
+
 def get_engine(prod: bool = False) -> sqlalchemy.Engine:
     """Get the engine for the database."""
     return sqlmodel.create_engine(get_sqlite_url(prod))
 
 
 def create_database(prod: bool = False) -> None:
-    """Create database tables."""
-    sqlmodel.SQLModel.metadata.create_all(get_engine(prod))
+    """Create database tables, or bring the schema of an existing database up to date.
+
+    Data migrations are not run here, they can take long on big databases, see `stride migrate`.
+    """
+    from stride.stridedb.migrations import Migrator
+
+    Migrator(get_engine(prod)).migrate_schema()
+
+
+def activity_load_options(projection: ActivityProjection = ActivityProjection.FULL, stream_types: Sequence[StreamType] | None = None) -> list[Any]:
+    """Get the loader options of an Activity select for a projection.
+
+    Streams are loaded with one extra query for all selected activities (selectin), never per activity.
+
+    Args:
+        projection: Part of the activities to load
+        stream_types: Only load streams of these types (default: all)
+    """
+    if projection == ActivityProjection.SUMMARY:
+        return [raiseload(Activity.streams)]  # type: ignore[arg-type]
+    relationship = Activity.streams if stream_types is None else Activity.streams.and_(Stream.stream_type.in_(stream_types))  # type: ignore[union-attr,attr-defined]
+    loader = selectinload(relationship)  # type: ignore[arg-type]
+    if projection == ActivityProjection.STREAM_TYPES:
+        loader = loader.load_only(Stream.id, Stream.activity_id, Stream.stream_type, Stream.sample_count, raiseload=True)  # type: ignore[arg-type]
+    return [loader]
+
+
+def insert_activity(session: sqlmodel.Session, activity: Activity, deduplicate: bool = True, verbose: bool = True) -> Activity:
+    """Insert a new activity (or link it to the stored duplicate) and index it, committed by the caller."""
+    if deduplicate:
+        duplicate_ids = similarity.find_duplicate_activity_ids(session, activity)
+        if duplicate_ids:
+            if verbose:
+                logger.warning(f"Activity {activity.provider_activity_id} from {activity.provider} duplicates activity {duplicate_ids[0]}, linking to it.")
+            session.add(ProviderActivityLink(provider=activity.provider, provider_activity_id=activity.provider_activity_id, activity_id=duplicate_ids[0]))
+            statement = sqlmodel.select(Activity).options(selectinload(Activity.streams)).where(Activity.id == duplicate_ids[0])  # type: ignore[arg-type]
+            return session.exec(statement).one()
+
+    logger.debug(f"Saving new activity from {activity.provider} with id {activity.provider_activity_id} in stridedb")
+    activity.updated_at = datetime.now(timezone.utc)
+    session.add(activity)
+    session.flush()
+    session.add(ProviderActivityLink(provider=activity.provider, provider_activity_id=activity.provider_activity_id, activity_id=activity.id))
+    for stream in activity.streams or []:
+        if stream.stream_type == StreamType.LATLNG:
+            spatial.index_activity(session, activity.id, stream.coordinates)
+    similarity.index_activity(session, activity)
+    training.index_activity(session, activity)
+    session.flush()
+    return activity
+
+
+def delete_activity_rows(session: sqlmodel.Session, activity_id: int) -> bool:
+    """Delete an activity with its indexes, metrics and provider links, committed by the caller.
+
+    Returns:
+        Whether the activity existed
+    """
+    db_activity = session.get(Activity, activity_id)
+    if db_activity is None:
+        return False
+    spatial.remove_activity(session, activity_id)
+    similarity.remove_activity(session, activity_id)
+    training.remove_activity(session, activity_id)
+    session.execute(sqlalchemy.delete(ActivityMetric).where(ActivityMetric.activity_id == activity_id))  # type: ignore[arg-type]
+    session.execute(sqlalchemy.delete(ProviderActivityLink).where(ProviderActivityLink.activity_id == activity_id))  # type: ignore[arg-type]
+    session.delete(db_activity)
+    return True
+
+
+def replace_activity(session: sqlmodel.Session, activity_id: int, activity: Activity) -> Activity:
+    """Replace a stored activity by a new version, keeping its ID and the links of other providers, committed by the caller."""
+    statement = sqlmodel.select(ProviderActivityLink).where(ProviderActivityLink.activity_id == activity_id)
+    other_links = [(link.provider, link.provider_activity_id) for link in session.exec(statement) if (link.provider, link.provider_activity_id) != (activity.provider, activity.provider_activity_id)]
+    delete_activity_rows(session, activity_id)
+    session.flush()
+    activity.id = activity_id
+    insert_activity(session, activity, deduplicate=False, verbose=False)
+    session.add_all([ProviderActivityLink(provider=provider, provider_activity_id=provider_activity_id, activity_id=activity_id) for provider, provider_activity_id in other_links])
+    return activity
 
 
 class StrideDBService:
     """Service for interacting with the stridedb."""
 
-    def __init__(self, prod: bool = False):
-        self.prod = prod
-        self.engine = get_engine(prod)
+    def __init__(self, prod: bool = False, url: str | None = None, cache_bytes: int = 0, stream_store: StreamStore | None = None):
+        """Connect to the stridedb.
 
-    def save_activity(self, activity: Activity, update: bool = False, verbose: bool = True) -> Activity:
+        Args:
+            prod: Use the prod database instead of the dev database
+            url: SQLAlchemy URL of another database (overrides prod), e.g. for benchmarks
+            cache_bytes: Memory budget of the in-process cache of activities and decoded streams (0: no cache)
+            stream_store: Memory-mapped copy of the streams, kept up to date by saves and deletes
+        """
+        self.prod = prod
+        self.engine = sqlmodel.create_engine(url) if url else get_engine(prod)
+        self.cache = ActivityCache(cache_bytes) if cache_bytes > 0 else None
+        self.stream_store = stream_store
+        self._pyramids: OrderedDict[tuple[int, StreamType], StreamPyramid] = OrderedDict()
+        self._pyramids_lock = threading.Lock()
+
+    def _invalidate(self, activity_id: int | None) -> None:
+        """Drop cached data derived from an activity."""
+        with self._pyramids_lock:
+            for key in [key for key in self._pyramids if key[0] == activity_id]:
+                del self._pyramids[key]
+        if self.cache is not None:
+            self.cache.invalidate(activity_id)
+
+    @metrics.timed("db_operation")
+    def save_activity(self, activity: Activity, update: bool = False, verbose: bool = True, deduplicate: bool = True) -> Activity:
         """Save an activity and its streams to the database.
 
-        1. check if activity exists
+        1. check if activity exists (provider id is linked to a stride activity)
         2. if it does, but update is True, update it
         3. if it does, but update is False, print warning
-        3. if it doesn't, save it
+        4. if it doesn't, but the same recording exists (e.g. from another provider), link the provider id to it
+        5. if it doesn't, save it
 
         Args:
             activity: Activity to save
             update: Whether to update the activity if it already exists
             verbose: Whether to print debug messages
+            deduplicate: Whether to link activities that duplicate a stored activity instead of saving them
 
         Returns:
             Saved activity with updated IDs
         """
-        if self.check_if_activity_exists(activity.provider_activity_id, activity.provider):
+        activity_id = self.resolve_activity_id(activity.provider_activity_id, activity.provider)
+        if activity_id is not None:
             if update:
+                activity.id = activity_id
                 return self.update_activity(activity, verbose=verbose)
 
             if verbose:
                 logger.warning(f"Activity {activity.provider_activity_id}" " already exists in the database, skipping. (set update=True to update)")
             return activity
 
-        return self.save_new_activity(activity, verbose=verbose)
+        # keep the in-memory streams usable after the session is closed
+        with sqlmodel.Session(self.engine, expire_on_commit=False) as session:
+            saved = insert_activity(session, activity, deduplicate=deduplicate, verbose=verbose)
+            session.commit()
+        self._invalidate(saved.id)
+        # a linked duplicate is already in the stream store
+        if self.stream_store is not None and saved is activity:
+            self.stream_store.append_activity(saved)
+        return saved
+
+    @metrics.timed("db_operation")
+    def save_activities(self, activities: list[Activity], update: bool = False, verbose: bool = True, deduplicate: bool = True) -> list[Activity]:
+        """Save many activities and their streams to the database.
+
+        Provider ids are resolved in batches instead of one existence query per activity,
+        and all new activities are written in a single transaction.
+
+        Args:
+            activities: Activities to save
+            update: Whether to update activities that already exist
+            verbose: Whether to print debug messages
+            deduplicate: Whether to link activities that duplicate a stored activity instead of saving them
+
+        Returns:
+            Saved activities with updated IDs, in the same order
+        """
+        activity_ids = self.resolve_activity_ids([(activity.provider, activity.provider_activity_id) for activity in activities])
+
+        saved: list[Activity] = []
+        inserted: list[Activity] = []
+        with sqlmodel.Session(self.engine, expire_on_commit=False) as session:
+            for activity in activities:
+                key = (activity.provider, activity.provider_activity_id)
+                if key in activity_ids:
+                    if not update and verbose:
+                        logger.warning(f"Activity {activity.provider_activity_id} already exists in the database, skipping. (set update=True to update)")
+                    saved.append(activity)
+                    continue
+                saved.append(insert_activity(session, activity, deduplicate=deduplicate, verbose=verbose))
+                activity_ids[key] = saved[-1].id
+                if saved[-1] is activity:
+                    inserted.append(activity)
+            session.commit()
+        for activity in saved:
+            self._invalidate(activity.id)
+        # linked duplicates are already in the stream store
+        if self.stream_store is not None:
+            for activity in inserted:
+                self.stream_store.append_activity(activity)
+
+        # updates replace the stored activity one by one
+        if update:
+            for position, activity in enumerate(activities):
+                if saved[position] is activity and activity.id is None:
+                    activity.id = activity_ids[(activity.provider, activity.provider_activity_id)]
+                    saved[position] = self.update_activity(activity, verbose=verbose)
+
+        if verbose:
+            logger.info(f"Saved {len(activities)} activities in stridedb")
+        return saved
 
+    @metrics.timed("db_operation")
     def save_new_activity(self, activity: Activity, verbose: bool = True) -> Activity:
         """Save a new activity to the database.
 
@@ -77,39 +292,145 @@ class StrideDBService:
         Returns:
             Saved activity with ID generated by the database
         """
-        with sqlmodel.Session(self.engine) as session:
-            logger.debug(f"Saving new activity from {activity.provider} with id {activity.provider_activity_id} in stridedb")
-            session.add(activity)
+        with sqlmodel.Session(self.engine, expire_on_commit=False) as session:
+            insert_activity(session, activity, deduplicate=False, verbose=verbose)
             session.commit()
-            session.refresh(activity)
-            return activity
+        self._invalidate(activity.id)
+        if self.stream_store is not None:
+            self.stream_store.append_activity(activity)
+        return activity
 
+    @metrics.timed("db_operation")
     def delete_activity(self, activity: Activity, verbose: bool = True) -> None:
-        """Delete an activity from the database.
+        """Delete an activity, and the links of all its provider ids, from the database.
 
         Args:
             activity: Activity to delete
         """
+        activity_id = activity.id if activity.id is not None else self.resolve_activity_id(activity.provider_activity_id, activity.provider)
         with sqlmodel.Session(self.engine) as session:
-            statement = sqlmodel.select(Activity).where(Activity.id == activity.id)
-            session.exec(statement).delete()
-            session.commit()
+            if activity_id is not None and delete_activity_rows(session, activity_id):
+                session.commit()
+        self._invalidate(activity_id)
+        if self.stream_store is not None and activity_id is not None:
+            self.stream_store.remove(activity_id)
+
+    @metrics.timed("db_operation")
+    def remove_provider_activity(self, provider_activity_id: int, provider: Provider) -> int | None:
+        """Remove a provider's copy of an activity, e.g. after it was deleted at the provider.
 
+        The stride activity is only deleted when no other provider links to it.
+
+        Args:
+            provider_activity_id: ID of the activity at the provider
+            provider: Provider of the activity
+
+        Returns:
+            ID of the stride activity the provider activity was linked to, None if it was unknown
+        """
+        activity_id = self.resolve_activity_id(provider_activity_id, provider)
+        if activity_id is None:
+            return None
+        with sqlmodel.Session(self.engine) as session:
+            statement = sqlmodel.select(sqlalchemy.func.count()).select_from(ProviderActivityLink).where(ProviderActivityLink.activity_id == activity_id)
+            n_links = session.exec(statement).one()
+            if n_links > 1:
+                session.delete(session.get(ProviderActivityLink, (provider, provider_activity_id)))
+                session.commit()
+                return activity_id
+        self.delete_activity(Activity(id=activity_id, provider=provider, provider_activity_id=provider_activity_id), verbose=False)
+        return activity_id
+
+    @metrics.timed("db_operation")
     def update_activity(self, activity: Activity, verbose: bool = True) -> Activity:
         """Update an activity in the database.
 
+        The stored activity keeps its ID and the links of other providers.
+
         Args:
             activity: Activity to update
 
         Returns:
             Updated activity
         """
+        if activity.id is None:
+            activity.id = self.resolve_activity_id(activity.provider_activity_id, activity.provider)
         if verbose:
             logger.debug(f"Updating activity {activity.id} in stridedb")
-        self.delete_activity(activity=activity, verbose=False)  # false because we don't want to print dropping first
-        self.save_new_activity(activity=activity, verbose=False)  # false because we don't want to print saving new
+
+        # delete, insert and re-linking commit together, a crash leaves the old version in place
+        with sqlmodel.Session(self.engine, expire_on_commit=False) as session:
+            replace_activity(session, activity.id, activity)
+            session.commit()
+        self._invalidate(activity.id)
+        if self.stream_store is not None:
+            self.stream_store.remove(activity.id)
+            self.stream_store.append_activity(activity)
         return activity
 
+    @metrics.timed("db_operation")
+    def update_activity_summary(self, id: int, **fields: Any) -> None:
+        """Update summary fields (e.g. sport) of a stored activity, leaving its streams untouched.
+
+        Args:
+            id: ID of the activity
+            fields: Activity fields and their new values
+        """
+        with sqlmodel.Session(self.engine) as session:
+            db_activity = session.get(Activity, id)
+            if db_activity is None:
+                raise ValueError(f"Activity {id} not found in the database")
+            for name, value in fields.items():
+                setattr(db_activity, name, value)
+            db_activity.updated_at = datetime.now(timezone.utc)
+            session.add(db_activity)
+            training.update_activity_summary(session, db_activity)
+            session.commit()
+        self._invalidate(id)
+
+    def update_provider_activity_summary(self, provider_activity_id: int, provider: Provider, **fields: Any) -> int | None:
+        """Update summary fields of the activity a provider activity is linked to, see update_activity_summary.
+
+        Returns:
+            ID of the updated activity, None if the provider activity is unknown
+        """
+        activity_id = self.resolve_activity_id(provider_activity_id, provider)
+        if activity_id is not None:
+            self.update_activity_summary(activity_id, **fields)
+        return activity_id
+
+    def resolve_activity_id(self, provider_activity_id: int, provider: Provider) -> int | None:
+        """Get the stride activity ID a provider activity ID is linked to.
+
+        Args:
+            provider_activity_id: ID of the activity at the provider
+            provider: Provider of the activity
+
+        Returns:
+            ID of the stride activity, None if the provider activity is unknown
+        """
+        with sqlmodel.Session(self.engine) as session:
+            link = session.get(ProviderActivityLink, (provider, provider_activity_id))
+            return link.activity_id if link is not None else None
+
+    @metrics.timed("db_operation")
+    def resolve_activity_ids(self, keys: list[tuple[Provider, int]], batch_size: int = 500) -> dict[tuple[Provider, int], int]:
+        """Get the stride activity IDs of many provider activity IDs.
+
+        Args:
+            keys: List of (provider, provider activity ID)
+            batch_size: Number of keys looked up per query
+
+        Returns:
+            Mapping of the known keys to their stride activity ID
+        """
+        resolved: dict[tuple[Provider, int], int] = {}
+        with sqlmodel.Session(self.engine) as session:
+            for start in range(0, len(keys), batch_size):
+                statement = sqlmodel.select(ProviderActivityLink).where(sqlalchemy.tuple_(ProviderActivityLink.provider, ProviderActivityLink.provider_activity_id).in_(keys[start : start + batch_size]))
+                resolved.update({(link.provider, link.provider_activity_id): link.activity_id for link in session.exec(statement)})
+        return resolved
+
     def check_if_activity_exists(self, provider_activity_id: int, provider: Provider) -> bool:
         """Check if an activity exists in the database.
 
@@ -120,43 +441,444 @@ class StrideDBService:
         Returns:
             True if the activity exists, False otherwise
         """
+        return self.resolve_activity_id(provider_activity_id, provider) is not None
+
+    @metrics.timed("db_operation")
+    def find_duplicate_activities(self, activity: Activity) -> list[int]:
+        """Find stored activities that are the same recording as an activity, e.g. uploaded from another provider.
+
+        Args:
+            activity: Activity (saved or not) with its streams attached
+
+        Returns:
+            IDs of the duplicate activities
+        """
         with sqlmodel.Session(self.engine) as session:
-            statement = sqlmodel.select(Activity).where(Activity.provider_activity_id == provider_activity_id, Activity.provider == provider)
-            return session.exec(statement).first() is not None
+            return similarity.find_duplicate_activity_ids(session, activity)
 
-    def get_activity(self, id: int) -> Activity:
+    @metrics.timed("db_operation")
+    def find_similar_routes(self, id: int, min_similarity: float = 0.5) -> list[tuple[int, float]]:
+        """Find stored activities that follow roughly the same route as an activity.
+
+        Args:
+            id: ID of the activity
+            min_similarity: Minimum estimated overlap of the routes (0 to 1)
+
+        Returns:
+            List of (activity ID, similarity), most similar first
+        """
+        with sqlmodel.Session(self.engine) as session:
+            return similarity.find_similar_route_activity_ids(session, id, min_similarity)
+
+    @metrics.timed("db_operation")
+    def get_activity(self, id: int, projection: ActivityProjection = ActivityProjection.FULL, stream_types: Sequence[StreamType] | None = None) -> Activity:
         """Get an activity by ID.
 
+        With a cache, repeated reads of an activity are served from memory (per projection and
+        stream filter), the returned activity is then shared with other readers and must not be modified.
+
         Args:
             activity_id: ID of the activity
+            projection: Part of the activity to load, e.g. SUMMARY for its columns only
+            stream_types: Only load streams of these types (default: all)
 
         Returns:
             Activity from the database if found, raises an error otherwise
         """
+        key = activity_key(id, projection, stream_types)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached  # type: ignore[no-any-return]
+
         with sqlmodel.Session(self.engine) as session:
-            statement = sqlmodel.select(Activity).options(selectinload(Activity.streams)).where(Activity.id == id)
+            statement = sqlmodel.select(Activity).options(*activity_load_options(projection, stream_types)).where(Activity.id == id)
             activity = session.exec(statement).first()
 
             if activity is None:
                 raise ValueError(f"Activity {id} not found in the database")
 
-            return activity
+        if self.cache is not None:
+            self.cache.put(key, activity, activity_size(activity))
+        return activity
 
-    def get_activities(self, limit: int = 100) -> list[Activity]:
+    @metrics.timed("db_operation")
+    def get_activities(self, limit: int = 100, offset: int = 0, projection: ActivityProjection = ActivityProjection.FULL, stream_types: Sequence[StreamType] | None = None) -> list[Activity]:
         """Get activities from the database.
 
+        Listings that only show summaries should pass projection=SUMMARY (or STREAM_TYPES
+        to know which streams exist), so no samples are read and decoded.
+
         Args:
             limit: Maximum number of activities to return
+            offset: Number of activities to skip, for pages
+            projection: Part of the activities to load
+            stream_types: Only load streams of these types (default: all)
 
         Returns:
-            List of activities
+            List of activities, ordered by ID
         """
 
         # open a session is like dialing the database
         with sqlmodel.Session(self.engine) as session:
-            statement = sqlmodel.select(Activity).options(selectinload(Activity.streams)).limit(limit)
+            statement = sqlmodel.select(Activity).options(*activity_load_options(projection, stream_types)).order_by(sqlmodel.col(Activity.id)).offset(offset).limit(limit)
             return list(session.exec(statement))
 
+    def iter_activities(self, batch_size: int = 100, projection: ActivityProjection = ActivityProjection.FULL, stream_types: Sequence[StreamType] | None = None) -> Iterator[Activity]:
+        """Iterate over all activities, loading them (and their streams) one batch at a time.
+
+        Only one batch of samples is in memory at once, instead of the whole history.
+
+        Args:
+            batch_size: Number of activities per query
+            projection: Part of the activities to load
+            stream_types: Only load streams of these types (default: all)
+        """
+        last_id = 0
+        while True:
+            with sqlmodel.Session(self.engine) as session:
+                statement = sqlmodel.select(Activity).options(*activity_load_options(projection, stream_types)).where(Activity.id > last_id).order_by(sqlmodel.col(Activity.id)).limit(batch_size)
+                batch = list(session.exec(statement))
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            last_id = batch[-1].id
+
+    @metrics.timed("db_operation")
+    def load_streams(self, activities: Sequence[Activity], stream_types: Sequence[StreamType] | None = None, batch_size: int = 500) -> None:
+        """Attach the streams of activities read with a SUMMARY projection, one query per batch of activities.
+
+        For listings that need the samples of only some of the activities they show.
+
+        Args:
+            activities: Activities to load the streams of, their streams are replaced
+            stream_types: Only load streams of these types (default: all)
+            batch_size: Number of activities per query
+        """
+        for start in range(0, len(activities), batch_size):
+            batch = {activity.id: activity for activity in activities[start : start + batch_size]}
+            streams: dict[int, list[Stream]] = {activity_id: [] for activity_id in batch}
+            with sqlmodel.Session(self.engine) as session:
+                statement = sqlmodel.select(Stream).where(Stream.activity_id.in_(batch))  # type: ignore[union-attr]
+                if stream_types is not None:
+                    statement = statement.where(Stream.stream_type.in_(stream_types))  # type: ignore[attr-defined]
+                for stream in session.exec(statement):
+                    streams[stream.activity_id].append(stream)  # type: ignore[index]
+            for activity_id, activity in batch.items():
+                # committed value: the activity is detached and must not look modified
+                set_committed_value(activity, "streams", streams[activity_id])
+
+    @metrics.timed("db_operation")
+    def get_activities_in_area(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> list[Activity]:
+        """Get activities whose track passes through an area.
+
+        Uses the spatial index (bounding box R*Tree and geohash tiles), so no GPS samples are scanned.
+
+        Args:
+            min_lat: Southern border of the area
+            min_lng: Western border of the area
+            max_lat: Northern border of the area
+            max_lng: Eastern border of the area
+
+        Returns:
+            List of activities, summaries only (SUMMARY projection)
+        """
+        with sqlmodel.Session(self.engine) as session:
+            activity_ids = spatial.find_activity_ids_in_bbox(session, (min_lat, min_lng, max_lat, max_lng))
+            return self._get_summaries(session, activity_ids)
+
+    def _get_summaries(self, session: sqlmodel.Session, activity_ids: Sequence[int]) -> list[Activity]:
+        statement = sqlmodel.select(Activity).options(*activity_load_options(ActivityProjection.SUMMARY)).where(Activity.id.in_(activity_ids))  # type: ignore[attr-defined]
+        return list(session.exec(statement))
+
+    @metrics.timed("db_operation")
+    def get_activities_near(self, lat: float, lng: float, radius_m: float = 100.0, exact: bool = True) -> list[Activity]:
+        """Get activities whose track passes within radius_m of a point.
+
+        Args:
+            lat: Latitude of the point
+            lng: Longitude of the point
+            radius_m: Search radius in meters
+            exact: Whether to check the decoded track of every candidate from the spatial index,
+                otherwise all activities whose indexed tiles overlap the search box are returned
+
+        Returns:
+            List of activities, summaries only (SUMMARY projection)
+        """
+        with sqlmodel.Session(self.engine) as session:
+            candidate_ids = spatial.find_activity_ids_in_bbox(session, spatial.bbox_around(lat, lng, radius_m))
+            if not exact:
+                return self._get_summaries(session, candidate_ids)
+
+            # only the latlng streams are read, a batch of decoded tracks at a time
+            near_ids = []
+            for start in range(0, len(candidate_ids), EXACT_NEAR_BATCH_SIZE):
+                batch = candidate_ids[start : start + EXACT_NEAR_BATCH_SIZE]
+                statement = sqlmodel.select(Stream).where(Stream.activity_id.in_(batch), Stream.stream_type == StreamType.LATLNG)  # type: ignore[union-attr]
+                for stream in session.exec(statement):
+                    if any(spatial.haversine_m(lat, lng, point_lat, point_lng) <= radius_m for point_lat, point_lng in stream.coordinates):
+                        near_ids.append(stream.activity_id)
+                session.expunge_all()
+            return self._get_summaries(session, near_ids)  # type: ignore[arg-type]
+
+    @metrics.timed("db_operation")
+    def get_stream_values(self, activity_id: int, stream_type: StreamType) -> list[float]:
+        """Get the raw samples of a stream, ordered by index.
+
+        Args:
+            activity_id: ID of the activity
+            stream_type: Type of the stream
+
+        Returns:
+            List of samples, raises an error if the stream does not exist
+        """
+        if self.cache is None:
+            return self._load_stream_values(activity_id, stream_type)
+
+        key = ("values", activity_id, stream_type)
+        values = self.cache.get(key)
+        if values is None:
+            # decode from a cached activity before going to the database
+            activity = self.cache.get(activity_key(activity_id))
+            stream = next((stream for stream in activity.streams or [] if stream.stream_type == stream_type), None) if activity is not None else None
+            values = stream.values if stream is not None and stream.payload is not None else self._load_stream_values(activity_id, stream_type)
+            self.cache.put(key, values, values_size(values))
+        return values
+
+    def _load_stream_values(self, activity_id: int, stream_type: StreamType) -> list[float]:
+        with sqlmodel.Session(self.engine) as session:
+            statement = sqlmodel.select(Stream.id, Stream.payload).where(Stream.activity_id == activity_id, Stream.stream_type == stream_type)
+            row = session.exec(statement).first()
+            if row is None:
+                raise ValueError(f"Activity {activity_id} has no {stream_type} stream in the database")
+
+            stream_id, payload = row
+            if payload is not None:
+                return decode_stream(payload)
+
+            # legacy stream stored as one row per sample
+            entries = sqlmodel.select(StreamEntry.stream_entry).where(StreamEntry.stream_id == stream_id).order_by(sqlmodel.col(StreamEntry.index))
+            return list(session.exec(entries))
+
+    @metrics.timed("db_operation")
+    def get_stream_slice(self, activity_id: int, stream_type: StreamType, start: int = 0, end: int | None = None) -> list[float]:
+        """Get the samples [start, end) of a stream.
+
+        With a stream store only the slice is read from the mapped file, otherwise the
+        stream is decoded (payloads are delta encoded) and sliced, through the cache if there is one.
+
+        Args:
+            activity_id: ID of the activity
+            stream_type: Type of the stream
+            start: Index of the first sample
+            end: Index after the last sample (default: end of the stream)
+
+        Returns:
+            List of samples, raises an error if the stream does not exist
+        """
+        if self.stream_store is not None and self.stream_store.has(activity_id, stream_type):
+            return self.stream_store.view(activity_id, stream_type)[start:end].tolist()  # type: ignore[return-value]  # "d" views hold floats
+        return self.get_stream_values(activity_id, stream_type)[start:end]
+
+    def get_stream_view(self, activity_id: int, stream_type: StreamType) -> "memoryview[float]":
+        """Get the samples of a stream as a zero-copy float64 view into the stream store.
+
+        Streams missing from the store are loaded from the database and added to it.
+
+        Args:
+            activity_id: ID of the activity
+            stream_type: Type of the stream
+
+        Returns:
+            View of the samples, wrap it with streamstore.as_numpy() or as_arrow() for vectorized work
+        """
+        if self.stream_store is None:
+            raise ValueError("StrideDBService has no stream store")
+        if not self.stream_store.has(activity_id, stream_type):
+            self.stream_store.append(activity_id, stream_type, self.get_stream_values(activity_id, stream_type))
+        return self.stream_store.view(activity_id, stream_type)
+
+    @metrics.timed("db_operation")
+    def build_stream_store(self, store: StreamStore | None = None, batch_size: int = 500) -> int:
+        """Copy all streams from the database into a stream store.
+
+        Reads only the stream payloads, in batches, so the history never has to fit in memory as ORM objects.
+
+        Args:
+            store: Store to fill (default: the store of this service)
+            batch_size: Number of streams read per batch
+
+        Returns:
+            Number of streams copied
+        """
+        store = store or self.stream_store
+        if store is None:
+            raise ValueError("No stream store to build")
+
+        n_streams = 0
+        legacy: list[tuple[int, StreamType]] = []
+        with sqlmodel.Session(self.engine) as session:
+            statement = sqlmodel.select(Stream.activity_id, Stream.stream_type, Stream.payload).order_by(sqlmodel.col(Stream.activity_id)).execution_options(yield_per=batch_size)
+            for activity_id, stream_type, payload in session.exec(statement):
+                if activity_id is None:
+                    continue
+                if payload is None:
+                    legacy.append((activity_id, StreamType(stream_type)))
+                    continue
+                store.append(activity_id, StreamType(stream_type), decode_stream(payload))
+                n_streams += 1
+        for activity_id, stream_type in legacy:
+            store.append(activity_id, stream_type, self._load_stream_values(activity_id, stream_type))
+            n_streams += 1
+        logger.info(f"Copied {n_streams} streams into the stream store at {store.root}")
+        return n_streams
+
+    @metrics.timed("db_operation")
+    def get_training_volume(
+        self,
+        period: RollupPeriod = RollupPeriod.WEEK,
+        athlete_id: int | None = None,
+        start: date | None = None,
+        end: date | None = None,
+        sport: str | None = None,
+        by_sport: bool = False,
+    ) -> pl.DataFrame:
+        """Get training volume, load and heartrate zone times per day, week or month.
+
+        Read from the rollups maintained on every save, so years of history are a few hundred rows.
+
+        Args:
+            period: Day, week or month
+            athlete_id: Only this athlete (default: all)
+            start: First period start to include
+            end: Last period start to include
+            sport: Only this sport (default: all)
+            by_sport: One row per period and sport instead of per period
+
+        Returns:
+            DataFrame with period_start, (sport,) count, distance, moving_time, load and zone1_s to zone5_s
+        """
+        with sqlmodel.Session(self.engine) as session:
+            return training.volume(session, period, athlete_id, start, end, sport, by_sport)
+
+    @metrics.timed("db_operation")
+    def get_zone_distribution(self, period: RollupPeriod = RollupPeriod.WEEK, athlete_id: int | None = None, start: date | None = None, end: date | None = None) -> pl.DataFrame:
+        """Get the share of time per heartrate zone per day, week or month.
+
+        Returns:
+            DataFrame with period_start and zone1 to zone5
+        """
+        with sqlmodel.Session(self.engine) as session:
+            return training.zone_distribution(session, period, athlete_id, start, end)
+
+    @metrics.timed("db_operation")
+    def get_fitness(self, athlete_id: int | None = None, start: date | None = None, end: date | None = None) -> pl.DataFrame:
+        """Get the daily CTL (fitness), ATL (fatigue), TSB (form) and acute:chronic workload ratio.
+
+        Args:
+            athlete_id: Only this athlete (default: all)
+            start: First day to include
+            end: Last day to include
+
+        Returns:
+            DataFrame with day, load, ctl, atl, tsb, acute, chronic and acwr
+        """
+        with sqlmodel.Session(self.engine) as session:
+            return training.fitness(session, athlete_id, start, end)
+
+    @metrics.timed("db_operation")
+    def rebuild_training_rollups(self, batch_size: int = 200) -> int:
+        """Recompute the training rollups of all activities, e.g. for activities saved before rollups existed.
+
+        Args:
+            batch_size: Number of activities (with streams) loaded at a time
+
+        Returns:
+            Number of activities indexed
+        """
+        with sqlmodel.Session(self.engine) as session:
+            training.clear(session)
+            activity_ids = list(session.exec(sqlmodel.select(Activity.id).order_by(sqlmodel.col(Activity.id))))
+            for start in range(0, len(activity_ids), batch_size):
+                statement = sqlmodel.select(Activity).options(selectinload(Activity.streams)).where(sqlmodel.col(Activity.id).in_(activity_ids[start : start + batch_size]))  # type: ignore[arg-type]
+                for activity in session.exec(statement):
+                    training.index_activity(session, activity)
+                session.flush()
+                session.expunge_all()
+            session.commit()
+        logger.info(f"Rebuilt the training rollups of {len(activity_ids)} activities")
+        return len(activity_ids)
+
+    @metrics.timed("db_operation")
+    def get_downsampled_stream(
+        self,
+        activity_id: int,
+        stream_type: StreamType,
+        n_points: int = 800,
+        method: DownsampleMethod = DownsampleMethod.LTTB,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> DownsampledStream:
+        """Get a stream reduced to n_points representative points.
+
+        The multi-resolution pyramid of the stream is built on first access and cached
+        (the MAX_CACHED_PYRAMIDS most recently used ones), so subsequent requests (e.g.
+        zooming into [start, end)) don't rescan raw samples.
+
+        Args:
+            activity_id: ID of the activity
+            stream_type: Type of the stream
+            n_points: Number of points to return
+            method: Downsampling method
+            start: First sample index of the window
+            end: Sample index after the last one of the window
+
+        Returns:
+            Downsampled stream, raises a ValueError for a missing stream or an invalid n_points or window
+        """
+        if stream_type == StreamType.LATLNG:
+            raise ValueError("latlng streams hold coordinate pairs and can't be downsampled as a series")
+
+        key = (activity_id, stream_type)
+        with self._pyramids_lock:
+            pyramid = self._pyramids.get(key)
+            if pyramid is not None:
+                self._pyramids.move_to_end(key)
+        if pyramid is None:
+            # built outside the lock, concurrent first requests of a stream may both build it
+            pyramid = StreamPyramid(self.get_stream_values(activity_id, stream_type))
+            with self._pyramids_lock:
+                self._pyramids[key] = pyramid
+                while len(self._pyramids) > MAX_CACHED_PYRAMIDS:
+                    self._pyramids.popitem(last=False)
+
+        indices, values = pyramid.query(n_points, method=method, start=start, end=end)
+        return DownsampledStream(activity_id=activity_id, stream_type=stream_type, method=method, indices=indices, values=values)
+
+    @metrics.timed("db_operation")
+    def get_downsampled_streams(
+        self,
+        activity_id: int,
+        n_points: int = 800,
+        method: DownsampleMethod = DownsampleMethod.LTTB,
+    ) -> list[DownsampledStream]:
+        """Get all streams of an activity reduced to n_points representative points each.
+
+        Args:
+            activity_id: ID of the activity
+            n_points: Number of points to return per stream
+            method: Downsampling method
+
+        Returns:
+            List of downsampled streams, raises a ValueError if the activity does not exist
+        """
+        with sqlmodel.Session(self.engine) as session:
+            if session.get(Activity, activity_id) is None:
+                raise ValueError(f"Activity {activity_id} not found in the database")
+            statement = sqlmodel.select(Stream.stream_type).where(Stream.activity_id == activity_id, Stream.stream_type != StreamType.LATLNG)
+            stream_types = list(session.exec(statement))
+        return [self.get_downsampled_stream(activity_id, StreamType(stream_type), n_points=n_points, method=method) for stream_type in stream_types]
+
 
 if __name__ == "__main__":
     from rich import print as pprint
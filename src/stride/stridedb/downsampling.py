@@ -0,0 +1,186 @@
+import bisect
+from enum import StrEnum
+from typing import Sequence
+
+import pydantic
+
+from stride.enums import StreamType
+
+# Levels of a pyramid stop halving once they reach this many points
+MIN_PYRAMID_LEVEL_POINTS = 256
+
+# A pyramid level is only used if it holds at least this many points per requested output point
+PYRAMID_OVERSAMPLING = 4
+
+# LTTB keeps the first and last point plus at least one bucket, fewer points can't be downsampled
+MIN_DOWNSAMPLE_POINTS = 3
+
+
+class DownsampleMethod(StrEnum):
+    """Method used to reduce a stream to a fixed number of points."""
+
+    LTTB = "lttb"
+    MIN_MAX = "min_max"
+
+
+class DownsampledStream(pydantic.BaseModel):
+    """A stream reduced to a number of representative points."""
+
+    activity_id: int
+    stream_type: StreamType
+    method: DownsampleMethod
+    indices: list[int]
+    values: list[float]
+
+
+def lttb(indices: Sequence[int], values: Sequence[float], n_points: int) -> tuple[list[int], list[float]]:
+    """Downsample a series with the Largest-Triangle-Three-Buckets algorithm.
+
+    The first and last points are always kept. Every bucket in between contributes
+    the point that forms the largest triangle with the previously selected point
+    and the average of the next bucket.
+
+    Args:
+        indices: x values of the series (sample index), sorted ascending
+        values: y values of the series
+        n_points: Number of points to return
+
+    Returns:
+        Tuple of selected indices and values
+    """
+    length = len(values)
+    if n_points >= length or n_points < 3:
+        return list(indices), list(values)
+
+    bucket_size = (length - 2) / (n_points - 2)
+    selected_indices = [indices[0]]
+    selected_values = [values[0]]
+    a = 0
+
+    for bucket in range(n_points - 2):
+        # average of the next bucket (the last point for the final bucket)
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, length)
+        next_count = next_end - next_start
+        avg_x = sum(indices[next_start:next_end]) / next_count
+        avg_y = sum(values[next_start:next_end]) / next_count
+
+        # pick the point in the current bucket forming the largest triangle
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        a_x, a_y = indices[a], values[a]
+        max_area = -1.0
+        max_position = start
+        for position in range(start, end):
+            area = abs((a_x - avg_x) * (values[position] - a_y) - (a_x - indices[position]) * (avg_y - a_y))
+            if area > max_area:
+                max_area = area
+                max_position = position
+
+        selected_indices.append(indices[max_position])
+        selected_values.append(values[max_position])
+        a = max_position
+
+    selected_indices.append(indices[-1])
+    selected_values.append(values[-1])
+    return selected_indices, selected_values
+
+
+def min_max(indices: Sequence[int], values: Sequence[float], n_points: int) -> tuple[list[int], list[float]]:
+    """Downsample a series by keeping the minimum and maximum of each bucket.
+
+    The series is split into n_points / 2 buckets, and the extremes of every bucket
+    are kept in their original order, so peaks are never lost.
+
+    Args:
+        indices: x values of the series (sample index), sorted ascending
+        values: y values of the series
+        n_points: Number of points to return
+
+    Returns:
+        Tuple of selected indices and values
+    """
+    length = len(values)
+    if n_points >= length or n_points < 2:
+        return list(indices), list(values)
+
+    n_buckets = n_points // 2
+    bucket_size = length / n_buckets
+    selected_indices: list[int] = []
+    selected_values: list[float] = []
+
+    for bucket in range(n_buckets):
+        start = int(bucket * bucket_size)
+        end = min(int((bucket + 1) * bucket_size), length)
+        if start >= end:
+            continue
+        bucket_values = values[start:end]
+        low = start + min(range(end - start), key=bucket_values.__getitem__)
+        high = start + max(range(end - start), key=bucket_values.__getitem__)
+        for position in sorted({low, high}):
+            selected_indices.append(indices[position])
+            selected_values.append(values[position])
+
+    return selected_indices, selected_values
+
+
+DOWNSAMPLERS = {
+    DownsampleMethod.LTTB: lttb,
+    DownsampleMethod.MIN_MAX: min_max,
+}
+
+
+class StreamPyramid:
+    """Multi-resolution representation of a single stream.
+
+    Level 0 holds the raw samples, and every following level halves the number of
+    points with min/max decimation, so extremes survive all the way up. Requests
+    for a zoom window are served from the coarsest level that still has enough
+    points in that window, which avoids rescanning the raw samples.
+    """
+
+    def __init__(self, values: Sequence[float]):
+        indices = list(range(len(values)))
+        self.levels: list[tuple[list[int], list[float]]] = [(indices, list(values))]
+        while len(self.levels[-1][1]) > MIN_PYRAMID_LEVEL_POINTS:
+            level_indices, level_values = self.levels[-1]
+            self.levels.append(min_max(level_indices, level_values, len(level_values) // 2))
+
+    def __len__(self) -> int:
+        return len(self.levels[0][1])
+
+    def query(
+        self,
+        n_points: int,
+        method: DownsampleMethod = DownsampleMethod.LTTB,
+        start: int | None = None,
+        end: int | None = None,
+    ) -> tuple[list[int], list[float]]:
+        """Get n_points representative points for the sample range [start, end).
+
+        Args:
+            n_points: Number of points to return
+            method: Downsampling method to apply on the selected level
+            start: First sample index of the window (default: start of the stream)
+            end: Sample index after the last one of the window (default: end of the stream)
+
+        Returns:
+            Tuple of selected sample indices and values
+        """
+        start = 0 if start is None else start
+        end = len(self) if end is None else min(end, len(self))
+        if n_points < MIN_DOWNSAMPLE_POINTS:
+            raise ValueError(f"Can't downsample to fewer than {MIN_DOWNSAMPLE_POINTS} points, got {n_points}")
+        if start < 0 or start >= end:
+            raise ValueError(f"Invalid sample window [{start}, {end}) of a stream with {len(self)} samples")
+
+        # walk from coarse to fine and take the first level dense enough for the request
+        for level_indices, level_values in reversed(self.levels[1:]):
+            left = bisect.bisect_left(level_indices, start)
+            right = bisect.bisect_left(level_indices, end)
+            if right - left >= n_points * PYRAMID_OVERSAMPLING:
+                return DOWNSAMPLERS[method](level_indices[left:right], level_values[left:right], n_points)
+
+        # raw samples: indices equal positions
+        raw_indices, raw_values = self.levels[0]
+        return DOWNSAMPLERS[method](raw_indices[start:end], raw_values[start:end], n_points)
@@ -0,0 +1,220 @@
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+import pydantic
+import sqlalchemy
+import sqlmodel
+from loguru import logger
+
+from stride import metrics
+from stride.enums import StreamType
+from stride.stridedb.codecs import decode_stream
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.models import Activity, Stream
+
+STATE_FILE = "_stride_export.json"
+
+# rows per row group, small enough that min/max statistics of activity_id and
+# sample_index let readers skip most of a file, large enough to compress well
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+
+# activities without an athlete (file imports) or start date go to partition 0
+UNKNOWN = 0
+
+ACTIVITY_SCHEMA: dict[str, Any] = {
+    "id": pl.Int64,
+    "provider": pl.String,
+    "provider_activity_id": pl.Int64,
+    "distance": pl.Float64,
+    "moving_time": pl.Int64,
+    "duration": pl.Int64,
+    "start_date": pl.Datetime("us", "UTC"),
+    "sport": pl.String,
+    "updated_at": pl.Datetime("us", "UTC"),
+}
+
+# latlng streams are split into lat and lng columns
+STREAM_COLUMNS = [stream_type.value for stream_type in StreamType if stream_type != StreamType.LATLNG] + ["lat", "lng"]
+STREAM_SCHEMA: dict[str, Any] = {"activity_id": pl.Int64, "sample_index": pl.Int64} | {column: pl.Float64 for column in STREAM_COLUMNS}
+
+Partition = tuple[int, int, int]  # athlete, year, month
+
+
+def partition_path(partition: Partition) -> str:
+    athlete, year, month = partition
+    return f"athlete={athlete}/year={year}/month={month}"
+
+
+class ExportResult(pydantic.BaseModel):
+    """What an export run wrote."""
+
+    written: list[str]
+    removed: list[str]
+    unchanged: int
+    activities: int
+    samples: int
+
+
+class ParquetExporter:
+    """Exports activities and streams to a Hive-partitioned Parquet dataset.
+
+    Layout, partitioned by athlete, year and month of the start date:
+        <root>/activities/athlete=<id>/year=<yyyy>/month=<m>/data.parquet (one row per activity)
+        <root>/streams/athlete=<id>/year=<yyyy>/month=<m>/data.parquet (one row per sample, a column per stream type)
+
+    Exports are incremental: a fingerprint of every partition (count, id checksum and last
+    update of its activities) is computed with one aggregate query and compared to the
+    fingerprints of the last export, only partitions that differ are rewritten, and
+    partitions whose activities are all gone are removed.
+
+    Args:
+        db_service: Database to export
+        root: Directory of the dataset
+        row_group_size: Maximum rows per Parquet row group
+    """
+
+    def __init__(self, db_service: StrideDBService, root: Path, row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+        self.db_service = db_service
+        self.root = Path(root)
+        self.row_group_size = row_group_size
+
+    def _partition_columns(self) -> tuple[Any, Any, Any]:
+        year = sqlalchemy.func.coalesce(sqlalchemy.extract("year", sqlmodel.col(Activity.start_date)), UNKNOWN)
+        month = sqlalchemy.func.coalesce(sqlalchemy.extract("month", sqlmodel.col(Activity.start_date)), UNKNOWN)
+        return sqlalchemy.func.coalesce(Activity.athlete_id, UNKNOWN), year, month
+
+    def fingerprints(self) -> dict[Partition, list[Any]]:
+        """Get [count, sum of ids, last update] of the activities in every partition."""
+        athlete, year, month = self._partition_columns()
+        statement = sqlmodel.select(  # type: ignore[call-overload]  # sqlmodel types selects of up to four columns
+            athlete, year, month, sqlalchemy.func.count(), sqlalchemy.func.sum(Activity.id), sqlalchemy.func.max(Activity.updated_at)
+        ).group_by(athlete, year, month)
+        with sqlmodel.Session(self.db_service.engine) as session:
+            return {(int(athlete_id), int(year_), int(month_)): [count, id_sum, str(updated_at) if updated_at is not None else None] for athlete_id, year_, month_, count, id_sum, updated_at in session.exec(statement)}
+
+    def load_state(self) -> dict[str, Any]:
+        path = self.root / STATE_FILE
+        return json.loads(path.read_text()) if path.exists() else {"partitions": {}}
+
+    def _save_state(self, state: dict[str, Any]) -> None:
+        path = self.root / STATE_FILE
+        path.with_suffix(".tmp").write_text(json.dumps(state, indent=2))
+        os.replace(path.with_suffix(".tmp"), path)
+
+    def _activity_frame(self, session: sqlmodel.Session, partition: Partition) -> pl.DataFrame:
+        athlete, year, month = self._partition_columns()
+        statement = sqlmodel.select(*(getattr(Activity, column) for column in ACTIVITY_SCHEMA)).where(athlete == partition[0], year == partition[1], month == partition[2]).order_by(Activity.start_date, Activity.id)
+        rows = [
+            {
+                **row._asdict(),
+                "start_date": _utc(row.start_date),
+                "updated_at": _utc(row.updated_at),
+            }
+            for row in session.exec(statement)
+        ]
+        return pl.DataFrame(rows, schema=ACTIVITY_SCHEMA, orient="row")
+
+    def _stream_frame(self, session: sqlmodel.Session, activity_ids: list[int]) -> pl.DataFrame:
+        """Build one row per sample, ordered by activity and sample index, from the stream payloads."""
+        frames = []
+        columns: dict[int, dict[str, list[float]]] = {activity_id: {} for activity_id in activity_ids}
+        statement = sqlmodel.select(Stream.activity_id, Stream.stream_type, Stream.payload).where(Stream.activity_id.in_(activity_ids))  # type: ignore[union-attr]
+        for activity_id, stream_name, payload in session.exec(statement):
+            if activity_id is None:
+                continue
+            stream_type = StreamType(stream_name)
+            values = decode_stream(payload) if payload is not None else self.db_service.get_stream_values(activity_id, stream_type)
+            if stream_type == StreamType.LATLNG:
+                columns[activity_id]["lat"], columns[activity_id]["lng"] = values[0::2], values[1::2]
+            else:
+                columns[activity_id][stream_type.value] = values
+
+        for activity_id in activity_ids:
+            streams = columns[activity_id]
+            n_samples = max((len(values) for values in streams.values()), default=0)
+            if n_samples == 0:
+                continue
+            frame: dict[str, list[Any]] = {"activity_id": [activity_id] * n_samples, "sample_index": list(range(n_samples))}
+            for column in STREAM_COLUMNS:
+                values = streams.get(column, [])
+                frame[column] = values + [None] * (n_samples - len(values))
+            frames.append(pl.DataFrame(frame, schema=STREAM_SCHEMA))
+        return pl.concat(frames) if frames else pl.DataFrame(schema=STREAM_SCHEMA)
+
+    def _write(self, frame: pl.DataFrame, directory: Path) -> None:
+        """Replace the data file of a partition directory."""
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = directory / ".data.parquet.tmp"
+        frame.write_parquet(tmp_path, row_group_size=self.row_group_size, statistics=True)
+        os.replace(tmp_path, directory / "data.parquet")
+
+    @metrics.timed("export")
+    def export(self, full: bool = False) -> ExportResult:
+        """Write the partitions that changed since the last export.
+
+        Args:
+            full: Rewrite every partition
+
+        Returns:
+            Partitions written and removed, and the number of activities and samples written
+        """
+        if full:
+            for dataset in ("activities", "streams"):
+                shutil.rmtree(self.root / dataset, ignore_errors=True)
+        state = {} if full else self.load_state()["partitions"]
+        current = {partition_path(partition): (partition, fingerprint) for partition, fingerprint in self.fingerprints().items()}
+        changed = [partition for path, (partition, fingerprint) in current.items() if state.get(path) != fingerprint]
+        removed = [path for path in state if path not in current]
+
+        n_activities = n_samples = 0
+        new_state = {path: fingerprint for path, fingerprint in state.items() if path in current}
+        with sqlmodel.Session(self.db_service.engine) as session:
+            for partition in sorted(changed):
+                path = partition_path(partition)
+                activities = self._activity_frame(session, partition)
+                streams = self._stream_frame(session, activities["id"].to_list())
+                self._write(activities, self.root / "activities" / path)
+                self._write(streams, self.root / "streams" / path)
+                n_activities += len(activities)
+                n_samples += len(streams)
+                new_state[path] = current[path][1]
+                self._save_state({"partitions": new_state, "exported_at": datetime.now(timezone.utc).isoformat()})
+                logger.debug(f"Exported {len(activities)} activities and {len(streams)} samples to {path}")
+
+        for path in removed:
+            for dataset in ("activities", "streams"):
+                shutil.rmtree(self.root / dataset / path, ignore_errors=True)
+        self._save_state({"partitions": new_state, "exported_at": datetime.now(timezone.utc).isoformat()})
+
+        result = ExportResult(
+            written=[partition_path(partition) for partition in sorted(changed)],
+            removed=removed,
+            unchanged=len(current) - len(changed),
+            activities=n_activities,
+            samples=n_samples,
+        )
+        logger.info(f"Exported {len(result.written)} partitions ({n_activities} activities), removed {len(removed)}, {result.unchanged} unchanged")
+        return result
+
+
+def _utc(value: datetime | None) -> datetime | None:
+    """SQLite returns naive datetimes, they are stored in UTC."""
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+def scan_export(root: Path, dataset: str = "activities") -> pl.LazyFrame:
+    """Lazily read an exported dataset, filters on athlete, year and month prune partitions.
+
+    Args:
+        root: Directory of the export
+        dataset: "activities" or "streams"
+
+    Returns:
+        LazyFrame with the partition columns athlete, year and month
+    """
+    return pl.scan_parquet(Path(root) / dataset / "**" / "*.parquet", hive_partitioning=True)
@@ -0,0 +1,152 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+import pydantic
+import sqlmodel
+from loguru import logger
+
+from stride import metrics
+from stride.enums import Provider
+from stride.provider.files.models import ActivityFile
+from stride.provider.files.reader import read_activity_file
+from stride.provider.strava.archive import StravaArchive, StravaArchiveEntry
+from stride.stridedb.converters.files import ActivityFileConverter
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.sharding import ShardedStrideDBService
+from stride.stridedb.models import ImportedFile
+
+
+class ImportSummary(pydantic.BaseModel):
+    """Result of an archive import."""
+
+    files_total: int = 0
+    files_imported: int = 0
+    files_skipped: int = 0  # imported by a previous run
+    files_failed: int = 0
+    samples: int = 0
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files_imported / self.seconds if self.seconds else 0.0
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.samples / self.seconds if self.seconds else 0.0
+
+
+def _parse_archive_file(data: bytes, filename: str, activity_id: int, activity_type: str | None) -> ActivityFile:
+    """Parse one recording, module level so it can run in worker processes."""
+    activity_file = read_activity_file(data, filename, Provider.STRAVA, provider_activity_id=activity_id)
+    if activity_type:
+        activity_file.sport = activity_type
+    return activity_file
+
+
+class ArchiveImporter:
+    """Imports the recordings of a Strava bulk export archive into stridedb.
+
+    The zip is streamed member by member, recordings are parsed in a process pool
+    (with a bounded number in flight to cap memory), converted with the
+    ActivityFileConverter and saved in batches. Files are recorded by checksum
+    once saved, so a rerun after an interruption skips everything already imported.
+    """
+
+    def __init__(
+        self,
+        db_service: StrideDBService | ShardedStrideDBService,
+        max_workers: int | None = None,
+        batch_size: int = 50,
+        progress_every: int = 100,
+    ):
+        self.db_service = db_service
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.progress_every = progress_every
+        self.converter = ActivityFileConverter(Provider.STRAVA)
+
+    def _imported_checksums(self) -> set[str]:
+        with sqlmodel.Session(self.db_service.engine) as session:
+            return set(session.exec(sqlmodel.select(ImportedFile.checksum)))
+
+    def _save_batch(self, batch: list[tuple[StravaArchiveEntry, ActivityFile]]) -> None:
+        """Convert and save parsed files and mark them as imported."""
+        with metrics.span("convert", provider=Provider.STRAVA) as span:
+            activities = self.converter.convert_batch(self.converter.to_batch([activity_file for _, activity_file in batch]))
+            span.add("activities", len(activities))
+            span.add("samples", sum(activity_file.sample_count for _, activity_file in batch))
+        self.db_service.save_activities(activities, verbose=False)
+        with sqlmodel.Session(self.db_service.engine) as session:
+            session.add_all([ImportedFile(checksum=entry.checksum, filename=entry.filename, provider=Provider.STRAVA, provider_activity_id=entry.activity_id) for entry, _ in batch if entry.checksum and entry.filename])
+            session.commit()
+
+    def import_strava_archive(self, path: str | Path) -> ImportSummary:
+        """Import all recordings of a Strava bulk export archive.
+
+        Args:
+            path: Path of the export zip
+
+        Returns:
+            ImportSummary with counts and throughput
+        """
+        summary = ImportSummary()
+        start = time.perf_counter()
+
+        with StravaArchive(path) as archive:
+            entries = [entry for entry in archive.entries() if entry.filename is not None]
+            done = self._imported_checksums()
+            pending = [entry for entry in entries if entry.checksum not in done]
+            summary.files_total = len(entries)
+            summary.files_skipped = len(entries) - len(pending)
+            logger.info(f"Importing {len(pending)} of {len(entries)} recordings from {path} ({summary.files_skipped} already imported)")
+
+            batch: list[tuple[StravaArchiveEntry, ActivityFile]] = []
+
+            def handle(entry: StravaArchiveEntry, parse: Callable[[], ActivityFile]) -> None:
+                try:
+                    activity_file = parse()
+                except Exception as e:
+                    summary.files_failed += 1
+                    logger.warning(f"Failed to parse {entry.filename}: {str(e)[:100]}")
+                    return
+
+                batch.append((entry, activity_file))
+                summary.samples += activity_file.sample_count
+                summary.files_imported += 1
+
+                if len(batch) >= self.batch_size:
+                    self._save_batch(batch)
+                    batch.clear()
+                processed = summary.files_imported + summary.files_failed
+                if processed % self.progress_every == 0:
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"{processed}/{len(pending)} recordings, {processed / elapsed:.1f} files/s, {summary.samples / elapsed:.0f} samples/s")
+
+            if self.max_workers == 1:
+                for entry in pending:
+                    data = archive.read(entry)
+                    handle(entry, lambda: _parse_archive_file(data, entry.filename or "", entry.activity_id, entry.activity_type))
+            else:
+                in_flight: deque[tuple[StravaArchiveEntry, Future[ActivityFile]]] = deque()
+                with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                    for entry in pending:
+                        in_flight.append((entry, executor.submit(_parse_archive_file, archive.read(entry), entry.filename or "", entry.activity_id, entry.activity_type)))
+                        if len(in_flight) >= 4 * self.max_workers:
+                            entry, parse = in_flight.popleft()
+                            handle(entry, parse.result)
+                    while in_flight:
+                        entry, parse = in_flight.popleft()
+                        handle(entry, parse.result)
+
+            if batch:
+                self._save_batch(batch)
+
+        summary.seconds = time.perf_counter() - start
+        logger.info(
+            f"Imported {summary.files_imported} recordings ({summary.files_failed} failed, {summary.files_skipped} skipped) in {summary.seconds:.1f}s, {summary.files_per_second:.1f} files/s, {summary.samples_per_second:.0f} samples/s"
+        )
+        return summary
@@ -0,0 +1,334 @@
+import time
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple
+
+import pydantic
+import sqlalchemy
+import sqlmodel
+from loguru import logger
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import selectinload
+from sqlalchemy.schema import CreateTable
+
+from stride.enums import StreamMask, StreamType
+from stride.stridedb import similarity, spatial, training
+from stride.stridedb.codecs import encode_stream
+from stride.stridedb.models import Activity, ActivityFingerprint, ActivityLoad, MigrationKind, ProviderActivityLink, SchemaVersion, Stream, StreamEntry
+
+# rows of the driving table per data migration batch, every batch is its own short
+# transaction so readers (and writers, between batches) are not blocked for long
+DEFAULT_BATCH_SIZE = 200
+
+# schema migration: DDL on an open connection
+SchemaFunction = Callable[[sqlalchemy.Connection], None]
+
+# data migration batch: handles the rows after the cursor, returns the new cursor or None when done
+DataFunction = Callable[[sqlmodel.Session, int, int], int | None]
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    kind: MigrationKind
+    function: SchemaFunction | DataFunction
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def schema_migration(version: int, name: str) -> Callable[[SchemaFunction], SchemaFunction]:
+    """Register a schema migration, it must be idempotent: databases created before versioning run all of them."""
+
+    def decorator(function: SchemaFunction) -> SchemaFunction:
+        MIGRATIONS.append(Migration(version, name, MigrationKind.SCHEMA, function))
+        return function
+
+    return decorator
+
+
+def data_migration(version: int, name: str) -> Callable[[DataFunction], DataFunction]:
+    """Register a data migration, a function that migrates one batch of rows after a cursor."""
+
+    def decorator(function: DataFunction) -> DataFunction:
+        MIGRATIONS.append(Migration(version, name, MigrationKind.DATA, function))
+        return function
+
+    return decorator
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# DDL helpers, SQLite can add columns but not change or drop constraints
+
+
+def column_names(connection: sqlalchemy.Connection, table: str) -> set[str]:
+    return {column["name"] for column in sqlalchemy.inspect(connection).get_columns(table)}
+
+
+def add_column(connection: sqlalchemy.Connection, table: str, name: str, definition: str) -> None:
+    """Add a column if the table does not have it yet, e.g. add_column(connection, "stream", "sample_count", "INTEGER NOT NULL DEFAULT 0")."""
+    if name not in column_names(connection, table):
+        connection.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {definition}')
+
+
+def create_indexes(connection: sqlalchemy.Connection, table: sqlalchemy.Table) -> None:
+    """Create the indexes of a model's table that do not exist yet."""
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def rebuild_table(connection: sqlalchemy.Connection, table: sqlalchemy.Table) -> None:
+    """Recreate a table with the definition of its model, keeping the rows (columns both versions have).
+
+    The way SQLite changes constraints: create the new table, copy, drop the old one and
+    rename the new one, so foreign keys of other tables keep pointing at the table name.
+    """
+    new_name = f"_new_{table.name}"
+    copied = ", ".join(f'"{name}"' for name in sorted(column_names(connection, table.name) & set(table.columns.keys())))
+    ddl = str(CreateTable(table).compile(dialect=connection.dialect)).replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {new_name} ", 1)
+    connection.exec_driver_sql(ddl)
+    connection.exec_driver_sql(f'INSERT INTO "{new_name}" ({copied}) SELECT {copied} FROM "{table.name}"')
+    connection.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    connection.exec_driver_sql(f'ALTER TABLE "{new_name}" RENAME TO "{table.name}"')
+    create_indexes(connection, table)
+
+
+# schema migrations
+
+
+@schema_migration(1, "create_missing_tables")
+def create_missing_tables(connection: sqlalchemy.Connection) -> None:
+    """Create the tables added since the database was created (links, indexes, queues, rollups, ...)."""
+    sqlmodel.SQLModel.metadata.create_all(connection)
+
+
+@schema_migration(2, "drop_unique_provider_activity_id")
+def drop_unique_provider_activity_id(connection: sqlalchemy.Connection) -> None:
+    """Allow one provider activity id per provider instead of one overall, provider ids are mapped by ProviderActivityLink."""
+    unique = any(index["unique"] and index["column_names"] == ["provider_activity_id"] for index in sqlalchemy.inspect(connection).get_indexes("activity"))
+    unique_constraint = any(constraint["column_names"] == ["provider_activity_id"] for constraint in sqlalchemy.inspect(connection).get_unique_constraints("activity"))
+    if unique or unique_constraint:
+        rebuild_table(connection, Activity.__table__)  # type: ignore[attr-defined]
+
+
+@schema_migration(3, "add_activity_summary_columns")
+def add_activity_summary_columns(connection: sqlalchemy.Connection) -> None:
+    add_column(connection, "activity", "start_date", "DATETIME")
+    add_column(connection, "activity", "sport", "VARCHAR")
+    add_column(connection, "activity", "athlete_id", "INTEGER")
+    add_column(connection, "activity", "updated_at", "DATETIME")
+    create_indexes(connection, Activity.__table__)  # type: ignore[attr-defined]
+
+
+@schema_migration(4, "add_stream_payload")
+def add_stream_payload(connection: sqlalchemy.Connection) -> None:
+    add_column(connection, "stream", "payload", "BLOB")
+    add_column(connection, "stream", "sample_count", "INTEGER NOT NULL DEFAULT 0")
+
+
+@schema_migration(9, "add_activity_stream_mask")
+def add_activity_stream_mask(connection: sqlalchemy.Connection) -> None:
+    add_column(connection, "activity", "stream_mask", "INTEGER NOT NULL DEFAULT 0")
+    # backfill in the same transaction, has_* reads the mask as soon as the column exists;
+    # stream types are stored by name and every type has its own bit, so the sum of the distinct bits is the mask
+    stream = sqlalchemy.table("stream", sqlalchemy.column("activity_id"), sqlalchemy.column("stream_type"))
+    activity = sqlalchemy.table("activity", sqlalchemy.column("id"), sqlalchemy.column("stream_mask"))
+    bit = sqlalchemy.case({stream_type.name: int(StreamMask[stream_type.name]) for stream_type in StreamType}, value=stream.c.stream_type, else_=0)
+    mask = sqlalchemy.select(sqlalchemy.func.coalesce(sqlalchemy.func.sum(bit.distinct()), 0)).where(stream.c.activity_id == activity.c.id).scalar_subquery()
+    connection.execute(activity.update().values(stream_mask=mask))
+
+
+# data migrations
+
+
+@data_migration(5, "link_provider_activities")
+def link_provider_activities(session: sqlmodel.Session, cursor: int, batch_size: int) -> int | None:
+    """Map the provider ids of activities saved before ProviderActivityLink existed."""
+    statement = sqlmodel.select(Activity.id, Activity.provider, Activity.provider_activity_id).where(sqlmodel.col(Activity.id) > cursor).order_by(sqlmodel.col(Activity.id)).limit(batch_size)
+    rows = list(session.exec(statement))
+    if not rows:
+        return None
+    links = [{"provider": provider, "provider_activity_id": provider_activity_id, "activity_id": activity_id} for activity_id, provider, provider_activity_id in rows]
+    session.execute(insert(ProviderActivityLink).values(links).on_conflict_do_nothing())
+    return rows[-1][0]
+
+
+@data_migration(6, "encode_stream_entries")
+def encode_stream_entries(session: sqlmodel.Session, cursor: int, batch_size: int) -> int | None:
+    """Encode legacy streams (one StreamEntry row per sample) into payloads and delete their entries."""
+    statement = sqlmodel.select(Stream).where(sqlmodel.col(Stream.id) > cursor, sqlmodel.col(Stream.payload).is_(None)).order_by(sqlmodel.col(Stream.id)).limit(batch_size)
+    streams = list(session.exec(statement))
+    if not streams:
+        return None
+    stream_ids = [stream.id for stream in streams]
+    values: dict[int, list[float]] = {stream_id: [] for stream_id in stream_ids}  # type: ignore[misc]
+    entries = sqlmodel.select(StreamEntry.stream_id, StreamEntry.stream_entry).where(StreamEntry.stream_id.in_(stream_ids)).order_by(StreamEntry.stream_id, StreamEntry.index)  # type: ignore[union-attr,arg-type]
+    for stream_id, value in session.exec(entries):
+        values[stream_id].append(value)  # type: ignore[index]
+    for stream in streams:
+        stream.payload = encode_stream(stream.stream_type, values[stream.id])  # type: ignore[index]
+        stream.sample_count = len(values[stream.id])  # type: ignore[index]
+        session.add(stream)
+    session.execute(sqlalchemy.delete(StreamEntry).where(StreamEntry.stream_id.in_(stream_ids)))  # type: ignore[union-attr]
+    return streams[-1].id
+
+
+@data_migration(7, "backfill_updated_at")
+def backfill_updated_at(session: sqlmodel.Session, cursor: int, batch_size: int) -> int | None:
+    """Set updated_at of activities saved before it existed, so incremental exports pick them up."""
+    ids = list(session.exec(sqlmodel.select(Activity.id).where(sqlmodel.col(Activity.id) > cursor).order_by(sqlmodel.col(Activity.id)).limit(batch_size)))
+    if not ids:
+        return None
+    session.execute(sqlalchemy.update(Activity).where(sqlmodel.col(Activity.id).in_(ids), sqlmodel.col(Activity.updated_at).is_(None)).values(updated_at=_now()))
+    return ids[-1]
+
+
+@data_migration(8, "index_activities")
+def index_activities(session: sqlmodel.Session, cursor: int, batch_size: int) -> int | None:
+    """Add activities saved before the spatial, similarity and training indexes existed to them."""
+    statement = sqlmodel.select(Activity).options(selectinload(Activity.streams)).where(sqlmodel.col(Activity.id) > cursor).order_by(sqlmodel.col(Activity.id)).limit(batch_size)  # type: ignore[arg-type]
+    activities = list(session.exec(statement))
+    if not activities:
+        return None
+    ids = [activity.id for activity in activities]
+    fingerprinted = set(session.exec(sqlmodel.select(ActivityFingerprint.activity_id).where(ActivityFingerprint.activity_id.in_(ids))))  # type: ignore[attr-defined]
+    loaded = set(session.exec(sqlmodel.select(ActivityLoad.activity_id).where(ActivityLoad.activity_id.in_(ids))))  # type: ignore[attr-defined]
+    for activity in activities:
+        if activity.id not in fingerprinted:
+            spatial.remove_activity(session, activity.id)
+            for stream in activity.streams or []:
+                if stream.stream_type == StreamType.LATLNG:
+                    spatial.index_activity(session, activity.id, stream.coordinates)
+            similarity.index_activity(session, activity)
+        if activity.id not in loaded:
+            training.index_activity(session, activity)
+    return activities[-1].id
+
+
+MIGRATIONS.sort(key=lambda migration: migration.version)
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+class MigrationStatus(pydantic.BaseModel):
+    version: int
+    name: str
+    kind: MigrationKind
+    applied: bool
+    cursor: int = 0  # progress of a data migration that was started
+
+
+class Migrator:
+    """Applies versioned migrations to a stridedb database.
+
+    Schema migrations (DDL) are applied in order, each in its own transaction, every time
+    the database is opened (create_database). Data migrations rewrite or backfill rows in
+    batches: every batch is a short transaction that also stores the cursor of the
+    migration, so they can run while the API keeps reading, and an interrupted run
+    resumes after the last committed batch. New databases are created with the current
+    models and marked as fully migrated.
+
+    Args:
+        engine: Engine of the database
+    """
+
+    def __init__(self, engine: sqlalchemy.Engine):
+        self.engine = engine
+
+    def _applied(self) -> dict[int, SchemaVersion]:
+        with sqlmodel.Session(self.engine) as session:
+            return {row.version: row for row in session.exec(sqlmodel.select(SchemaVersion))}
+
+    def status(self) -> list[MigrationStatus]:
+        """Get the state of every known migration."""
+        SchemaVersion.__table__.create(self.engine, checkfirst=True)  # type: ignore[attr-defined]
+        applied = self._applied()
+        return [
+            MigrationStatus(
+                version=migration.version,
+                name=migration.name,
+                kind=migration.kind,
+                applied=migration.version in applied and applied[migration.version].completed_at is not None,
+                cursor=applied[migration.version].cursor if migration.version in applied else 0,
+            )
+            for migration in MIGRATIONS
+        ]
+
+    def pending(self, kind: MigrationKind | None = None) -> list[Migration]:
+        applied = {status.version for status in self.status() if status.applied}
+        return [migration for migration in MIGRATIONS if migration.version not in applied and (kind is None or migration.kind == kind)]
+
+    def migrate_schema(self) -> list[int]:
+        """Create a new database, or apply the pending schema migrations to an existing one.
+
+        Returns:
+            Versions applied
+        """
+        if "activity" not in sqlalchemy.inspect(self.engine).get_table_names():
+            sqlmodel.SQLModel.metadata.create_all(self.engine)
+            with sqlmodel.Session(self.engine) as session:
+                session.add_all([SchemaVersion(version=migration.version, name=migration.name, kind=migration.kind, completed_at=_now()) for migration in MIGRATIONS])
+                session.commit()
+            return []
+
+        applied = []
+        for migration in self.pending(MigrationKind.SCHEMA):
+            with self.engine.begin() as connection:
+                migration.function(connection)  # type: ignore[call-arg, arg-type]  # schema migrations take the connection
+                connection.execute(sqlalchemy.insert(SchemaVersion).values(version=migration.version, name=migration.name, kind=migration.kind, started_at=_now(), completed_at=_now()))
+            logger.info(f"Applied schema migration {migration.version} {migration.name}")
+            applied.append(migration.version)
+        if self.pending(MigrationKind.DATA):
+            logger.warning("Database has pending data migrations, run `stride migrate`")
+        return applied
+
+    def run_data_migration(self, migration: Migration, batch_size: int = DEFAULT_BATCH_SIZE, max_batches: int | None = None, pause_s: float = 0.0) -> bool:
+        """Run a data migration batch by batch, from where it was left.
+
+        Args:
+            migration: Data migration to run
+            batch_size: Rows per batch
+            max_batches: Stop after this many batches (default: run to completion)
+            pause_s: Sleep between batches, to leave the write lock to other writers
+
+        Returns:
+            Whether the migration completed
+        """
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            with sqlmodel.Session(self.engine) as session:
+                progress = session.get(SchemaVersion, migration.version) or SchemaVersion(version=migration.version, name=migration.name, kind=migration.kind)
+                cursor = migration.function(session, progress.cursor, batch_size)  # type: ignore[call-arg,arg-type]
+                if cursor is None:
+                    progress.completed_at = _now()
+                else:
+                    progress.cursor = cursor
+                # the progress is committed with the batch, a batch is never applied twice
+                session.add(progress)
+                session.commit()
+            batches += 1
+            if cursor is None:
+                logger.info(f"Completed data migration {migration.version} {migration.name} in {batches} batches")
+                return True
+            logger.debug(f"Data migration {migration.name}: migrated up to id {cursor}")
+            if pause_s:
+                time.sleep(pause_s)
+        return False
+
+    def migrate(self, batch_size: int = DEFAULT_BATCH_SIZE, max_batches: int | None = None, pause_s: float = 0.0) -> list[MigrationStatus]:
+        """Apply all pending schema migrations, then run the pending data migrations in order.
+
+        Args:
+            batch_size: Rows per data migration batch
+            max_batches: Stop each data migration after this many batches, the next run resumes it
+            pause_s: Sleep between batches
+
+        Returns:
+            State of every migration afterwards
+        """
+        self.migrate_schema()
+        for migration in self.pending(MigrationKind.DATA):
+            if not self.run_data_migration(migration, batch_size, max_batches, pause_s):
+                break  # later data migrations may depend on this one
+        return self.status()
@@ -1,10 +1,13 @@
+import enum
+import sqlalchemy
 import sqlmodel
+from datetime import date, datetime, timezone
+from typing import Sequence
 from pydantic import Field, computed_field
 import rich.repr
 
-from stride.enums import Provider, StreamType
-
-StreamDataType = float
+from stride.enums import Provider, StreamMask, StreamType
+from stride.stridedb.codecs import StreamDataType, decode_stream, encode_stream
 
 
 class Activity(sqlmodel.SQLModel, table=True):
@@ -12,19 +15,26 @@ class Activity(sqlmodel.SQLModel, table=True):
 
     id: int = sqlmodel.Field(primary_key=True)
     provider: Provider = sqlmodel.Field(default=Provider.STRAVA)
-    provider_activity_id: int = sqlmodel.Field(unique=True)
+    provider_activity_id: int = sqlmodel.Field(index=True)  # id at the provider this copy was saved from, see ProviderActivityLink
     distance: float = sqlmodel.Field(default=0.0)
     moving_time: int = sqlmodel.Field(default=0)
     duration: int = sqlmodel.Field(default=0)
+    start_date: datetime | None = sqlmodel.Field(default=None, index=True)
+    sport: str | None = sqlmodel.Field(default=None)  # Strava activity type, e.g. "Run", "Ride"
+    athlete_id: int | None = sqlmodel.Field(default=None, index=True)  # athlete id at the provider, None for file imports
+    updated_at: datetime | None = sqlmodel.Field(default=None, index=True)  # last write, read by incremental exports
+    stream_mask: int = sqlmodel.Field(default=0, sa_column_kwargs={"server_default": "0"})  # StreamMask of its stream types, kept in sync as streams are attached or removed
 
     # relationship to the Stream table
     streams: list["Stream"] | None = sqlmodel.Relationship(back_populates="activity", cascade_delete=True)
 
     def has_stream_type(self, stream_type: StreamType) -> bool:
-        """Check if this activity has a stream of a given type."""
-        if not self.streams:
-            return False
-        return any(stream.stream_type == stream_type for stream in self.streams)
+        """Check if this activity has a stream of a given type, from stream_mask so the streams are not loaded."""
+        return bool(self.stream_mask & StreamMask[stream_type.name])
+
+    def refresh_stream_mask(self) -> None:
+        """Recompute stream_mask from the loaded streams."""
+        self.stream_mask = StreamMask.of(stream.stream_type for stream in self.streams or [])
 
     @computed_field
     @property
@@ -87,6 +97,8 @@ class Activity(sqlmodel.SQLModel, table=True):
         yield "distance", self.distance
         yield "moving_time", self.moving_time
         yield "duration", self.duration
+        yield "start_date", self.start_date
+        yield "sport", self.sport
         yield "has_heartrate_stream", self.has_heartrate_stream
         yield "has_watts_stream", self.has_watts_stream
         yield "has_temp_stream", self.has_temp_stream
@@ -102,7 +114,11 @@ class Stream(sqlmodel.SQLModel, table=True):
     id: int | None = sqlmodel.Field(default=None, primary_key=True)
     stream_type: StreamType = Field(alias="type")
 
-    # relationship to the StreamEntry table
+    # samples encoded with stride.stridedb.codecs, replaces one StreamEntry row per sample
+    payload: bytes | None = sqlmodel.Field(default=None)
+    sample_count: int = sqlmodel.Field(default=0)
+
+    # relationship to the StreamEntry table (legacy, streams saved before payloads were introduced)
     stream_entries: list["StreamEntry"] | None = sqlmodel.Relationship(back_populates="stream", cascade_delete=True)
 
     # relationship to the Activity table
@@ -110,6 +126,31 @@ class Stream(sqlmodel.SQLModel, table=True):
     activity_id: int | None = sqlmodel.Field(foreign_key="activity.id", ondelete="CASCADE")  # generated when the session is committed
     activity: Activity | None = sqlmodel.Relationship(back_populates="streams")
 
+    @classmethod
+    def from_values(cls, stream_type: StreamType, values: Sequence[StreamDataType]) -> "Stream":
+        """Create a stream with its samples encoded into the payload."""
+        return cls(stream_type=stream_type, payload=encode_stream(stream_type, values), sample_count=len(values))  # type: ignore[call-arg]  # activity_id is set when it is attached
+
+    @classmethod
+    def from_coordinates(cls, coordinates: Sequence[tuple[float, float]]) -> "Stream":
+        """Create a latlng stream, packed as interleaved [lat, lng, lat, lng, ...] samples."""
+        return cls.from_values(StreamType.LATLNG, [value for coordinate in coordinates for value in coordinate])
+
+    @property
+    def coordinates(self) -> list[tuple[float, float]]:
+        """Decoded (lat, lng) pairs of a latlng stream."""
+        if self.stream_type != StreamType.LATLNG:
+            raise ValueError(f"Stream of type {self.stream_type} has no coordinates")
+        values = self.values
+        return list(zip(values[0::2], values[1::2]))
+
+    @property
+    def values(self) -> list[StreamDataType]:
+        """Decoded samples of the stream."""
+        if self.payload is not None:
+            return decode_stream(self.payload)
+        return [entry.stream_entry for entry in sorted(self.stream_entries or [], key=lambda entry: entry.index)]
+
 
 class StreamEntry(sqlmodel.SQLModel, table=True):
     id: int | None = sqlmodel.Field(default=None, primary_key=True)
@@ -121,3 +162,245 @@ class StreamEntry(sqlmodel.SQLModel, table=True):
     # ondelete="CASCADE" means that if the stream is deleted, all stream entries will be deleted
     stream_id: int | None = sqlmodel.Field(foreign_key="stream.id", ondelete="CASCADE")  # generated when the session is committed
     stream: Stream | None = sqlmodel.Relationship(back_populates="stream_entries")
+
+
+# keep Activity.stream_mask in sync with its streams, collections loaded from the database fire no events
+
+
+@sqlalchemy.event.listens_for(Activity.streams, "append")
+def _mask_appended_stream(activity: Activity, stream: Stream, initiator: object) -> None:
+    activity.stream_mask |= StreamMask[stream.stream_type.name]
+
+
+@sqlalchemy.event.listens_for(Activity.streams, "remove")
+def _mask_removed_stream(activity: Activity, stream: Stream, initiator: object) -> None:
+    if "streams" not in activity.__dict__:
+        # collection not loaded (e.g. stream.activity = None), only the removed type is known
+        activity.stream_mask &= ~StreamMask[stream.stream_type.name]
+        return
+    # fired before or after the stream leaves the collection, depending on how it is removed
+    activity.stream_mask = StreamMask.of(other.stream_type for other in activity.__dict__["streams"] if other is not stream)
+
+
+@sqlalchemy.event.listens_for(Stream.stream_type, "set")
+def _mask_retyped_stream(stream: Stream, stream_type: StreamType, previous: object, initiator: object) -> None:
+    activity = stream.__dict__.get("activity")
+    if activity is not None:
+        streams = activity.__dict__.get("streams") or []
+        activity.stream_mask = StreamMask.of(stream_type if other is stream else other.stream_type for other in streams)
+
+
+@sqlalchemy.event.listens_for(sqlalchemy.orm.Session, "before_flush")
+def _mask_deleted_streams(session: sqlalchemy.orm.Session, flush_context: object, instances: object) -> None:
+    # session.delete(stream) leaves the stream in the collection of its activity, no collection event fires
+    deleted = [instance for instance in session.deleted if isinstance(instance, Stream)]
+    for stream in deleted:
+        if stream.activity_id is None:
+            continue
+        activity = stream.__dict__.get("activity") or session.identity_map.get(sqlalchemy.orm.util.identity_key(Activity, stream.activity_id))
+        if activity is None:
+            # activity not in the session, update the row (flushes never autoflush)
+            activity_table = Activity.__table__  # type: ignore[attr-defined]
+            bit = StreamMask[stream.stream_type.name]
+            session.connection().execute(activity_table.update().where(activity_table.c.id == stream.activity_id).values(stream_mask=activity_table.c.stream_mask.op("&")(~bit)))
+        elif activity not in session.deleted:
+            if "streams" in activity.__dict__:
+                activity.stream_mask = StreamMask.of(other.stream_type for other in activity.__dict__["streams"] or [] if other not in deleted)
+            else:
+                activity.stream_mask &= ~StreamMask[stream.stream_type.name]
+
+
+class ProviderActivityLink(sqlmodel.SQLModel, table=True):
+    """Maps an activity ID of a provider to a stride activity, many provider activities can map to one."""
+
+    provider: Provider = sqlmodel.Field(primary_key=True)
+    provider_activity_id: int = sqlmodel.Field(primary_key=True)
+    activity_id: int = sqlmodel.Field(foreign_key="activity.id", ondelete="CASCADE", index=True)
+
+
+class ActivityGeoTile(sqlmodel.SQLModel, table=True):
+    """Geohash tile crossed by the track of an activity, used for spatial lookups."""
+
+    geohash: str = sqlmodel.Field(primary_key=True)
+    activity_id: int = sqlmodel.Field(primary_key=True, foreign_key="activity.id", ondelete="CASCADE", index=True)
+
+
+class ActivityFingerprint(sqlmodel.SQLModel, table=True):
+    """Bucketed summary and route sketch of an activity, used to find duplicates and repeated routes."""
+
+    __table_args__ = (sqlalchemy.Index("ix_activityfingerprint_start_distance", "start_bucket", "distance_bucket"),)
+
+    activity_id: int = sqlmodel.Field(primary_key=True, foreign_key="activity.id", ondelete="CASCADE")
+    start_bucket: int | None = sqlmodel.Field(default=None)
+    distance_bucket: int
+    duration_bucket: int
+    route_signature: bytes | None = sqlmodel.Field(default=None)  # MinHash of the geohash shingles of the track
+
+
+class ActivityRouteBand(sqlmodel.SQLModel, table=True):
+    """Locality-sensitive hashing band of a route signature."""
+
+    band: int = sqlmodel.Field(primary_key=True)
+    band_hash: int = sqlmodel.Field(primary_key=True)
+    activity_id: int = sqlmodel.Field(primary_key=True, foreign_key="activity.id", ondelete="CASCADE", index=True)
+
+
+class ImportedFile(sqlmodel.SQLModel, table=True):
+    """Recording file that was imported, so interrupted imports can resume."""
+
+    checksum: str = sqlmodel.Field(primary_key=True)
+    filename: str
+    provider: Provider
+    provider_activity_id: int
+    imported_at: datetime = sqlmodel.Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class WebhookEventStatus(enum.StrEnum):
+    """Processing state of a queued webhook event."""
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class WebhookEvent(sqlmodel.SQLModel, table=True):
+    """Webhook event waiting to be processed, the table is the durable ingestion queue."""
+
+    # providers retry deliveries, the same event is only queued once
+    __table_args__ = (sqlalchemy.UniqueConstraint("provider", "object_type", "object_id", "aspect_type", "event_time"),)
+
+    id: int | None = sqlmodel.Field(default=None, primary_key=True)
+    provider: Provider = sqlmodel.Field(default=Provider.STRAVA)
+    object_type: str
+    object_id: int = sqlmodel.Field(index=True)
+    aspect_type: str
+    owner_id: int
+    event_time: int
+    updates: str = sqlmodel.Field(default="{}")  # JSON
+    status: WebhookEventStatus = sqlmodel.Field(default=WebhookEventStatus.PENDING, index=True)
+    attempts: int = sqlmodel.Field(default=0)
+    error: str | None = sqlmodel.Field(default=None)
+    next_attempt_at: datetime | None = sqlmodel.Field(default=None)  # set after a failure, retries back off
+    received_at: datetime = sqlmodel.Field(default_factory=lambda: datetime.now(timezone.utc))
+    processed_at: datetime | None = sqlmodel.Field(default=None)
+
+
+class SyncJobStage(enum.StrEnum):
+    """Last completed step of a sync job, work of completed steps is never repeated."""
+
+    LISTED = "listed"  # activity summary stored
+    FETCHED = "fetched"  # streams stored
+    SAVED = "saved"  # activity saved in stridedb
+
+
+class SyncJobStatus(enum.StrEnum):
+    """Scheduling state of a sync job."""
+
+    PENDING = "pending"
+    LEASED = "leased"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class SyncJob(sqlmodel.SQLModel, table=True):
+    """Fetch/convert/save work for one provider activity, the table is the durable sync queue."""
+
+    __table_args__ = (sqlalchemy.UniqueConstraint("provider", "provider_activity_id"),)
+
+    id: int | None = sqlmodel.Field(default=None, primary_key=True)
+    provider: Provider = sqlmodel.Field(default=Provider.STRAVA)
+    provider_activity_id: int
+    stage: SyncJobStage = sqlmodel.Field(default=SyncJobStage.LISTED)
+    status: SyncJobStatus = sqlmodel.Field(default=SyncJobStatus.PENDING, index=True)
+    attempts: int = sqlmodel.Field(default=0)
+    error: str | None = sqlmodel.Field(default=None)
+    lease_owner: str | None = sqlmodel.Field(default=None)
+    lease_expires_at: datetime | None = sqlmodel.Field(default=None)
+    next_attempt_at: datetime | None = sqlmodel.Field(default=None)
+    activity_payload: str  # provider activity summary (JSON)
+    streams_payload: str | None = sqlmodel.Field(default=None)  # provider streams (JSON), kept until the activity is saved
+    updated_at: datetime = sqlmodel.Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class SyncCheckpoint(sqlmodel.SQLModel, table=True):
+    """Progress of listing the activities of a sync, so a resumed sync continues where it stopped."""
+
+    name: str = sqlmodel.Field(primary_key=True)
+    provider: Provider = sqlmodel.Field(default=Provider.STRAVA)
+    start_date: datetime
+    end_date: datetime
+    listed_until: datetime  # activities started before this are queued
+    page: int = sqlmodel.Field(default=1)  # next page of the window starting at listed_until
+    completed: bool = sqlmodel.Field(default=False)
+    updated_at: datetime = sqlmodel.Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class RollupPeriod(enum.StrEnum):
+    """Period a training rollup row covers."""
+
+    DAY = "day"
+    WEEK = "week"  # starting on Monday
+    MONTH = "month"
+
+
+class ActivityLoad(sqlmodel.SQLModel, table=True):
+    """Contribution of one activity to the training rollups, subtracted again when the activity changes."""
+
+    activity_id: int = sqlmodel.Field(primary_key=True, foreign_key="activity.id", ondelete="CASCADE")
+    athlete_id: int = sqlmodel.Field(default=0)  # 0: unknown athlete
+    day: date
+    sport: str = sqlmodel.Field(default="")
+    distance: float = sqlmodel.Field(default=0.0)
+    moving_time: int = sqlmodel.Field(default=0)
+    load: float = sqlmodel.Field(default=0.0)  # TRIMP, estimated from the moving time without heartrate
+    zone1_s: float = sqlmodel.Field(default=0.0)  # seconds per heartrate zone
+    zone2_s: float = sqlmodel.Field(default=0.0)
+    zone3_s: float = sqlmodel.Field(default=0.0)
+    zone4_s: float = sqlmodel.Field(default=0.0)
+    zone5_s: float = sqlmodel.Field(default=0.0)
+
+
+class TrainingRollup(sqlmodel.SQLModel, table=True):
+    """Training volume and load of an athlete per sport and day, week or month, maintained on every write."""
+
+    athlete_id: int = sqlmodel.Field(primary_key=True)
+    period: RollupPeriod = sqlmodel.Field(primary_key=True)
+    period_start: date = sqlmodel.Field(primary_key=True)
+    sport: str = sqlmodel.Field(primary_key=True)
+    count: int = sqlmodel.Field(default=0)
+    distance: float = sqlmodel.Field(default=0.0)
+    moving_time: int = sqlmodel.Field(default=0)
+    load: float = sqlmodel.Field(default=0.0)
+    zone1_s: float = sqlmodel.Field(default=0.0)
+    zone2_s: float = sqlmodel.Field(default=0.0)
+    zone3_s: float = sqlmodel.Field(default=0.0)
+    zone4_s: float = sqlmodel.Field(default=0.0)
+    zone5_s: float = sqlmodel.Field(default=0.0)
+
+
+class ActivityMetric(sqlmodel.SQLModel, table=True):
+    """Value computed per activity by the batch analytics runner, e.g. ("decoupling", 0.04)."""
+
+    activity_id: int = sqlmodel.Field(primary_key=True, foreign_key="activity.id", ondelete="CASCADE")
+    name: str = sqlmodel.Field(primary_key=True, index=True)  # "<metric>" or "<metric>.<key>" for metrics returning several values
+    value: float | None = sqlmodel.Field(default=None)
+    computed_at: datetime = sqlmodel.Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class MigrationKind(enum.StrEnum):
+    """How a migration is applied, see stride.stridedb.migrations."""
+
+    SCHEMA = "schema"  # DDL, applied in one transaction whenever the database is opened
+    DATA = "data"  # rewrites rows in resumable batches, applied with `stride migrate`
+
+
+class SchemaVersion(sqlmodel.SQLModel, table=True):
+    """Migration applied to (or, for data migrations, in progress on) the database."""
+
+    version: int = sqlmodel.Field(primary_key=True)
+    name: str
+    kind: MigrationKind = sqlmodel.Field(default=MigrationKind.SCHEMA)
+    cursor: int = sqlmodel.Field(default=0)  # last id handled by a data migration, it resumes after it
+    started_at: datetime = sqlmodel.Field(default_factory=lambda: datetime.now(timezone.utc))
+    completed_at: datetime | None = sqlmodel.Field(default=None)
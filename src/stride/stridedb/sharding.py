@@ -0,0 +1,258 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from enum import StrEnum
+from pathlib import Path
+from typing import Any, Callable, Sequence, TypeVar
+
+import polars as pl
+import sqlalchemy
+import sqlmodel
+from loguru import logger
+
+from stride import metrics
+from stride.enums import ActivityProjection, Provider, StreamType
+from stride.stridedb.database import StrideDBService, activity_load_options, data_dir
+from stride.stridedb.migrations import Migrator
+from stride.stridedb.models import Activity, RollupPeriod
+from stride.stridedb.training import SUM_FIELDS, volume_schema
+
+T = TypeVar("T")
+
+# activities without an athlete (file imports) go to the shard of this athlete id, unless configured otherwise
+UNKNOWN_ATHLETE = 0
+
+DEFAULT_BUCKETS = 16
+
+# database next to the shards with the sync and webhook queues and the imported files, which belong to no athlete
+CATALOG_NAME = "catalog"
+
+# shards read at the same time by a federated query, SQLite releases the GIL while it reads
+DEFAULT_MAX_WORKERS = 8
+
+
+class ShardingMode(StrEnum):
+    """How athletes are assigned to database files."""
+
+    ATHLETE = "athlete"  # one file per athlete
+    HASH = "hash"  # athletes hashed into a fixed number of files
+
+
+def get_shard_dir(prod: bool = False) -> Path:
+    """Get the directory of the shard databases."""
+    return data_dir / "shards" / ("prod" if prod else "dev")
+
+
+class ShardedStrideDBService:
+    """Stridedb split over one SQLite file per athlete (or per hash bucket of athletes).
+
+    Writes are routed to the StrideDBService of the activity's athlete shard, so ingest
+    for athletes in different shards never waits on the same write lock, and
+    save_activities() writes the shards of a batch in parallel. Federated reads run the
+    query on every shard in parallel and merge the results.
+
+    Activity IDs are generated per shard, an activity is identified by its athlete ID
+    and ID, so routed reads (get_activity, ...) take both. Lookups by provider activity
+    ID (resolve_activity_id, remove_provider_activity, ...) query every shard, and
+    `engine` is the catalog database with the ingest queues: StravaSync, WebhookWorker
+    and ArchiveImporter accept this service in place of a StrideDBService.
+
+    Args:
+        root: Directory of the shard files (default: data/shards/<dev|prod>)
+        mode: One file per athlete, or per hash bucket
+        n_buckets: Number of files in hash mode
+        default_athlete_id: Athlete of activities without one, e.g. file imports of a single-athlete install
+        max_workers: Shards queried at the same time
+        prod: Use the prod shard directory (if no root is given)
+        cache_bytes: Cache budget of every shard's StrideDBService
+    """
+
+    def __init__(
+        self,
+        root: Path | None = None,
+        mode: ShardingMode = ShardingMode.ATHLETE,
+        n_buckets: int = DEFAULT_BUCKETS,
+        default_athlete_id: int = UNKNOWN_ATHLETE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        prod: bool = False,
+        cache_bytes: int = 0,
+    ):
+        self.root = Path(root) if root is not None else get_shard_dir(prod)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.mode = mode
+        self.n_buckets = n_buckets
+        self.default_athlete_id = default_athlete_id
+        self.cache_bytes = cache_bytes
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="stridedb-shard")
+        self._shards: dict[str, StrideDBService] = {}
+        self._lock = threading.Lock()
+        self.catalog = self._open(CATALOG_NAME)
+        self.engine = self.catalog.engine
+
+    def shard_name(self, athlete_id: int | None) -> str:
+        """Get the name of the shard an athlete's activities are stored in."""
+        athlete_id = athlete_id if athlete_id is not None else self.default_athlete_id
+        if self.mode == ShardingMode.HASH:
+            return f"bucket_{athlete_id % self.n_buckets}"
+        return f"athlete_{athlete_id}"
+
+    def _open(self, name: str) -> StrideDBService:
+        with self._lock:
+            if name not in self._shards:
+                service = StrideDBService(url=f"sqlite:///{(self.root / f'{name}.db').absolute()}", cache_bytes=self.cache_bytes)
+                Migrator(service.engine).migrate_schema()
+                self._shards[name] = service
+            return self._shards[name]
+
+    def shard(self, athlete_id: int | None) -> StrideDBService:
+        """Get the service of an athlete's shard, creating the shard if needed."""
+        return self._open(self.shard_name(athlete_id))
+
+    def shards(self) -> list[StrideDBService]:
+        """Get the services of all existing shards."""
+        return [self._open(path.stem) for path in sorted(self.root.glob("*.db")) if path.stem != CATALOG_NAME]
+
+    def _fan_out(self, function: Callable[[StrideDBService], T]) -> list[T]:
+        """Run a query on every shard in parallel."""
+        with metrics.span("shard_fan_out") as span:
+            shards = self.shards()
+            span.add("shards", len(shards))
+            return list(self.executor.map(function, shards))
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        for service in self._shards.values():
+            service.engine.dispose()
+
+    # writes, routed to the athlete's shard
+
+    def save_activity(self, activity: Activity, update: bool = False, verbose: bool = True, deduplicate: bool = True) -> Activity:
+        """Save an activity in its athlete's shard, see StrideDBService.save_activity."""
+        return self.shard(activity.athlete_id).save_activity(activity, update=update, verbose=verbose, deduplicate=deduplicate)
+
+    @metrics.timed("db_operation")
+    def save_activities(self, activities: list[Activity], update: bool = False, verbose: bool = True, deduplicate: bool = True) -> list[Activity]:
+        """Save many activities, the shards of the batch are written in parallel.
+
+        Returns:
+            Saved activities, in the same order
+        """
+        groups: dict[str, list[int]] = {}
+        for position, activity in enumerate(activities):
+            groups.setdefault(self.shard_name(activity.athlete_id), []).append(position)
+
+        def save_group(name: str) -> list[Activity]:
+            return self._open(name).save_activities([activities[position] for position in groups[name]], update=update, verbose=False, deduplicate=deduplicate)
+
+        saved: list[Activity | None] = [None] * len(activities)
+        for name, group_saved in zip(groups, self.executor.map(save_group, groups)):
+            for position, activity in zip(groups[name], group_saved):
+                saved[position] = activity
+        if verbose:
+            logger.info(f"Saved {len(activities)} activities in {len(groups)} shards")
+        return saved  # type: ignore[return-value]
+
+    def delete_activity(self, activity: Activity, verbose: bool = True) -> None:
+        self.shard(activity.athlete_id).delete_activity(activity, verbose=verbose)
+
+    def update_activity_summary(self, athlete_id: int | None, id: int, **fields: Any) -> None:
+        self.shard(athlete_id).update_activity_summary(id, **fields)
+
+    def update_provider_activity_summary(self, provider_activity_id: int, provider: Provider, **fields: Any) -> int | None:
+        """Update summary fields of the activity a provider activity is linked to, in whichever shard has it."""
+        updated = self._fan_out(lambda service: service.update_provider_activity_summary(provider_activity_id, provider, **fields))
+        return next((activity_id for activity_id in updated if activity_id is not None), None)
+
+    def remove_provider_activity(self, provider_activity_id: int, provider: Provider) -> int | None:
+        """Remove a provider activity from whichever shard has it, see StrideDBService.remove_provider_activity."""
+        removed = self._fan_out(lambda service: service.remove_provider_activity(provider_activity_id, provider))
+        return next((activity_id for activity_id in removed if activity_id is not None), None)
+
+    # lookups by provider activity ID, over all shards (the returned IDs are only unique within a shard)
+
+    def resolve_activity_id(self, provider_activity_id: int, provider: Provider) -> int | None:
+        resolved = self._fan_out(lambda service: service.resolve_activity_id(provider_activity_id, provider))
+        return next((activity_id for activity_id in resolved if activity_id is not None), None)
+
+    @metrics.timed("db_operation")
+    def resolve_activity_ids(self, keys: list[tuple[Provider, int]], batch_size: int = 500) -> dict[tuple[Provider, int], int]:
+        resolved: dict[tuple[Provider, int], int] = {}
+        for shard_resolved in self._fan_out(lambda service: service.resolve_activity_ids(keys, batch_size)):
+            resolved.update(shard_resolved)
+        return resolved
+
+    def check_if_activity_exists(self, provider_activity_id: int, provider: Provider) -> bool:
+        return self.resolve_activity_id(provider_activity_id, provider) is not None
+
+    # routed reads
+
+    def get_activity(self, athlete_id: int | None, id: int, projection: ActivityProjection = ActivityProjection.FULL, stream_types: Sequence[StreamType] | None = None) -> Activity:
+        return self.shard(athlete_id).get_activity(id, projection=projection, stream_types=stream_types)
+
+    def get_stream_values(self, athlete_id: int | None, activity_id: int, stream_type: StreamType) -> list[float]:
+        return self.shard(athlete_id).get_stream_values(activity_id, stream_type)
+
+    def get_fitness(self, athlete_id: int, start: date | None = None, end: date | None = None) -> pl.DataFrame:
+        """Get the fitness curves of an athlete, see StrideDBService.get_fitness."""
+        return self.shard(athlete_id).get_fitness(athlete_id=athlete_id, start=start, end=end)
+
+    # federated reads, over all shards
+
+    @metrics.timed("db_operation")
+    def get_activities(self, limit: int = 100, projection: ActivityProjection = ActivityProjection.SUMMARY, stream_types: Sequence[StreamType] | None = None) -> list[Activity]:
+        """Get the most recent activities of all athletes.
+
+        Every shard returns its `limit` most recent activities, the merge keeps the overall most recent.
+
+        Returns:
+            Activities ordered by start date, most recent first
+        """
+
+        def recent(service: StrideDBService) -> list[Activity]:
+            with sqlmodel.Session(service.engine) as session:
+                order = (sqlmodel.col(Activity.start_date).is_(None), sqlalchemy.desc(sqlmodel.col(Activity.start_date)))
+                statement = sqlmodel.select(Activity).options(*activity_load_options(projection, stream_types)).order_by(*order).limit(limit)
+                return list(session.exec(statement))
+
+        activities = [activity for shard_activities in self._fan_out(recent) for activity in shard_activities]
+        activities.sort(key=lambda activity: (activity.start_date is not None, activity.start_date.timestamp() if activity.start_date else 0.0), reverse=True)
+        return activities[:limit]
+
+    @metrics.timed("db_operation")
+    def get_activities_in_area(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> list[Activity]:
+        """Get the activities of all athletes whose track passes through an area."""
+        return [activity for activities in self._fan_out(lambda service: service.get_activities_in_area(min_lat, min_lng, max_lat, max_lng)) for activity in activities]
+
+    @metrics.timed("db_operation")
+    def get_activities_near(self, lat: float, lng: float, radius_m: float = 100.0, exact: bool = True) -> list[Activity]:
+        """Get the activities of all athletes whose track passes within radius_m of a point."""
+        return [activity for activities in self._fan_out(lambda service: service.get_activities_near(lat, lng, radius_m, exact)) for activity in activities]
+
+    @metrics.timed("db_operation")
+    def count_activities(self) -> int:
+        def count(service: StrideDBService) -> int:
+            with sqlmodel.Session(service.engine) as session:
+                return session.exec(sqlmodel.select(sqlalchemy.func.count()).select_from(Activity)).one()
+
+        return sum(self._fan_out(count))
+
+    @metrics.timed("db_operation")
+    def get_training_volume(self, period: RollupPeriod = RollupPeriod.WEEK, start: date | None = None, end: date | None = None, sport: str | None = None, by_sport: bool = False) -> pl.DataFrame:
+        """Get the training volume of all athletes together, the rollups of every shard summed per period.
+
+        Returns:
+            DataFrame with period_start, (sport,) count, distance, moving_time, load and zone1_s to zone5_s
+        """
+        frames = self._fan_out(lambda service: service.get_training_volume(period, start=start, end=end, sport=sport, by_sport=by_sport))
+        if not frames:
+            return pl.DataFrame(schema=volume_schema(by_sport))
+        group = ["period_start"] + (["sport"] if by_sport else [])
+        merged = pl.concat(frames)
+        return merged.group_by(group).agg(pl.col("count").sum(), *[pl.col(field).sum() for field in SUM_FIELDS]).sort(group).select(merged.columns)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    sharded = ShardedStrideDBService(Path(tempfile.mkdtemp()), mode=ShardingMode.HASH, n_buckets=4)
+    logger.info(f"{[sharded.shard_name(athlete_id) for athlete_id in range(6)]}, {sharded.count_activities()} activities")
@@ -0,0 +1,189 @@
+import math
+import random
+import zlib
+from array import array
+from datetime import datetime, timezone
+from typing import Sequence
+
+import sqlalchemy
+import sqlmodel
+
+from stride.enums import StreamType
+from stride.stridedb.models import Activity, ActivityFingerprint, ActivityRouteBand
+from stride.stridedb.spatial import encode_geohash
+
+START_BUCKET_SECONDS = 300
+DISTANCE_BUCKET_RATIO = 1.05  # log-scale buckets, 5% wide
+DURATION_BUCKET_RATIO = 1.05
+
+# two activities are the same recording if they differ less than this
+DUPLICATE_MAX_START_DIFFERENCE_SECONDS = 120
+DUPLICATE_MAX_DISTANCE_RATIO = 0.03
+DUPLICATE_MAX_DURATION_RATIO = 0.05
+DUPLICATE_MIN_ROUTE_SIMILARITY = 0.5
+
+# ~150m x 150m cells, consecutive cells along the track are the shingles of the route
+ROUTE_GEOHASH_PRECISION = 7
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+
+
+def _epoch_seconds(start_date: datetime) -> float:
+    """Seconds since epoch, naive datetimes (as stored by SQLite) are UTC."""
+    if start_date.tzinfo is None:
+        start_date = start_date.replace(tzinfo=timezone.utc)
+    return start_date.timestamp()
+
+
+def _log_bucket(value: float, ratio: float) -> int:
+    return int(math.log(max(value, 0.0) + 1.0) / math.log(ratio))
+
+
+def route_shingles(coordinates: Sequence[tuple[float, float]]) -> set[str]:
+    """Get the pairs of consecutive geohash cells visited by a track."""
+    cells: list[str] = []
+    for lat, lng in coordinates:
+        cell = encode_geohash(lat, lng, ROUTE_GEOHASH_PRECISION)
+        if not cells or cells[-1] != cell:
+            cells.append(cell)
+    if len(cells) == 1:
+        return {cells[0]}
+    return {a + b for a, b in zip(cells, cells[1:])}
+
+
+def route_signature(coordinates: Sequence[tuple[float, float]]) -> bytes | None:
+    """Get the MinHash signature of a track, or None if it has no coordinates."""
+    shingles = [zlib.crc32(shingle.encode()) for shingle in route_shingles(coordinates)]
+    if not shingles:
+        return None
+    return array("Q", [min((a * shingle + b) % _MERSENNE_PRIME for shingle in shingles) for a, b in _PERMUTATIONS]).tobytes()
+
+
+def route_similarity(signature: bytes, other: bytes) -> float:
+    """Estimate the Jaccard similarity of two routes from their MinHash signatures."""
+    left, right = array("Q"), array("Q")
+    left.frombytes(signature)
+    right.frombytes(other)
+    return sum(a == b for a, b in zip(left, right)) / MINHASH_PERMUTATIONS
+
+
+def _band_hashes(signature: bytes) -> list[int]:
+    band_size = LSH_ROWS * 8
+    return [zlib.crc32(signature[band * band_size : (band + 1) * band_size]) for band in range(LSH_BANDS)]
+
+
+def fingerprint_activity(activity: Activity) -> ActivityFingerprint:
+    """Compute the fingerprint of an activity (not yet linked to an activity ID)."""
+    signature = None
+    for stream in activity.streams or []:
+        if stream.stream_type == StreamType.LATLNG:
+            signature = route_signature(stream.coordinates)
+    return ActivityFingerprint(
+        activity_id=activity.id or 0,
+        start_bucket=int(_epoch_seconds(activity.start_date) // START_BUCKET_SECONDS) if activity.start_date else None,
+        distance_bucket=_log_bucket(activity.distance, DISTANCE_BUCKET_RATIO),
+        duration_bucket=_log_bucket(activity.duration, DURATION_BUCKET_RATIO),
+        route_signature=signature,
+    )
+
+
+def index_activity(session: sqlmodel.Session, activity: Activity) -> None:
+    """Add an activity to the similarity index.
+
+    Args:
+        session: Open session, committed by the caller
+        activity: Activity with an ID and its streams attached
+    """
+    fingerprint = fingerprint_activity(activity)
+    session.add(fingerprint)
+    if fingerprint.route_signature is not None:
+        session.add_all([ActivityRouteBand(band=band, band_hash=band_hash, activity_id=fingerprint.activity_id) for band, band_hash in enumerate(_band_hashes(fingerprint.route_signature))])
+
+
+def remove_activity(session: sqlmodel.Session, activity_id: int) -> None:
+    """Remove an activity from the similarity index."""
+    session.execute(sqlalchemy.delete(ActivityRouteBand).where(ActivityRouteBand.activity_id == activity_id))  # type: ignore[arg-type]
+    session.execute(sqlalchemy.delete(ActivityFingerprint).where(ActivityFingerprint.activity_id == activity_id))  # type: ignore[arg-type]
+
+
+def find_duplicate_activity_ids(session: sqlmodel.Session, activity: Activity) -> list[int]:
+    """Find stored activities that are the same recording as a (possibly unsaved) activity.
+
+    Candidates are looked up by start time and distance bucket (plus their neighbours,
+    so values close to a bucket border still match), then checked against the
+    duplicate tolerances and, if both have a track, against route similarity.
+    Activities of different athletes are never duplicates, so athletes recording the
+    same group run keep their own activities. An activity without an athlete (e.g. one
+    imported from a file) can be a duplicate of any athlete's activity.
+
+    Args:
+        session: Open session
+        activity: Activity to find duplicates for
+
+    Returns:
+        IDs of the duplicate activities
+    """
+    fingerprint = fingerprint_activity(activity)
+    if fingerprint.start_bucket is None or activity.start_date is None:
+        return []
+
+    start_buckets = [fingerprint.start_bucket + offset for offset in (-1, 0, 1)]
+    distance_buckets = [fingerprint.distance_bucket + offset for offset in (-1, 0, 1)]
+    statement = (
+        sqlmodel.select(ActivityFingerprint, Activity)
+        .join(Activity, Activity.id == ActivityFingerprint.activity_id)  # type: ignore[arg-type]
+        .where(ActivityFingerprint.start_bucket.in_(start_buckets), ActivityFingerprint.distance_bucket.in_(distance_buckets))  # type: ignore[union-attr, attr-defined]
+    )
+
+    start = _epoch_seconds(activity.start_date)
+    duplicates = []
+    for candidate_fingerprint, candidate in session.exec(statement):
+        if candidate.id == activity.id or candidate.start_date is None:
+            continue
+        if activity.athlete_id is not None and candidate.athlete_id is not None and candidate.athlete_id != activity.athlete_id:
+            continue
+        if abs(_epoch_seconds(candidate.start_date) - start) > DUPLICATE_MAX_START_DIFFERENCE_SECONDS:
+            continue
+        if abs(candidate.distance - activity.distance) > DUPLICATE_MAX_DISTANCE_RATIO * max(candidate.distance, activity.distance, 1.0):
+            continue
+        if abs(candidate.duration - activity.duration) > DUPLICATE_MAX_DURATION_RATIO * max(candidate.duration, activity.duration, 1):
+            continue
+        if fingerprint.route_signature is not None and candidate_fingerprint.route_signature is not None:
+            if route_similarity(fingerprint.route_signature, candidate_fingerprint.route_signature) < DUPLICATE_MIN_ROUTE_SIMILARITY:
+                continue
+        duplicates.append(candidate.id)
+    return duplicates
+
+
+def find_similar_route_activity_ids(session: sqlmodel.Session, activity_id: int, min_similarity: float = 0.5) -> list[tuple[int, float]]:
+    """Find stored activities that follow (roughly) the same route as a stored activity.
+
+    Candidates share at least one LSH band of the route signature, so only a few
+    signatures are compared no matter how many activities are stored.
+
+    Args:
+        session: Open session
+        activity_id: ID of the activity
+        min_similarity: Minimum estimated Jaccard similarity of the routes
+
+    Returns:
+        List of (activity ID, similarity), most similar first
+    """
+    fingerprint = session.get(ActivityFingerprint, activity_id)
+    if fingerprint is None or fingerprint.route_signature is None:
+        return []
+
+    bands = list(enumerate(_band_hashes(fingerprint.route_signature)))
+    candidates_statement = sqlmodel.select(ActivityRouteBand.activity_id).where(sqlalchemy.tuple_(ActivityRouteBand.band, ActivityRouteBand.band_hash).in_(bands), ActivityRouteBand.activity_id != activity_id).distinct()
+    candidate_ids = list(session.exec(candidates_statement))
+    if not candidate_ids:
+        return []
+
+    statement = sqlmodel.select(ActivityFingerprint).where(ActivityFingerprint.activity_id.in_(candidate_ids))  # type: ignore[attr-defined]
+    similar = [(candidate.activity_id, route_similarity(fingerprint.route_signature, candidate.route_signature)) for candidate in session.exec(statement) if candidate.route_signature is not None]
+    return sorted([(candidate_id, similarity) for candidate_id, similarity in similar if similarity >= min_similarity], key=lambda item: -item[1])
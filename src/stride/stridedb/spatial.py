@@ -0,0 +1,150 @@
+import math
+from typing import Sequence
+
+import sqlalchemy
+import sqlmodel
+
+from stride.stridedb.models import ActivityGeoTile
+
+# precision 6 tiles are roughly 1.2km x 0.6km
+GEOHASH_TILE_PRECISION = 6
+
+# queries covering more tiles than this only use the bounding box index
+MAX_QUERY_TILES = 1024
+
+EARTH_RADIUS_M = 6_371_000.0
+METERS_PER_DEGREE_LAT = 111_320.0
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+BBOX_TABLE = "activity_bbox"
+
+# SQLite R*Tree with one bounding box per activity, keyed by activity id
+sqlalchemy.event.listen(
+    sqlmodel.SQLModel.metadata,
+    "after_create",
+    sqlalchemy.DDL(f"CREATE VIRTUAL TABLE IF NOT EXISTS {BBOX_TABLE} USING rtree(id, min_lat, max_lat, min_lng, max_lng)"),  # type: ignore[no-untyped-call]
+)
+
+BoundingBox = tuple[float, float, float, float]  # min_lat, min_lng, max_lat, max_lng
+
+
+def encode_geohash(lat: float, lng: float, precision: int = GEOHASH_TILE_PRECISION) -> str:
+    """Encode a coordinate as a geohash of the given precision."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash: list[str] = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        value, value_range = (lng, lng_range) if even else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits <<= 1
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(geohash)
+
+
+def geohash_cell_size(precision: int = GEOHASH_TILE_PRECISION) -> tuple[float, float]:
+    """Get the (lat, lng) size in degrees of a geohash cell."""
+    lng_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision - lng_bits
+    return 180.0 / 2**lat_bits, 360.0 / 2**lng_bits
+
+
+def geohashes_in_bbox(bbox: BoundingBox, precision: int = GEOHASH_TILE_PRECISION) -> set[str]:
+    """Get all geohash cells of the given precision that intersect a bounding box."""
+    min_lat, min_lng, max_lat, max_lng = bbox
+    cell_lat, cell_lng = geohash_cell_size(precision)
+    lat_cells = range(math.floor((min_lat + 90) / cell_lat), math.floor((max_lat + 90) / cell_lat) + 1)
+    lng_cells = range(math.floor((min_lng + 180) / cell_lng), math.floor((max_lng + 180) / cell_lng) + 1)
+    # encode the center of every cell to avoid ambiguity on cell borders
+    return {encode_geohash(-90 + (i + 0.5) * cell_lat, -180 + (j + 0.5) * cell_lng, precision) for i in lat_cells for j in lng_cells}
+
+
+def bbox_around(lat: float, lng: float, radius_m: float) -> BoundingBox:
+    """Get the bounding box of a circle around a point."""
+    delta_lat = radius_m / METERS_PER_DEGREE_LAT
+    delta_lng = radius_m / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - delta_lat, lng - delta_lng, lat + delta_lat, lng + delta_lng
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two coordinates in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def coordinates_bbox(coordinates: Sequence[tuple[float, float]]) -> BoundingBox:
+    """Get the bounding box of a list of (lat, lng) coordinates."""
+    lats = [lat for lat, _ in coordinates]
+    lngs = [lng for _, lng in coordinates]
+    return min(lats), min(lngs), max(lats), max(lngs)
+
+
+def index_activity(session: sqlmodel.Session, activity_id: int, coordinates: Sequence[tuple[float, float]]) -> None:
+    """Add the bounding box and geohash tiles of an activity's track to the spatial index.
+
+    Args:
+        session: Open session, committed by the caller
+        activity_id: ID of the activity
+        coordinates: (lat, lng) track of the activity
+    """
+    if not coordinates:
+        return
+
+    min_lat, min_lng, max_lat, max_lng = coordinates_bbox(coordinates)
+    session.execute(
+        sqlalchemy.text(f"INSERT OR REPLACE INTO {BBOX_TABLE} VALUES (:id, :min_lat, :max_lat, :min_lng, :max_lng)"),
+        {"id": activity_id, "min_lat": min_lat, "max_lat": max_lat, "min_lng": min_lng, "max_lng": max_lng},
+    )
+    geohashes = {encode_geohash(lat, lng) for lat, lng in coordinates}
+    session.add_all([ActivityGeoTile(geohash=geohash, activity_id=activity_id) for geohash in geohashes])
+
+
+def remove_activity(session: sqlmodel.Session, activity_id: int) -> None:
+    """Remove an activity from the spatial index."""
+    session.execute(sqlalchemy.text(f"DELETE FROM {BBOX_TABLE} WHERE id = :id"), {"id": activity_id})
+    session.execute(sqlalchemy.delete(ActivityGeoTile).where(sqlmodel.col(ActivityGeoTile.activity_id) == activity_id))
+
+
+def find_activity_ids_in_bbox(session: sqlmodel.Session, bbox: BoundingBox) -> list[int]:
+    """Find activities whose track passes through a bounding box.
+
+    Candidates come from the R*Tree (track bounding box overlaps the area), and are
+    narrowed down to activities with at least one tile inside the area when the
+    area is small enough to enumerate its tiles.
+
+    Args:
+        session: Open session
+        bbox: Area to search in
+
+    Returns:
+        IDs of the matching activities
+    """
+    min_lat, min_lng, max_lat, max_lng = bbox
+    bbox_query = sqlalchemy.text(f"SELECT id FROM {BBOX_TABLE} WHERE max_lat >= :min_lat AND min_lat <= :max_lat AND max_lng >= :min_lng AND min_lng <= :max_lng")
+    candidates = [row[0] for row in session.execute(bbox_query, {"min_lat": min_lat, "max_lat": max_lat, "min_lng": min_lng, "max_lng": max_lng})]
+
+    cell_lat, cell_lng = geohash_cell_size()
+    n_tiles = ((max_lat - min_lat) / cell_lat + 1) * ((max_lng - min_lng) / cell_lng + 1)
+    if not candidates or n_tiles > MAX_QUERY_TILES:
+        return candidates
+
+    statement = (
+        sqlmodel.select(ActivityGeoTile.activity_id)
+        .where(ActivityGeoTile.geohash.in_(geohashes_in_bbox(bbox)), ActivityGeoTile.activity_id.in_(candidates))  # type: ignore[attr-defined]
+        .distinct()
+    )
+    return list(session.exec(statement))
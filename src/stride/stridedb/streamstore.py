@@ -0,0 +1,231 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
+
+from loguru import logger
+
+from stride.enums import StreamType
+
+if TYPE_CHECKING:
+    from stride.stridedb.models import Activity
+
+# index record: activity id, offset (in samples) into the data file, number of samples (-1: removed)
+INDEX_RECORD = struct.Struct("<qqq")
+SAMPLE_BYTES = 8  # little endian float64
+
+REMOVED = -1
+
+
+class StreamColumn:
+    """Append-only column of one stream type: <type>.f64 holds the concatenated samples, <type>.idx the offset index.
+
+    Writing a stream again appends a new copy and a new index record, the last record
+    of an activity wins. Space of replaced and removed streams is reclaimed by compact().
+    """
+
+    def __init__(self, root: Path, stream_type: StreamType):
+        self.stream_type = stream_type
+        self.data_path = root / f"{stream_type.value}.f64"
+        self.index_path = root / f"{stream_type.value}.idx"
+        self.index: dict[int, tuple[int, int]] = {}
+        self._index_bytes = 0
+        self._map: mmap.mmap | None = None
+        self._mapped_bytes = 0
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Read index records appended since the last refresh, e.g. by another process."""
+        if not self.index_path.exists():
+            return
+        if self.index_path.stat().st_size < self._index_bytes:
+            # compacted by another process
+            self.index, self._index_bytes, self._map, self._mapped_bytes = {}, 0, None, 0
+        with open(self.index_path, "rb") as file:
+            file.seek(self._index_bytes)
+            data = file.read()
+        complete = len(data) - len(data) % INDEX_RECORD.size
+        for activity_id, offset, count in INDEX_RECORD.iter_unpack(data[:complete]):
+            if count == REMOVED:
+                self.index.pop(activity_id, None)
+            else:
+                self.index[activity_id] = (offset, count)
+        self._index_bytes += complete
+
+    def _append_record(self, activity_id: int, offset: int, count: int) -> None:
+        with open(self.index_path, "ab") as file:
+            file.write(INDEX_RECORD.pack(activity_id, offset, count))
+        self._index_bytes += INDEX_RECORD.size
+
+    def append(self, activity_id: int, values: Iterable[float]) -> None:
+        """Append the samples of an activity, replacing the stored ones."""
+        samples = array("d", values)
+        with open(self.data_path, "ab") as file:
+            offset = file.tell() // SAMPLE_BYTES
+            samples.tofile(file)
+        self._append_record(activity_id, offset, len(samples))
+        self.index[activity_id] = (offset, len(samples))
+
+    def remove(self, activity_id: int) -> None:
+        if activity_id in self.index:
+            self._append_record(activity_id, 0, REMOVED)
+            del self.index[activity_id]
+
+    def _mapping(self, end_byte: int) -> mmap.mmap:
+        """Map the data file, remapping it if samples were appended past the mapped size.
+
+        Old mappings stay alive as long as views into them exist.
+        """
+        if self._map is None or end_byte > self._mapped_bytes:
+            size = os.path.getsize(self.data_path)
+            with open(self.data_path, "rb") as file:
+                self._map = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ)
+            self._mapped_bytes = size
+        return self._map
+
+    def column(self) -> "memoryview[float]":
+        """Zero-copy view of all samples in the data file (including replaced ones), activities are located with the index."""
+        if not self.data_path.exists() or os.path.getsize(self.data_path) == 0:
+            return memoryview(array("d"))
+        size = os.path.getsize(self.data_path)
+        return memoryview(self._mapping(size))[: size - size % SAMPLE_BYTES].cast("d")
+
+    def view(self, activity_id: int) -> "memoryview[float]":
+        """Zero-copy view of the samples of an activity, raises KeyError if it has no stream of this type."""
+        offset, count = self.index[activity_id]
+        if count == 0:
+            return memoryview(array("d"))
+        start, end = offset * SAMPLE_BYTES, (offset + count) * SAMPLE_BYTES
+        return memoryview(self._mapping(end))[start:end].cast("d")
+
+    def compact(self) -> None:
+        """Rewrite the files with only the current streams, ordered by activity id."""
+        new_data = self.data_path.with_suffix(".f64.tmp")
+        new_index = self.index_path.with_suffix(".idx.tmp")
+        index: dict[int, tuple[int, int]] = {}
+        offset = 0
+        with open(new_data, "wb") as data_file, open(new_index, "wb") as index_file:
+            for activity_id in sorted(self.index):
+                samples = self.view(activity_id)
+                data_file.write(samples)
+                index_file.write(INDEX_RECORD.pack(activity_id, offset, len(samples)))
+                index[activity_id] = (offset, len(samples))
+                offset += len(samples)
+        self._map = None
+        os.replace(new_data, self.data_path)
+        os.replace(new_index, self.index_path)
+        self.index = index
+        self._index_bytes = len(index) * INDEX_RECORD.size
+        self._mapped_bytes = 0
+
+
+class StreamStore:
+    """Memory-mapped store of stream samples, for scans over many activities without ORM objects.
+
+    Every stream type is a flat file of float64 samples plus an offset index keyed by
+    activity id (latlng streams hold interleaved lat, lng pairs, as in the database).
+    Views are zero-copy slices of the mapped files, they can be wrapped in NumPy or
+    Arrow arrays without copying (as_numpy(), as_arrow()).
+
+    The store is append-only and meant for a single writer, readers in other
+    processes pick up new streams with refresh().
+
+    Args:
+        root: Directory of the store files
+    """
+
+    def __init__(self, root: Path):
+        if sys.byteorder != "little":
+            raise RuntimeError("The stream store files hold little endian samples")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.columns = {stream_type: StreamColumn(self.root, stream_type) for stream_type in StreamType}
+
+    def refresh(self) -> None:
+        for column in self.columns.values():
+            column.refresh()
+
+    def append(self, activity_id: int, stream_type: StreamType, values: Iterable[float]) -> None:
+        """Store the samples of a stream, replacing the stored ones."""
+        self.columns[stream_type].append(activity_id, values)
+
+    def append_activity(self, activity: "Activity") -> None:
+        """Store all streams of an activity, streams the activity no longer has are removed."""
+        stream_types = set()
+        for stream in activity.streams or []:
+            self.append(activity.id, stream.stream_type, stream.values)
+            stream_types.add(stream.stream_type)
+        for stream_type, column in self.columns.items():
+            if stream_type not in stream_types:
+                column.remove(activity.id)
+
+    def remove(self, activity_id: int) -> None:
+        """Remove all streams of an activity."""
+        for column in self.columns.values():
+            column.remove(activity_id)
+
+    def has(self, activity_id: int, stream_type: StreamType) -> bool:
+        return activity_id in self.columns[stream_type].index
+
+    def activity_ids(self, stream_type: StreamType) -> list[int]:
+        """IDs of the activities with a stream of a type, sorted."""
+        return sorted(self.columns[stream_type].index)
+
+    def view(self, activity_id: int, stream_type: StreamType) -> "memoryview[float]":
+        """Zero-copy view of the float64 samples of a stream, raises KeyError if it is not stored."""
+        return self.columns[stream_type].view(activity_id)
+
+    def scan(self, stream_type: StreamType, activity_ids: Iterable[int] | None = None) -> Iterator[tuple[int, "memoryview[float]"]]:
+        """Iterate over (activity id, samples view) of all (or the given) activities with a stream of a type."""
+        column = self.columns[stream_type]
+        for activity_id in sorted(column.index) if activity_ids is None else activity_ids:
+            if activity_id in column.index:
+                yield activity_id, column.view(activity_id)
+
+    def column(self, stream_type: StreamType) -> tuple["memoryview[float]", dict[int, tuple[int, int]]]:
+        """Zero-copy view of all samples of a stream type, with the (offset, count) of every activity in it.
+
+        For vectorized scans: one array over the whole history instead of one per activity.
+        """
+        column = self.columns[stream_type]
+        return column.column(), dict(column.index)
+
+    def compact(self) -> None:
+        for column in self.columns.values():
+            if column.data_path.exists():
+                column.compact()
+
+    def size_bytes(self) -> int:
+        return sum(path.stat().st_size for path in self.root.iterdir() if path.is_file())
+
+
+def as_numpy(view: "memoryview[float]") -> Any:
+    """Wrap a samples view in a NumPy array without copying (needs numpy)."""
+    try:
+        import numpy as np
+    except ImportError as e:
+        raise ImportError("as_numpy needs numpy, install stride[analytics]") from e
+    return np.frombuffer(view, dtype=np.float64)
+
+
+def as_arrow(view: "memoryview[float]") -> Any:
+    """Wrap a samples view in an Arrow float64 array without copying (needs pyarrow)."""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("as_arrow needs pyarrow, install stride[analytics]") from e
+    return pa.Array.from_buffers(pa.float64(), len(view), [None, pa.py_buffer(view)])
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    store = StreamStore(Path(tempfile.mkdtemp()))
+    store.append(1, StreamType.HEARTRATE, [120.0, 125.0, 130.0])
+    store.append(2, StreamType.HEARTRATE, [90.0, 95.0])
+    store.append(1, StreamType.HEARTRATE, [121.0, 126.0])
+    for activity_id, samples in store.scan(StreamType.HEARTRATE):
+        logger.info(f"{activity_id}: {samples.tolist()}")
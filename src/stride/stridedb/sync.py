@@ -0,0 +1,378 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import requests
+import sqlalchemy
+import sqlmodel
+from loguru import logger
+
+from stride.enums import Provider
+from stride.provider.strava.main import StravaService
+from stride.provider.strava.models import StravaActivityResponseModel, StravaJSONStreamResponseModel
+from stride.provider.strava.prefetch import StreamPrefetcher
+from stride.provider.strava.streams import plan_streams
+from stride.stridedb.converters import StrideConverterService
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.sharding import ShardedStrideDBService
+from stride.stridedb.models import SyncCheckpoint, SyncJob, SyncJobStage, SyncJobStatus
+
+# activities are listed in windows of this length, pages of at most LIST_PAGE_SIZE (the Strava maximum)
+LIST_WINDOW = timedelta(days=30)
+LIST_PAGE_SIZE = 200
+
+# leases expire so jobs of a crashed worker are picked up again
+LEASE_DURATION = timedelta(minutes=5)
+
+MAX_ATTEMPTS = 8
+RETRY_BACKOFF = timedelta(seconds=30)  # doubled for every failed attempt
+RATE_LIMIT_BACKOFF = timedelta(minutes=15)  # Strava rate limits reset every 15 minutes
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+class SyncQueue:
+    """Durable queue of sync jobs with leases, backed by the SyncJob table."""
+
+    def __init__(self, engine: sqlalchemy.Engine):
+        self.engine = engine
+
+    def enqueue(self, session: sqlmodel.Session, activities: list[StravaActivityResponseModel]) -> int:
+        """Queue jobs for listed activities, activities that already have a job are skipped.
+
+        Args:
+            session: Open session, committed by the caller (together with the checkpoint)
+            activities: Listed activity summaries
+
+        Returns:
+            Number of queued jobs
+        """
+        ids = [activity.id for activity in activities if activity.id is not None]
+        statement = sqlmodel.select(SyncJob.provider_activity_id).where(SyncJob.provider == Provider.STRAVA, SyncJob.provider_activity_id.in_(ids))  # type: ignore[attr-defined]
+        known = set(session.exec(statement))
+        jobs = [SyncJob(provider=Provider.STRAVA, provider_activity_id=activity.id, activity_payload=activity.model_dump_json()) for activity in activities if activity.id is not None and activity.id not in known]
+        session.add_all(jobs)
+        return len(jobs)
+
+    def claim(self, owner: str, limit: int = 10) -> list[SyncJob]:
+        """Lease pending (or abandoned) jobs, oldest first.
+
+        The lease is taken with a single UPDATE, so concurrent workers never claim the same job.
+        Claiming does not count an attempt, start does once the job actually runs.
+
+        Args:
+            owner: Unique name of the worker
+            limit: Maximum number of jobs to lease
+
+        Returns:
+            Leased jobs
+        """
+        now = _now()
+        claimable = (
+            sqlmodel.select(SyncJob.id)
+            .where(
+                ((SyncJob.status == SyncJobStatus.PENDING) & (SyncJob.next_attempt_at.is_(None) | (SyncJob.next_attempt_at <= now)))  # type: ignore[union-attr, operator]
+                | ((SyncJob.status == SyncJobStatus.LEASED) & (SyncJob.lease_expires_at < now))  # type: ignore[operator]
+            )
+            .order_by(SyncJob.id)  # type: ignore[arg-type]
+            .limit(limit)
+            .scalar_subquery()
+        )
+        with sqlmodel.Session(self.engine, expire_on_commit=False) as session:
+            session.execute(
+                sqlalchemy.update(SyncJob)
+                .where(SyncJob.id.in_(claimable))  # type: ignore[union-attr]
+                .values(status=SyncJobStatus.LEASED, lease_owner=owner, lease_expires_at=now + LEASE_DURATION, updated_at=now)
+            )
+            session.commit()
+            statement = sqlmodel.select(SyncJob).where(SyncJob.status == SyncJobStatus.LEASED, SyncJob.lease_owner == owner).order_by(SyncJob.id)  # type: ignore[arg-type]
+            return list(session.exec(statement))
+
+    def start(self, job: SyncJob, owner: str, held: list[SyncJob]) -> bool:
+        """Count an attempt of a leased job that is about to run and renew the leases of all jobs the worker holds.
+
+        Jobs are claimed in batches but run one after another, renewing every held job keeps
+        the lease of the last job of a batch from expiring while the jobs before it run.
+
+        Args:
+            job: Leased job that is about to run
+            owner: Worker holding the leases
+            held: Jobs the worker holds and did not run yet, including job
+
+        Returns:
+            False if the lease of job was lost (expired and claimed by another worker)
+        """
+        now = _now()
+        with sqlmodel.Session(self.engine) as session:
+            session.execute(
+                sqlalchemy.update(SyncJob)
+                .where(SyncJob.id.in_([held_job.id for held_job in held]), SyncJob.lease_owner == owner)  # type: ignore[union-attr, arg-type]
+                .values(lease_expires_at=now + LEASE_DURATION, updated_at=now)
+            )
+            result = session.execute(sqlalchemy.update(SyncJob).where(SyncJob.id == job.id, SyncJob.lease_owner == owner).values(attempts=SyncJob.attempts + 1))  # type: ignore[arg-type]
+            session.commit()
+        if result.rowcount:  # type: ignore[attr-defined]
+            job.attempts += 1
+        return bool(result.rowcount)  # type: ignore[attr-defined]
+
+    def advance(self, job: SyncJob, owner: str, stage: SyncJobStage, **fields: object) -> bool:
+        """Record a completed step of a leased job.
+
+        Args:
+            job: Leased job
+            owner: Worker holding the lease
+            stage: Step that was completed
+            fields: Other job fields to update, e.g. the stored payload
+
+        Returns:
+            False if the lease was lost (expired and claimed by another worker)
+        """
+        done = stage == SyncJobStage.SAVED
+        values = {"stage": stage, "updated_at": _now(), "error": None, **fields}
+        if done:
+            values.update(status=SyncJobStatus.DONE, lease_owner=None, lease_expires_at=None)
+        else:
+            values["lease_expires_at"] = _now() + LEASE_DURATION
+        with sqlmodel.Session(self.engine) as session:
+            result = session.execute(sqlalchemy.update(SyncJob).where(SyncJob.id == job.id, SyncJob.lease_owner == owner).values(**values))  # type: ignore[arg-type]
+            session.commit()
+        if result.rowcount:  # type: ignore[attr-defined]
+            job.stage = stage
+        return bool(result.rowcount)  # type: ignore[attr-defined]
+
+    def fail(self, job: SyncJob, owner: str, error: str, backoff: timedelta | None = None) -> None:
+        """Release a leased job after a failure, it is retried with exponential backoff until it runs out of attempts."""
+        backoff = backoff or RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        status = SyncJobStatus.FAILED if job.attempts >= MAX_ATTEMPTS else SyncJobStatus.PENDING
+        with sqlmodel.Session(self.engine) as session:
+            session.execute(
+                sqlalchemy.update(SyncJob)
+                .where(SyncJob.id == job.id, SyncJob.lease_owner == owner)  # type: ignore[arg-type]
+                .values(status=status, lease_owner=None, lease_expires_at=None, next_attempt_at=_now() + backoff, error=error[:500], updated_at=_now())
+            )
+            session.commit()
+
+    def release(self, jobs: list[SyncJob], owner: str, reason: str, backoff: timedelta) -> None:
+        """Return leased jobs that did not run to the queue after a backoff, without counting an attempt."""
+        with sqlmodel.Session(self.engine) as session:
+            session.execute(
+                sqlalchemy.update(SyncJob)
+                .where(SyncJob.id.in_([job.id for job in jobs]), SyncJob.lease_owner == owner)  # type: ignore[union-attr, arg-type]
+                .values(status=SyncJobStatus.PENDING, lease_owner=None, lease_expires_at=None, next_attempt_at=_now() + backoff, error=reason, updated_at=_now())
+            )
+            session.commit()
+
+    def retry_failed(self) -> int:
+        """Give jobs that ran out of attempts a new set of attempts."""
+        with sqlmodel.Session(self.engine) as session:
+            result = session.execute(
+                sqlalchemy.update(SyncJob).where(SyncJob.status == SyncJobStatus.FAILED).values(status=SyncJobStatus.PENDING, attempts=0, next_attempt_at=None)  # type: ignore[arg-type]
+            )
+            session.commit()
+            return int(result.rowcount)  # type: ignore[attr-defined]
+
+    def counts(self) -> dict[SyncJobStatus, int]:
+        """Count the jobs per status."""
+        with sqlmodel.Session(self.engine) as session:
+            statement = sqlmodel.select(SyncJob.status, sqlalchemy.func.count()).group_by(SyncJob.status)
+            return {SyncJobStatus(status): count for status, count in session.exec(statement)}
+
+
+class StravaSync:
+    """Resumable backfill of Strava activities into stridedb.
+
+    Listing progress is checkpointed per page and every activity becomes a SyncJob
+    that stores the responses of its completed steps, so a crashed or interrupted
+    sync resumes exactly where it stopped without repeating any API call.
+
+    Workers fetch the streams of the next claimed jobs ahead while the current job is
+    converted and saved (StreamPrefetcher), unless prefetch is False.
+    """
+
+    def __init__(self, db_service: StrideDBService | ShardedStrideDBService, strava_service: StravaService | None = None, name: str = "strava", prefetch: bool = True):
+        self.db_service = db_service
+        self.strava_service = strava_service or StravaService()
+        self.name = name
+        self.prefetch = prefetch
+        self.queue = SyncQueue(db_service.engine)
+
+    def plan(self, start_date: datetime, end_date: datetime) -> SyncCheckpoint:
+        """Start a new sync of the activities between two dates, replacing the checkpoint of a previous sync.
+
+        Jobs of earlier syncs are kept, activities they cover are not queued again.
+        """
+        if start_date > end_date:
+            raise ValueError("start_date must be before end_date")
+        checkpoint = SyncCheckpoint(name=self.name, provider=Provider.STRAVA, start_date=_as_utc(start_date), end_date=_as_utc(end_date), listed_until=_as_utc(start_date))
+        with sqlmodel.Session(self.engine, expire_on_commit=False) as session:
+            session.merge(checkpoint)
+            session.commit()
+        return checkpoint
+
+    @property
+    def engine(self) -> sqlalchemy.Engine:
+        return self.db_service.engine
+
+    def get_checkpoint(self) -> SyncCheckpoint | None:
+        """Get the checkpoint of the sync, None if it was never planned."""
+        with sqlmodel.Session(self.engine) as session:
+            return session.get(SyncCheckpoint, self.name)
+
+    def list_activities(self) -> int:
+        """List the remaining pages of the sync and queue a job per activity.
+
+        Each page is committed together with the checkpoint, so a listed page is never requested again.
+
+        Returns:
+            Number of queued jobs
+        """
+        queued = 0
+        while True:
+            with sqlmodel.Session(self.engine, expire_on_commit=False) as session:
+                checkpoint = session.get(SyncCheckpoint, self.name)
+                if checkpoint is None:
+                    raise ValueError(f"Sync {self.name} was not planned, run it with a date range first")
+                if checkpoint.completed:
+                    return queued
+
+                listed_until, end_date = _as_utc(checkpoint.listed_until), _as_utc(checkpoint.end_date)
+                window_end = min(listed_until + LIST_WINDOW, end_date)
+                page = checkpoint.page
+                activities = self.strava_service.get_activities(per_page=LIST_PAGE_SIZE, page=page, start_date=listed_until, end_date=window_end)
+                queued += self.queue.enqueue(session, activities)
+
+                if len(activities) == LIST_PAGE_SIZE:
+                    checkpoint.page += 1
+                else:
+                    checkpoint.listed_until, checkpoint.page = window_end, 1
+                    checkpoint.completed = window_end >= end_date
+                checkpoint.updated_at = _now()
+                session.add(checkpoint)
+                session.commit()
+                logger.info(f"Listed page {page} of {listed_until:%Y-%m-%d} - {window_end:%Y-%m-%d}, {queued} jobs queued")
+
+    def process_job(self, job: SyncJob, owner: str, prefetcher: StreamPrefetcher | None = None) -> None:
+        """Run the remaining steps of a leased job.
+
+        Args:
+            job: Leased job
+            owner: Worker holding the lease
+            prefetcher: Prefetcher the streams of the job may already be fetched by
+        """
+        if job.stage == SyncJobStage.LISTED:
+            if self.db_service.check_if_activity_exists(job.provider_activity_id, job.provider):
+                # saved by a previous sync or a webhook, no need to fetch anything
+                if prefetcher is not None:
+                    prefetcher.discard(job.provider_activity_id)
+                self.queue.advance(job, owner, SyncJobStage.SAVED)
+                return
+            stream_types = plan_streams(StravaActivityResponseModel.model_validate_json(job.activity_payload))
+            if prefetcher is not None:
+                streams = prefetcher.get(job.provider_activity_id, stream_types)
+            else:
+                streams = self.strava_service.get_streams(job.provider_activity_id, stream_types)
+            job.streams_payload = streams.model_dump_json(by_alias=True)
+            if not self.queue.advance(job, owner, SyncJobStage.FETCHED, streams_payload=job.streams_payload):
+                logger.warning(f"Lost the lease of sync job {job.id}")
+                return
+
+        if job.stage == SyncJobStage.FETCHED:
+            start = time.perf_counter()
+            strava_activity = StravaActivityResponseModel.model_validate_json(job.activity_payload)
+            strava_streams = StravaJSONStreamResponseModel.model_validate_json(job.streams_payload or '{"streams": []}')
+            activity = StrideConverterService.process_strava_data(strava_activity, strava_streams)
+            self.db_service.save_activity(activity, verbose=False)
+            # the streams live in stridedb now
+            self.queue.advance(job, owner, SyncJobStage.SAVED, streams_payload=None)
+            if prefetcher is not None:
+                prefetcher.record_processing(time.perf_counter() - start)
+
+    def work(self, batch_size: int = 10, owner: str | None = None) -> int:
+        """Process jobs until none can be claimed.
+
+        Args:
+            batch_size: Number of jobs leased at once
+            owner: Unique name of the worker (default: random)
+
+        Returns:
+            Number of jobs processed (including failed attempts)
+        """
+        owner = owner or f"worker-{uuid.uuid4().hex[:8]}"
+        processed = 0
+        prefetcher = StreamPrefetcher(self.strava_service) if self.prefetch else None
+        # claim at least as many jobs as can be prefetched, the lookahead ends at the claimed jobs
+        # (their leases are renewed whenever one of them starts, see SyncQueue.start)
+        claim_size = max(batch_size, prefetcher.max_depth) if prefetcher is not None else batch_size
+        try:
+            while jobs := self.queue.claim(owner, claim_size):
+                if prefetcher is not None:
+                    self._schedule_prefetch(prefetcher, jobs)
+                for index, job in enumerate(jobs):
+                    if not self.queue.start(job, owner, jobs[index:]):
+                        logger.warning(f"Lost the lease of sync job {job.id}")
+                        if prefetcher is not None:
+                            prefetcher.discard(job.provider_activity_id)
+                        continue
+                    try:
+                        self.process_job(job, owner, prefetcher)
+                    except requests.HTTPError as e:
+                        rate_limited = e.response is not None and e.response.status_code == 429
+                        logger.warning(f"Sync job {job.id} (activity {job.provider_activity_id}) failed: {e}")
+                        self.queue.fail(job, owner, str(e), backoff=RATE_LIMIT_BACKOFF if rate_limited else None)
+                        if rate_limited:
+                            # every other request would be refused too, leave the remaining jobs for later
+                            self.queue.release(jobs[index + 1 :], owner, "rate limited", RATE_LIMIT_BACKOFF)
+                            return processed + 1
+                    except Exception as e:
+                        logger.warning(f"Sync job {job.id} (activity {job.provider_activity_id}) failed: {str(e)[:100]}")
+                        self.queue.fail(job, owner, str(e))
+                    processed += 1
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+        return processed
+
+    def _schedule_prefetch(self, prefetcher: StreamPrefetcher, jobs: list[SyncJob]) -> None:
+        """Prefetch the streams of the claimed jobs that still need them, in processing order."""
+        listed = [job for job in jobs if job.stage == SyncJobStage.LISTED]
+        saved = self.db_service.resolve_activity_ids([(job.provider, job.provider_activity_id) for job in listed])
+        upcoming = [job for job in listed if (job.provider, job.provider_activity_id) not in saved]
+        stream_types = {job.provider_activity_id: plan_streams(StravaActivityResponseModel.model_validate_json(job.activity_payload)) for job in upcoming}
+        prefetcher.schedule([job.provider_activity_id for job in upcoming], stream_types)
+
+    def run(self, start_date: datetime | None = None, end_date: datetime | None = None, resume: bool = False, workers: int = 1) -> dict[SyncJobStatus, int]:
+        """Plan (unless resuming), list and process a sync.
+
+        Args:
+            start_date: Start of the date range (required unless resuming)
+            end_date: End of the date range (default: now)
+            resume: Continue the previous sync instead of planning a new one
+            workers: Number of worker threads processing jobs
+
+        Returns:
+            Number of jobs per status
+        """
+        if not resume:
+            if start_date is None:
+                raise ValueError("start_date is required for a new sync")
+            self.plan(start_date, end_date or _now())
+        elif self.get_checkpoint() is None:
+            raise ValueError(f"No sync {self.name} to resume")
+
+        self.list_activities()
+        threads = [threading.Thread(target=self.work, name=f"sync-worker-{i}") for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        counts = self.queue.counts()
+        logger.info(f"Sync {self.name}: " + ", ".join(f"{count} {status}" for status, count in counts.items()))
+        return counts
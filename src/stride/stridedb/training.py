@@ -0,0 +1,260 @@
+import math
+from datetime import date, timedelta
+from typing import Any, Sequence
+
+import polars as pl
+import sqlalchemy
+import sqlmodel
+
+from stride.enums import StreamType
+from stride.stridedb.models import Activity, ActivityLoad, RollupPeriod, TrainingRollup
+
+# heartrate reserve of the (default) athlete, used for TRIMP and zones
+REST_HEARTRATE = 60.0
+MAX_HEARTRATE = 190.0
+
+# fraction of the max heartrate at which zones 2 to 5 start
+ZONE_BOUNDS = (0.6, 0.7, 0.8, 0.9)
+
+# load of an hour of moving time, for activities without heartrate
+LOAD_PER_HOUR_WITHOUT_HEARTRATE = 50.0
+
+# time constants of the fitness (chronic) and fatigue (acute) curves, in days
+CTL_DAYS = 42
+ATL_DAYS = 7
+
+# windows of the acute:chronic workload ratio, in days
+ACUTE_WINDOW_DAYS = 7
+CHRONIC_WINDOW_DAYS = 28
+
+ZONE_FIELDS = ("zone1_s", "zone2_s", "zone3_s", "zone4_s", "zone5_s")
+SUM_FIELDS = ("distance", "moving_time", "load") + ZONE_FIELDS
+
+
+def period_start(day: date, period: RollupPeriod) -> date:
+    """Get the first day of the day, week (Monday) or month a day falls in."""
+    if period == RollupPeriod.WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == RollupPeriod.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def trimp(heartrate: Sequence[float], time: Sequence[float] | None = None) -> tuple[float, list[float]]:
+    """Compute Banister's TRIMP and the seconds spent per heartrate zone.
+
+    Args:
+        heartrate: Heartrate samples
+        time: Elapsed seconds of every sample (default: one sample per second)
+
+    Returns:
+        TRIMP and the seconds in each of the 5 zones
+    """
+    load = 0.0
+    zones = [0.0] * 5
+    previous = 0.0
+    for index, hr in enumerate(heartrate):
+        current = time[index] if time is not None and index < len(time) else float(index)
+        dt = max(current - previous, 0.0) if index > 0 else 1.0
+        previous = current
+        reserve = min(max((hr - REST_HEARTRATE) / (MAX_HEARTRATE - REST_HEARTRATE), 0.0), 1.0)
+        load += dt / 60 * reserve * 0.64 * math.exp(1.92 * reserve)
+        zones[sum(hr >= bound * MAX_HEARTRATE for bound in ZONE_BOUNDS)] += dt
+    return load, zones
+
+
+def compute_load(activity: Activity) -> ActivityLoad | None:
+    """Compute the rollup contribution of an activity, None if it has no start date.
+
+    Args:
+        activity: Activity with an ID and its streams attached
+    """
+    if activity.start_date is None:
+        return None
+    streams = {stream.stream_type: stream for stream in activity.streams or []}
+    zones = [0.0] * 5
+    if StreamType.HEARTRATE in streams:
+        time = streams[StreamType.TIME].values if StreamType.TIME in streams else None
+        load, zones = trimp(streams[StreamType.HEARTRATE].values, time)
+    else:
+        load = activity.moving_time / 3600 * LOAD_PER_HOUR_WITHOUT_HEARTRATE
+    return ActivityLoad(
+        activity_id=activity.id,
+        athlete_id=activity.athlete_id or 0,
+        day=activity.start_date.date(),
+        sport=activity.sport or "",
+        distance=activity.distance,
+        moving_time=activity.moving_time,
+        load=load,
+        **dict(zip(ZONE_FIELDS, zones)),
+    )
+
+
+def _apply(session: sqlmodel.Session, load: ActivityLoad, sign: int) -> None:
+    """Add (sign 1) or subtract (sign -1) the contribution of an activity to its day, week and month."""
+    for period in RollupPeriod:
+        key = (load.athlete_id, period, period_start(load.day, period), load.sport)
+        rollup = session.get(TrainingRollup, key)
+        if rollup is None:
+            rollup = TrainingRollup(athlete_id=key[0], period=period, period_start=key[2], sport=key[3])
+        rollup.count += sign
+        for field in SUM_FIELDS:
+            setattr(rollup, field, getattr(rollup, field) + sign * getattr(load, field))
+        if rollup.count <= 0:
+            if sqlalchemy.inspect(rollup, raiseerr=True).persistent:
+                session.delete(rollup)
+        else:
+            session.add(rollup)
+
+
+def index_activity(session: sqlmodel.Session, activity: Activity) -> None:
+    """Add an activity to the training rollups.
+
+    Args:
+        session: Open session, committed by the caller
+        activity: Activity with an ID and its streams attached
+    """
+    load = compute_load(activity)
+    if load is not None:
+        session.add(load)
+        _apply(session, load, 1)
+
+
+def remove_activity(session: sqlmodel.Session, activity_id: int) -> None:
+    """Remove an activity from the training rollups."""
+    load = session.get(ActivityLoad, activity_id)
+    if load is not None:
+        _apply(session, load, -1)
+        session.delete(load)
+
+
+def update_activity_summary(session: sqlmodel.Session, activity: Activity) -> None:
+    """Move an activity whose summary (sport, start date, distance, ...) changed to its new rollups.
+
+    The load and zone times came from the streams, they are kept.
+    """
+    load = session.get(ActivityLoad, activity.id)
+    if load is None:
+        return
+    _apply(session, load, -1)
+    if activity.start_date is None:
+        session.delete(load)
+        return
+    load.athlete_id = activity.athlete_id or 0
+    load.day = activity.start_date.date()
+    load.sport = activity.sport or ""
+    load.distance = activity.distance
+    load.moving_time = activity.moving_time
+    session.add(load)
+    _apply(session, load, 1)
+
+
+def _filters(athlete_id: int | None, start: date | None, end: date | None, sport: str | None) -> list[sqlalchemy.ColumnElement[bool]]:
+    filters = []
+    if athlete_id is not None:
+        filters.append(TrainingRollup.athlete_id == athlete_id)
+    if start is not None:
+        filters.append(TrainingRollup.period_start >= start)
+    if end is not None:
+        filters.append(TrainingRollup.period_start <= end)
+    if sport is not None:
+        filters.append(TrainingRollup.sport == sport)
+    return filters  # type: ignore[return-value]
+
+
+def volume(
+    session: sqlmodel.Session,
+    period: RollupPeriod = RollupPeriod.WEEK,
+    athlete_id: int | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    sport: str | None = None,
+    by_sport: bool = False,
+) -> pl.DataFrame:
+    """Get training volume and load per period, read from the rollups.
+
+    Args:
+        session: Open session
+        period: Day, week or month
+        athlete_id: Only this athlete (default: all)
+        start: First period start to include
+        end: Last period start to include
+        sport: Only this sport (default: all)
+        by_sport: One row per period and sport instead of per period
+
+    Returns:
+        DataFrame with period_start, (sport,) count, distance, moving_time, load and the zone seconds
+    """
+    group: list[Any] = [TrainingRollup.period_start] + ([TrainingRollup.sport] if by_sport else [])
+    sums = [sqlalchemy.func.sum(TrainingRollup.count).label("count")] + [sqlalchemy.func.sum(getattr(TrainingRollup, field)).label(field) for field in SUM_FIELDS]
+    statement = sqlmodel.select(*group, *sums).where(TrainingRollup.period == period, *_filters(athlete_id, start, end, sport)).group_by(*group).order_by(*group)
+    schema = volume_schema(by_sport)
+    rows = [row._asdict() for row in session.exec(statement)]
+    return pl.DataFrame(rows, schema=schema, orient="row").select(list(schema))
+
+
+def volume_schema(by_sport: bool = False) -> dict[str, pl.DataType]:
+    """Get the columns of a training volume frame, see volume."""
+    schema: dict[str, pl.DataType] = {"period_start": pl.Date()}
+    if by_sport:
+        schema["sport"] = pl.String()
+    schema |= {"count": pl.Int64(), "distance": pl.Float64(), "moving_time": pl.Int64(), "load": pl.Float64()}
+    return schema | {field: pl.Float64() for field in ZONE_FIELDS}
+
+
+def zone_distribution(session: sqlmodel.Session, period: RollupPeriod = RollupPeriod.WEEK, athlete_id: int | None = None, start: date | None = None, end: date | None = None) -> pl.DataFrame:
+    """Get the share of time per heartrate zone per period.
+
+    Returns:
+        DataFrame with period_start and zone1 to zone5 (fractions summing to 1, null without heartrate)
+    """
+    frame = volume(session, period, athlete_id, start, end)
+    total = pl.sum_horizontal(*ZONE_FIELDS)
+    return frame.select("period_start", *[(pl.col(field) / pl.when(total > 0).then(total)).alias(field.removesuffix("_s")) for field in ZONE_FIELDS])
+
+
+def fitness(session: sqlmodel.Session, athlete_id: int | None = None, start: date | None = None, end: date | None = None) -> pl.DataFrame:
+    """Get the daily fitness curves: CTL (fitness), ATL (fatigue), TSB (form) and the acute:chronic workload ratio.
+
+    The curves are computed over the whole history (days without activities count as rest),
+    then cut to [start, end].
+
+    Returns:
+        DataFrame with day, load, ctl, atl, tsb, acute, chronic and acwr
+    """
+    daily = volume(session, RollupPeriod.DAY, athlete_id)
+    schema = {"day": pl.Date} | {column: pl.Float64 for column in ("load", "ctl", "atl", "tsb", "acute", "chronic", "acwr")}
+    if daily.is_empty():
+        return pl.DataFrame(schema=schema)
+
+    first, last = daily["period_start"].min(), max(daily["period_start"].max(), end or date.min)  # type: ignore[type-var]
+    days = pl.DataFrame({"day": pl.date_range(first, last, interval="1d", eager=True)})  # type: ignore[arg-type]  # min and max of a Date column are dates
+    frame = days.join(daily.select(pl.col("period_start").alias("day"), "load"), on="day", how="left").with_columns(pl.col("load").fill_null(0.0))
+
+    ctl, atl, tsb = [], [], []
+    previous_ctl = previous_atl = 0.0
+    for load in frame["load"]:
+        tsb.append(previous_ctl - previous_atl)  # form going into the day
+        previous_ctl += (load - previous_ctl) / CTL_DAYS
+        previous_atl += (load - previous_atl) / ATL_DAYS
+        ctl.append(previous_ctl)
+        atl.append(previous_atl)
+
+    frame = frame.with_columns(
+        pl.Series("ctl", ctl),
+        pl.Series("atl", atl),
+        pl.Series("tsb", tsb),
+        pl.col("load").rolling_mean(ACUTE_WINDOW_DAYS, min_samples=1).alias("acute"),
+        pl.col("load").rolling_mean(CHRONIC_WINDOW_DAYS, min_samples=1).alias("chronic"),
+    ).with_columns((pl.col("acute") / pl.when(pl.col("chronic") > 0).then(pl.col("chronic"))).alias("acwr"))
+    if start is not None:
+        frame = frame.filter(pl.col("day") >= start)
+    if end is not None:
+        frame = frame.filter(pl.col("day") <= end)
+    return frame.select(list(schema))
+
+
+def clear(session: sqlmodel.Session) -> None:
+    """Remove all rollups, before rebuilding them."""
+    session.execute(sqlalchemy.delete(TrainingRollup))
+    session.execute(sqlalchemy.delete(ActivityLoad))
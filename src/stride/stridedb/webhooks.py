@@ -0,0 +1,287 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import requests
+import sqlalchemy
+import sqlmodel
+from loguru import logger
+
+from stride.enums import Provider
+from stride.provider.strava.main import StravaService
+from stride.provider.strava.models import StravaWebhookAspectType, StravaWebhookEvent, StravaWebhookObjectType
+from stride.provider.strava.streams import plan_streams
+from stride.stridedb.converters import StrideConverterService
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.sharding import ShardedStrideDBService
+from stride.stridedb.models import WebhookEvent, WebhookEventStatus
+
+# events that keep failing are parked as failed after this many attempts
+MAX_ATTEMPTS = 5
+
+# a failed event is retried after RETRY_BACKOFF * 2 ** (attempts - 1)
+RETRY_BACKOFF = timedelta(seconds=30)
+
+# events left in processing (e.g. the worker crashed) are picked up again after this long
+PROCESSING_TIMEOUT = timedelta(minutes=10)
+
+# Strava activity fields that can change in an update event -> Activity fields
+UPDATE_FIELDS = {"type": "sport"}
+
+
+class WebhookQueue:
+    """Durable queue of webhook events, backed by the WebhookEvent table."""
+
+    def __init__(self, engine: sqlalchemy.Engine):
+        self.engine = engine
+
+    def enqueue(self, event: StravaWebhookEvent) -> bool:
+        """Add an event to the queue.
+
+        Args:
+            event: Event as pushed by Strava
+
+        Returns:
+            True if the event was queued, False if it was already queued (a retried delivery)
+        """
+        row = WebhookEvent(
+            provider=Provider.STRAVA,
+            object_type=event.object_type,
+            object_id=event.object_id,
+            aspect_type=event.aspect_type,
+            owner_id=event.owner_id,
+            event_time=event.event_time,
+            updates=json.dumps(event.updates),
+        )
+        with sqlmodel.Session(self.engine) as session:
+            session.add(row)
+            try:
+                session.commit()
+            except sqlalchemy.exc.IntegrityError:
+                return False
+        return True
+
+    def claim(self, limit: int = 100) -> list[WebhookEvent]:
+        """Take pending events (oldest first) and mark them as processing.
+
+        Args:
+            limit: Maximum number of events to claim
+
+        Returns:
+            Claimed events
+        """
+        now = datetime.now(timezone.utc)
+        with sqlmodel.Session(self.engine, expire_on_commit=False) as session:
+            statement = (
+                sqlmodel.select(WebhookEvent)
+                .where(
+                    ((WebhookEvent.status == WebhookEventStatus.PENDING) & (WebhookEvent.next_attempt_at.is_(None) | (WebhookEvent.next_attempt_at <= now)))  # type: ignore[union-attr, operator]
+                    | ((WebhookEvent.status == WebhookEventStatus.PROCESSING) & (WebhookEvent.processed_at < now - PROCESSING_TIMEOUT))  # type: ignore[operator]
+                )
+                .order_by(WebhookEvent.id)  # type: ignore[arg-type]
+                .limit(limit)
+            )
+            events = list(session.exec(statement))
+            for event in events:
+                event.status = WebhookEventStatus.PROCESSING
+                event.attempts += 1
+                # processed_at marks the start of the attempt until the event is done
+                event.processed_at = datetime.now(timezone.utc)
+                session.add(event)
+            session.commit()
+            return events
+
+    def complete(self, events: list[WebhookEvent]) -> None:
+        """Mark events as done."""
+        self._set_status([event.id for event in events], WebhookEventStatus.DONE)  # type: ignore[misc]
+
+    def fail(self, events: list[WebhookEvent], error: str) -> None:
+        """Return events to the queue with exponential backoff, or park them as failed once they ran out of attempts."""
+        with sqlmodel.Session(self.engine) as session:
+            for event in events:
+                db_event = session.get(WebhookEvent, event.id)
+                if db_event is None:
+                    continue
+                db_event.status = WebhookEventStatus.FAILED if db_event.attempts >= MAX_ATTEMPTS else WebhookEventStatus.PENDING
+                db_event.next_attempt_at = datetime.now(timezone.utc) + RETRY_BACKOFF * 2 ** (db_event.attempts - 1)
+                db_event.error = error[:500]
+                session.add(db_event)
+            session.commit()
+
+    def _set_status(self, ids: list[int], status: WebhookEventStatus) -> None:
+        with sqlmodel.Session(self.engine) as session:
+            session.execute(
+                sqlalchemy.update(WebhookEvent).where(WebhookEvent.id.in_(ids)).values(status=status, processed_at=datetime.now(timezone.utc), error=None)  # type: ignore[union-attr]
+            )
+            session.commit()
+
+    def count(self, status: WebhookEventStatus = WebhookEventStatus.PENDING) -> int:
+        """Count the events with a status."""
+        with sqlmodel.Session(self.engine) as session:
+            return session.exec(sqlmodel.select(sqlalchemy.func.count()).select_from(WebhookEvent).where(WebhookEvent.status == status)).one()
+
+
+class WebhookWorker:
+    """Processes queued webhook events, fetching only the activities they are about.
+
+    Events of one activity that are claimed together are coalesced: a delete wins,
+    a create fetches the activity once (which includes any later update), and
+    updates only touch the changed summary fields without calling the Strava API.
+    """
+
+    def __init__(self, db_service: StrideDBService | ShardedStrideDBService, strava_service: StravaService | None = None, poll_interval: float = 5.0, batch_size: int = 100):
+        self.db_service = db_service
+        self.strava_service = strava_service or StravaService()
+        self.queue = WebhookQueue(db_service.engine)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def notify(self) -> None:
+        """Wake the worker up, called when an event was queued."""
+        self._wake.set()
+
+    def _fetch_and_save(self, strava_activity_id: int) -> None:
+        strava_activity = self.strava_service.get_activity(strava_activity_id)
+        strava_streams = self.strava_service.get_streams(strava_activity_id, plan_streams(strava_activity))
+        activity = StrideConverterService.process_strava_data(strava_activity, strava_streams)
+        self.db_service.save_activity(activity, update=True, verbose=False)
+
+    def process_activity_events(self, strava_activity_id: int, events: list[WebhookEvent]) -> None:
+        """Apply the (coalesced) events of one Strava activity.
+
+        Args:
+            strava_activity_id: ID of the activity at Strava
+            events: Events of the activity, oldest first
+        """
+        aspects = {event.aspect_type for event in events}
+        activity_id = self.db_service.resolve_activity_id(strava_activity_id, Provider.STRAVA)
+
+        if StravaWebhookAspectType.DELETE in aspects:
+            if activity_id is not None:
+                logger.info(f"Webhook: removing Strava activity {strava_activity_id} (activity {activity_id})")
+                self.db_service.remove_provider_activity(strava_activity_id, Provider.STRAVA)
+            return
+
+        if StravaWebhookAspectType.CREATE in aspects or activity_id is None:
+            logger.info(f"Webhook: fetching Strava activity {strava_activity_id}")
+            self._fetch_and_save(strava_activity_id)
+            return
+
+        fields: dict[str, Any] = {}
+        for event in events:
+            for name, value in json.loads(event.updates).items():
+                if name in UPDATE_FIELDS:
+                    fields[UPDATE_FIELDS[name]] = value
+        if fields:
+            logger.info(f"Webhook: updating {sorted(fields)} of activity {activity_id}")
+            self.db_service.update_provider_activity_summary(strava_activity_id, Provider.STRAVA, **fields)
+
+    def run_once(self) -> int:
+        """Process one batch of queued events.
+
+        Returns:
+            Number of events processed
+        """
+        events = self.queue.claim(self.batch_size)
+        by_activity: dict[int, list[WebhookEvent]] = {}
+        for event in events:
+            if event.object_type == StravaWebhookObjectType.ACTIVITY:
+                by_activity.setdefault(event.object_id, []).append(event)
+            else:
+                # athlete events (deauthorization) don't change stored activities
+                logger.info(f"Webhook: ignoring {event.object_type} {event.aspect_type} event for {event.object_id}")
+                self.queue.complete([event])
+
+        for strava_activity_id, activity_events in by_activity.items():
+            try:
+                self.process_activity_events(strava_activity_id, activity_events)
+            except Exception as e:
+                logger.warning(f"Webhook: failed to process events of Strava activity {strava_activity_id}: {str(e)[:100]}")
+                self.queue.fail(activity_events, str(e))
+            else:
+                self.queue.complete(activity_events)
+        return len(events)
+
+    def run(self) -> None:
+        """Process events until stopped, sleeping until notified (or the poll interval passed) when the queue is empty."""
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                logger.error(f"Webhook worker error: {e}")
+                processed = 0
+            if processed == 0:
+                self._wake.wait(self.poll_interval)
+
+    def start(self) -> None:
+        """Run the worker in a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="webhook-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        """Stop the background thread after the batch in progress."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def simulate_subscription_validation(url: str, verify_token: str, challenge: str = "stride-challenge") -> bool:
+    """Send the GET request Strava sends when a subscription is created.
+
+    Args:
+        url: Callback URL of the webhook receiver
+        verify_token: Token the subscription was created with
+        challenge: Challenge to be echoed back
+
+    Returns:
+        True if the receiver echoed the challenge
+    """
+    response = requests.get(url, params={"hub.mode": "subscribe", "hub.verify_token": verify_token, "hub.challenge": challenge}, timeout=10)
+    return response.ok and response.json().get("hub.challenge") == challenge
+
+
+def simulate_event(
+    url: str,
+    object_id: int,
+    aspect_type: StravaWebhookAspectType = StravaWebhookAspectType.CREATE,
+    object_type: StravaWebhookObjectType = StravaWebhookObjectType.ACTIVITY,
+    owner_id: int = 1,
+    updates: dict[str, Any] | None = None,
+    event_time: int | None = None,
+) -> requests.Response:
+    """Post an event to a webhook receiver the way Strava does, for local testing.
+
+    Args:
+        url: Callback URL of the webhook receiver
+        object_id: ID of the activity (or athlete)
+        aspect_type: create, update or delete
+        object_type: activity or athlete
+        owner_id: ID of the athlete
+        updates: Changed fields of an update event, e.g. {"type": "Ride"}
+        event_time: Unix time of the event (default: now)
+
+    Returns:
+        Response of the receiver
+    """
+    event = StravaWebhookEvent(
+        object_type=object_type,
+        object_id=object_id,
+        aspect_type=aspect_type,
+        owner_id=owner_id,
+        subscription_id=0,
+        event_time=event_time if event_time is not None else int(time.time()),
+        updates=updates or {},
+    )
+    start = time.perf_counter()
+    response = requests.post(url, json=event.model_dump(mode="json"), timeout=10)
+    logger.info(f"Posted {aspect_type} event for {object_type} {object_id}: {response.status_code} in {(time.perf_counter() - start) * 1000:.0f}ms")
+    return response
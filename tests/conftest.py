@@ -0,0 +1,26 @@
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:
+    from stride.stridedb.database import StrideDBService
+
+# the Strava config is read when the Strava provider is imported, tests never call the API
+for name in ("STRAVA_CLIENT_ID", "STRAVA_CLIENT_SECRET", "STRAVA_CODE", "STRAVA_ACCESS_TOKEN", "STRAVA_REFRESH_TOKEN"):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("STRAVA_ACCESS_TOKEN_EXPIRES_AT", "2030-01-01T00:00:00Z")
+
+
+@pytest.fixture
+def db_service(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> "StrideDBService":
+    """StrideDBService on an empty database in a temporary directory."""
+    import sqlmodel
+
+    from stride.stridedb import database
+
+    engine = sqlmodel.create_engine(f"sqlite:///{tmp_path / 'stridedb.db'}")
+    monkeypatch.setattr(database, "get_engine", lambda prod=False: engine)
+    sqlmodel.SQLModel.metadata.create_all(engine)
+    return database.StrideDBService()
@@ -0,0 +1,175 @@
+"""Generate the recording file fixtures of the tests.
+
+Run from the repository root: python tests/data/generate.py
+"""
+
+import math
+import struct
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+DATA_DIR = Path(__file__).parent
+FIT_EPOCH = datetime(1989, 12, 31, tzinfo=timezone.utc)
+
+# 5 minute run heading east from Amsterdam Centraal at 3.33 m/s, one sample per second
+START = datetime(2024, 5, 4, 7, 30, tzinfo=timezone.utc)
+N_SAMPLES = 300
+SPEED = 10 / 3
+LAT, LNG = 52.3791, 4.9003
+METERS_PER_DEGREE_LNG = 111_320 * math.cos(math.radians(LAT))
+
+_CRC_TABLE = [0x0000, 0xCC01, 0xD801, 0x1400, 0xF001, 0x3C00, 0x2800, 0xE401, 0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400]
+
+
+def fit_crc(data: bytes) -> int:
+    """CRC-16 of the FIT protocol."""
+    crc = 0
+    for byte in data:
+        for nibble in (byte & 0x0F, byte >> 4):
+            tmp = _CRC_TABLE[crc & 0x0F]
+            crc = ((crc >> 4) & 0x0FFF) ^ tmp ^ _CRC_TABLE[nibble]
+    return crc
+
+
+def run_samples() -> list[dict[str, float]]:
+    """Samples of the fixture run, shared by every recording format."""
+    samples = []
+    for second in range(N_SAMPLES):
+        distance = round(SPEED * second, 2)
+        samples.append(
+            {
+                "time": second,
+                "lat": LAT,
+                "lng": round(LNG + distance / METERS_PER_DEGREE_LNG, 7),
+                "altitude": round(2.0 + 0.01 * second, 1),
+                "heartrate": 120 + second // 10,
+                "cadence": 85,
+                "distance": distance,
+                "velocity_smooth": round(SPEED, 3),
+            }
+        )
+    return samples
+
+
+class FitWriter:
+    """Minimal FIT encoder for the messages read_fit_file decodes."""
+
+    def __init__(self) -> None:
+        self.records = bytearray()
+
+    def define(self, local_type: int, global_number: int, fields: list[tuple[int, int, int]], big_endian: bool = False) -> None:
+        """Write a definition message of (field number, size, base type) fields."""
+        self.records += struct.pack("<BBB", 0x40 | local_type, 0, int(big_endian))
+        self.records += struct.pack(">H" if big_endian else "<H", global_number)
+        self.records += struct.pack("<B", len(fields))
+        for field in fields:
+            self.records += struct.pack("<BBB", *field)
+
+    def data(self, local_type: int, layout: str, *values: int) -> None:
+        """Write a data message with a normal header."""
+        self.records += struct.pack("<B", local_type) + struct.pack(layout, *values)
+
+    def compressed(self, local_type: int, time_offset: int, layout: str, *values: int) -> None:
+        """Write a data message with a compressed timestamp header."""
+        self.records += struct.pack("<B", 0x80 | (local_type << 5) | (time_offset & 0x1F)) + struct.pack(layout, *values)
+
+    def to_bytes(self) -> bytes:
+        header = struct.pack("<BBHI4s", 14, 0x20, 2132, len(self.records), b".FIT")
+        header += struct.pack("<H", fit_crc(header))
+        body = header + bytes(self.records)
+        return body + struct.pack("<H", fit_crc(body))
+
+
+def fit_timestamp(moment: datetime) -> int:
+    return int((moment - FIT_EPOCH).total_seconds())
+
+
+def write_run_fit(path: Path) -> None:
+    """Outdoor run with GPS, enhanced speed and altitude and a session message."""
+    start = fit_timestamp(START)
+    writer = FitWriter()
+    writer.define(0, 0, [(0, 1, 0x00), (1, 2, 0x84), (4, 4, 0x86)])
+    writer.data(0, "<BHI", 4, 294, start)
+    writer.define(1, 20, [(253, 4, 0x86), (0, 4, 0x85), (1, 4, 0x85), (3, 1, 0x02), (4, 1, 0x02), (5, 4, 0x86), (73, 4, 0x86), (78, 4, 0x86), (6, 2, 0x84)])
+    for second, sample in enumerate(run_samples()):
+        # the heart rate strap drops out for a few seconds
+        heartrate = 0xFF if 100 <= second < 105 else sample["heartrate"]
+        writer.data(
+            1,
+            "<IiiBBIIIH",
+            start + second,
+            round(sample["lat"] / (180 / 2**31)),
+            round(sample["lng"] / (180 / 2**31)),
+            int(heartrate),
+            int(sample["cadence"]),
+            round(sample["distance"] * 100),
+            round(sample["velocity_smooth"] * 1000),
+            round((sample["altitude"] + 500) * 5),
+            0xFFFF,
+        )
+    writer.define(2, 18, [(253, 4, 0x86), (2, 4, 0x86), (5, 1, 0x00), (7, 4, 0x86), (8, 4, 0x86), (9, 4, 0x86)])
+    writer.data(2, "<IIBIII", start + N_SAMPLES, start, 1, N_SAMPLES * 1000, (N_SAMPLES - 10) * 1000, round(SPEED * (N_SAMPLES - 1) * 100))
+    path.write_bytes(writer.to_bytes())
+
+
+def write_indoor_fit(path: Path) -> None:
+    """Indoor ride without GPS or session, with compressed timestamps, big-endian records and power."""
+    start = fit_timestamp(START.replace(hour=18))
+    writer = FitWriter()
+    writer.define(0, 0, [(0, 1, 0x00), (4, 4, 0x86)])
+    writer.data(0, "<BI", 4, start)
+    writer.define(0, 20, [(253, 4, 0x86), (7, 2, 0x84), (3, 1, 0x02)], big_endian=True)
+    writer.data(0, ">IHB", start, 200, 110)
+    writer.define(1, 20, [(7, 2, 0x84), (3, 1, 0x02), (5, 4, 0x86)], big_endian=True)
+    for second in range(1, 60):
+        writer.compressed(1, start + second, ">HBI", 200 + second, 110 + second // 2, second * 800)
+    path.write_bytes(writer.to_bytes())
+
+
+def iso_time(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def write_run_gpx(path: Path, start: datetime, every: int = 10) -> None:
+    """The fixture run as a GPX track with Garmin TrackPointExtension heart rate and cadence, without distances."""
+    points = []
+    for sample in run_samples()[::every]:
+        points.append(
+            f'      <trkpt lat="{sample["lat"]}" lon="{sample["lng"]}"><ele>{sample["altitude"]}</ele><time>{iso_time(start + timedelta(seconds=sample["time"]))}</time>'
+            f'<extensions><gpxtpx:TrackPointExtension><gpxtpx:hr>{sample["heartrate"]:.0f}</gpxtpx:hr><gpxtpx:cad>{sample["cadence"]:.0f}</gpxtpx:cad></gpxtpx:TrackPointExtension></extensions></trkpt>'
+        )
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx creator="StravaGPX" version="1.1" xmlns="http://www.topografix.com/GPX/1/1" xmlns:gpxtpx="http://www.garmin.com/xmlschemas/TrackPointExtension/v1">\n'
+        f"  <metadata><time>{iso_time(start)}</time></metadata>\n"
+        "  <trk>\n    <name>Morning Run</name>\n    <type>running</type>\n    <trkseg>\n" + "\n".join(points) + "\n    </trkseg>\n  </trk>\n</gpx>\n"
+    )
+
+
+def write_run_tcx(path: Path, start: datetime, every: int = 10) -> None:
+    """The fixture run as a TCX activity with distances, heart rate and speed and cadence extensions."""
+    points = []
+    for sample in run_samples()[::every]:
+        points.append(
+            f"          <Trackpoint><Time>{iso_time(start + timedelta(seconds=sample['time']))}</Time>"
+            f"<Position><LatitudeDegrees>{sample['lat']}</LatitudeDegrees><LongitudeDegrees>{sample['lng']}</LongitudeDegrees></Position>"
+            f"<AltitudeMeters>{sample['altitude']}</AltitudeMeters><DistanceMeters>{sample['distance']}</DistanceMeters>"
+            f"<HeartRateBpm><Value>{sample['heartrate']:.0f}</Value></HeartRateBpm>"
+            f"<Extensions><ns3:TPX><ns3:Speed>{sample['velocity_smooth']}</ns3:Speed><ns3:RunCadence>{sample['cadence']:.0f}</ns3:RunCadence></ns3:TPX></Extensions></Trackpoint>"
+        )
+    path.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2" xmlns:ns3="http://www.garmin.com/xmlschemas/ActivityExtension/v2">\n'
+        '  <Activities>\n    <Activity Sport="Running">\n'
+        f"      <Id>{iso_time(start)}</Id>\n"
+        f'      <Lap StartTime="{iso_time(start)}">\n        <Track>\n' + "\n".join(points) + "\n        </Track>\n      </Lap>\n"
+        "    </Activity>\n  </Activities>\n</TrainingCenterDatabase>\n"
+    )
+
+
+if __name__ == "__main__":
+    write_run_fit(DATA_DIR / "run.fit")
+    write_indoor_fit(DATA_DIR / "indoor_ride.fit")
+    # the same run on the next two days, so imports of all fixtures store separate activities
+    write_run_gpx(DATA_DIR / "run.gpx", START + timedelta(days=1))
+    write_run_tcx(DATA_DIR / "run.tcx", START + timedelta(days=2))
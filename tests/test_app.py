@@ -0,0 +1,44 @@
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+import sqlalchemy
+import sqlmodel
+from fastapi.testclient import TestClient
+
+CHALLENGE = {"hub.mode": "subscribe", "hub.challenge": "15f7d1a91c1f40f8a748fd134752feb3"}
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[TestClient]:
+    """Client of the API on a database in a temporary directory without any tables."""
+    from stride.stridedb import app, database
+    from stride.stridedb.webhooks import WebhookQueue
+
+    engine = sqlmodel.create_engine(f"sqlite:///{tmp_path / 'stridedb.db'}")
+    monkeypatch.setattr(database, "get_engine", lambda prod=False: engine)
+    monkeypatch.setattr(app, "db_service", database.StrideDBService())
+    monkeypatch.setattr(app, "webhook_queue", WebhookQueue(engine))
+    with TestClient(app.app) as client:
+        yield client
+
+
+def test_startup_creates_schema(client: TestClient) -> None:
+    from stride.stridedb import app
+
+    tables = sqlalchemy.inspect(app.db_service.engine).get_table_names()
+    assert {"activity", "stream", "webhookevent"} <= set(tables)
+
+
+def test_subscription_validation_refused_without_token(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("STRAVA_WEBHOOK_VERIFY_TOKEN", raising=False)
+    response = client.get("/webhooks/strava", params=CHALLENGE | {"hub.verify_token": "stride"})
+    assert response.status_code == 503
+
+
+def test_subscription_validation(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("STRAVA_WEBHOOK_VERIFY_TOKEN", "a7c3f0e2")
+    assert client.get("/webhooks/strava", params=CHALLENGE | {"hub.verify_token": "stride"}).status_code == 403
+    response = client.get("/webhooks/strava", params=CHALLENGE | {"hub.verify_token": "a7c3f0e2"})
+    assert response.status_code == 200
+    assert response.json() == {"hub.challenge": CHALLENGE["hub.challenge"]}
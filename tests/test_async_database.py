@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import sqlalchemy
+
+from stride.enums import Provider, StreamType
+from stride.stridedb.async_database import AsyncStrideDBService
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.models import Activity, Stream
+from stride.stridedb.streamstore import StreamStore
+
+START = datetime(2024, 5, 4, 7, 30, tzinfo=timezone.utc)
+
+
+def make_run(provider: Provider, provider_activity_id: int, day: int, start_offset_s: int = 0) -> Activity:
+    """Build a 10 km run on a day after START, with a heart rate stream unique to the run."""
+    return Activity(  # type: ignore[call-arg]  # id is generated when it is saved
+        provider=provider,
+        provider_activity_id=provider_activity_id,
+        distance=10_000.0,
+        moving_time=3000,
+        duration=3100,
+        start_date=START + timedelta(days=day, seconds=start_offset_s),
+        streams=[
+            Stream.from_coordinates([(52.3791, 4.9003 + i * 0.0005) for i in range(300)]),
+            Stream.from_values(StreamType.HEARTRATE, [100 + (day + i) % 80 for i in range(300)]),
+        ],
+    )
+
+
+def snapshot(activity: Activity) -> tuple[object, ...]:
+    """Stored fields and streams of an activity, comparable between the services."""
+    streams = sorted((stream.stream_type, stream.values) for stream in activity.streams)
+    return activity.id, activity.provider_activity_id, activity.start_date.replace(tzinfo=None), activity.distance, streams
+
+
+def async_service(db_service: StrideDBService, **kwargs: object) -> AsyncStrideDBService:
+    return AsyncStrideDBService(url=str(db_service.engine.url), **kwargs)  # type: ignore[arg-type]
+
+
+def test_connections_use_wal(db_service: StrideDBService) -> None:
+    async def journal_mode() -> str:
+        service = async_service(db_service)
+        async with service.engine.connect() as connection:
+            mode = (await connection.execute(sqlalchemy.text("PRAGMA journal_mode"))).scalar_one()
+        await service.dispose()
+        return str(mode)
+
+    assert asyncio.run(journal_mode()) == "wal"
+
+
+def test_concurrent_reads_while_saving(db_service: StrideDBService) -> None:
+    stored = db_service.save_activities([make_run(Provider.STRAVA, day, day) for day in range(10)], verbose=False)
+    new = [make_run(Provider.STRAVA, day, day) for day in range(10, 30)]
+
+    async def run() -> tuple[list[Activity], list[Activity]]:
+        service = async_service(db_service)
+
+        async def save_all() -> list[Activity]:
+            return [await service.save_activity(activity, verbose=False) for activity in new]
+
+        reads = [service.get_activity(activity.id) for _ in range(20) for activity in stored]
+        saved, *read = await asyncio.gather(save_all(), *reads)
+        await service.dispose()
+        return saved, read
+
+    saved, read = asyncio.run(run())
+    expected = {activity.id: snapshot(db_service.get_activity(activity.id)) for activity in stored}
+    assert len(read) == 200
+    assert all(snapshot(activity) == expected[activity.id] for activity in read)
+    # the sync service reads back what the async service wrote
+    assert [snapshot(db_service.get_activity(activity.id)) for activity in saved] == [snapshot(activity) for activity in saved]
+    assert len(db_service.get_activities(limit=100)) == 30
+
+
+def test_linked_duplicate_is_not_stored_again(db_service: StrideDBService, tmp_path: Path) -> None:
+    store = StreamStore(tmp_path / "streams")
+
+    async def save(activity: Activity) -> Activity:
+        service = async_service(db_service, stream_store=store)
+        saved = await service.save_activity(activity, verbose=False)
+        await service.dispose()
+        return saved
+
+    strava = asyncio.run(save(make_run(Provider.STRAVA, 1, 0)))
+    size = store.size_bytes()
+    coros = asyncio.run(save(make_run(Provider.COROS, 2, 0, start_offset_s=20)))
+    assert coros.id == strava.id
+    assert store.activity_ids(StreamType.HEARTRATE) == [strava.id]
+    assert store.size_bytes() == size
@@ -0,0 +1,41 @@
+"""The stride bench suites as tests.
+
+Every suite runs on a few short activities and each benchmark must have a baseline in
+benchmarks/baseline.json. The timings are not compared to the baseline here: it is
+measured with the default stride bench sizes, run stride bench to check for regressions.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from stride.bench import SUITES, BenchContext, BenchmarkResult, compare_to_baseline, load_baseline, save_baseline
+
+BASELINE_PATH = Path(__file__).parents[1] / "benchmarks" / "baseline.json"
+
+
+@pytest.fixture(scope="module")
+def context() -> BenchContext:
+    return BenchContext(n_activities=3, duration_s=600, rounds=2)
+
+
+@pytest.mark.parametrize("suite", list(SUITES))
+def test_suite(context: BenchContext, suite: str) -> None:
+    results = SUITES[suite](context)
+    baseline = load_baseline(BASELINE_PATH)
+    assert results
+    for result in results:
+        assert result.name.startswith(f"{suite}.")
+        assert result.rounds == 2 and 0 < result.min_s <= result.median_s <= result.max_s
+        assert result.name in baseline, f"{result.name} has no baseline, run stride bench --save-baseline"
+
+
+def test_compare_to_baseline(tmp_path: Path) -> None:
+    def result(name: str, median_s: float) -> BenchmarkResult:
+        return BenchmarkResult(name=name, rounds=1, min_s=median_s, max_s=median_s, mean_s=median_s, median_s=median_s, stddev_s=0.0)
+
+    path = tmp_path / "baseline.json"
+    save_baseline([result("load.activity", 0.1), result("query.area", 0.2)], path)
+    save_baseline([result("query.area", 0.4)], path)
+    comparisons = compare_to_baseline([result("load.activity", 0.15), result("query.area", 0.4), result("query.near", 0.1)], load_baseline(path))
+    assert {comparison.name: round(comparison.change, 2) for comparison in comparisons} == {"load.activity": 0.5, "query.area": 0.0}
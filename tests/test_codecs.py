@@ -0,0 +1,45 @@
+import math
+from array import array
+
+import pytest
+
+from stride.enums import StreamType
+from stride.stridedb.codecs import HEADER, StreamCodec, decode_stream, encode_stream, encode_stream_column
+
+STREAMS = [
+    [0.0, 2.5, 5.1, 7.6],
+    [],
+    [1.0],
+    [52.3791234, 4.9003, 52.3791301, 4.9003512],
+    [0.123456789, 1.5],  # more decimals than any spec allows
+    [math.nan, 1.0],
+    [math.inf],
+    [3e300, 1.0],
+    [-0.0, 0.0, -12.25],
+]
+
+
+@pytest.mark.parametrize("values", STREAMS)
+@pytest.mark.parametrize("stream_type", [StreamType.DISTANCE, StreamType.HEARTRATE, StreamType.LATLNG])
+def test_round_trip(stream_type: StreamType, values: list[float]) -> None:
+    decoded = decode_stream(encode_stream(stream_type, values))
+
+    assert len(decoded) == len(values)
+    assert all(a == b or (math.isnan(a) and math.isnan(b)) for a, b in zip(decoded, values))
+
+
+def test_fixed_point() -> None:
+    codec, decimals, stride, count = HEADER.unpack_from(encode_stream(StreamType.LATLNG, STREAMS[3]))
+
+    assert (codec, decimals, stride, count) == (StreamCodec.DELTA_VARINT, 7, 2, 4)
+    assert HEADER.unpack_from(encode_stream(StreamType.LATLNG, STREAMS[4]))[0] == StreamCodec.RAW
+
+
+@pytest.mark.parametrize("stream_type", [StreamType.DISTANCE, StreamType.HEARTRATE, StreamType.LATLNG, StreamType.VELOCITY_SMOOTH])
+def test_encode_stream_column(stream_type: StreamType) -> None:
+    values = array("d", [value for stream in STREAMS for value in stream])
+    offsets = [0]
+    for stream in STREAMS:
+        offsets.append(offsets[-1] + len(stream))
+
+    assert encode_stream_column(stream_type, values, offsets) == [encode_stream(stream_type, stream) for stream in STREAMS]
@@ -0,0 +1,78 @@
+import shutil
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from stride.enums import Provider, StreamType
+from stride.provider.coros import CorosService
+from stride.provider.files.fit import read_fit_file
+from stride.stridedb.converters import ConverterFactory, CorosConverter, StrideConverterService
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.models import Activity, Stream
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def export_dir(tmp_path: Path) -> Path:
+    """Coros export with the fixtures in nested directories, next to a file that is not a recording."""
+    (tmp_path / "2024" / "05").mkdir(parents=True)
+    shutil.copy(DATA_DIR / "run.fit", tmp_path / "2024" / "05" / "run.FIT")
+    shutil.copy(DATA_DIR / "indoor_ride.fit", tmp_path / "indoor_ride.fit")
+    (tmp_path / "notes.txt").write_text("not a recording")
+    return tmp_path
+
+
+def test_list_activity_files(export_dir: Path) -> None:
+    assert CorosService(export_dir).list_activity_files() == [export_dir / "2024" / "05" / "run.FIT", export_dir / "indoor_ride.fit"]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_get_activities(export_dir: Path, max_workers: int) -> None:
+    service = CorosService(export_dir)
+    paths = service.list_activity_files() * 3
+
+    activities = service.get_activities(paths, max_workers=max_workers)
+
+    assert [activity.sport for activity in activities] == ["Run", None] * 3
+    assert all(activity.provider == Provider.COROS for activity in activities)
+    assert activities[0].streams == read_fit_file(paths[0]).streams
+
+
+def test_converter() -> None:
+    activity_file = read_fit_file(DATA_DIR / "run.fit")
+
+    activity = StrideConverterService.process_coros_data(activity_file)
+
+    assert isinstance(ConverterFactory.get_converter(Provider.COROS), CorosConverter)
+    assert activity.provider == Provider.COROS
+    assert activity.provider_activity_id == activity_file.provider_activity_id
+    assert (activity.distance, activity.moving_time, activity.duration, activity.sport) == (996.67, 290, 300, "Run")
+    streams = {stream.stream_type: stream for stream in activity.streams or []}
+    assert set(streams) == set(activity_file.streams)
+    assert streams[StreamType.HEARTRATE].values == list(activity_file.streams[StreamType.HEARTRATE])
+    assert streams[StreamType.LATLNG].coordinates[:2] == [(52.3791, 4.9003), (52.3791, 4.900349)]
+
+
+def test_strava_and_coros_copies_are_linked(db_service: StrideDBService) -> None:
+    activity_file = read_fit_file(DATA_DIR / "run.fit")
+    assert activity_file.start_date is not None
+    coordinates = list(zip(activity_file.streams[StreamType.LATLNG][0::2], activity_file.streams[StreamType.LATLNG][1::2]))
+    strava = db_service.save_activity(
+        Activity(  # type: ignore[call-arg]  # id is generated when it is saved
+            provider=Provider.STRAVA,
+            provider_activity_id=11_876_543_210,
+            distance=997.1,
+            moving_time=291,
+            duration=301,
+            start_date=activity_file.start_date + timedelta(seconds=2),
+            streams=[Stream.from_coordinates(coordinates[::5])],
+        )
+    )
+
+    coros = db_service.save_activity(StrideConverterService.process_coros_data(activity_file))
+
+    assert coros.id == strava.id
+    assert db_service.resolve_activity_id(activity_file.provider_activity_id, Provider.COROS) == strava.id
+    assert [activity.id for activity in db_service.get_activities()] == [strava.id]
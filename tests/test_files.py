@@ -0,0 +1,74 @@
+import gzip
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from stride.enums import Provider, StreamType
+from stride.provider.files import is_activity_file, read_activity_file, read_gpx_file, read_tcx_file
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def test_read_gpx() -> None:
+    activity = read_gpx_file(DATA_DIR / "run.gpx", provider_activity_id=7)
+
+    assert (activity.provider, activity.provider_activity_id, activity.sport) == (Provider.STRAVA, 7, "running")
+    assert activity.start_date == datetime(2024, 5, 5, 7, 30, tzinfo=timezone.utc)
+    assert (activity.moving_time, activity.elapsed_time) == (290, 290)
+    assert set(activity.streams) == {StreamType.TIME, StreamType.LATLNG, StreamType.ALTITUDE, StreamType.HEARTRATE, StreamType.CADENCE, StreamType.DISTANCE}
+    assert list(activity.streams[StreamType.TIME][:3]) == [0.0, 10.0, 20.0]
+    assert list(activity.streams[StreamType.HEARTRATE][:3]) == [120.0, 121.0, 122.0]
+    # GPX has no distances, they are derived from the track
+    assert activity.distance == activity.streams[StreamType.DISTANCE][-1]
+    assert activity.distance == pytest.approx(966.67, rel=0.01)
+
+
+def test_read_tcx() -> None:
+    activity = read_tcx_file(DATA_DIR / "run.tcx")
+
+    assert activity.provider_activity_id == int(datetime(2024, 5, 6, 7, 30, tzinfo=timezone.utc).timestamp())
+    assert activity.sport == "Run"
+    assert activity.distance == 966.67
+    assert set(activity.streams) == {
+        StreamType.TIME,
+        StreamType.LATLNG,
+        StreamType.ALTITUDE,
+        StreamType.HEARTRATE,
+        StreamType.CADENCE,
+        StreamType.DISTANCE,
+        StreamType.VELOCITY_SMOOTH,
+    }
+    assert list(activity.streams[StreamType.LATLNG][:2]) == [52.3791, 4.9003]
+    assert set(activity.streams[StreamType.CADENCE]) == {85.0}
+
+
+def test_missing_trackpoint_values_are_forward_filled(tmp_path: Path) -> None:
+    gpx = (DATA_DIR / "run.gpx").read_text().replace("<ele>2.1</ele>", "", 1)
+    (tmp_path / "gaps.gpx").write_text(gpx)
+
+    altitude = read_gpx_file(tmp_path / "gaps.gpx").streams[StreamType.ALTITUDE]
+
+    assert list(altitude[:3]) == [2.0, 2.0, 2.2]
+
+
+@pytest.mark.parametrize("filename", ["run.fit", "run.gpx", "run.tcx"])
+def test_read_activity_file(filename: str) -> None:
+    data = (DATA_DIR / filename).read_bytes()
+
+    # exports sometimes have whitespace before the XML declaration
+    padded = data if filename.endswith(".fit") else b"\n " + data
+
+    plain = read_activity_file(data, filename, Provider.STRAVA, provider_activity_id=42)
+    gzipped = read_activity_file(gzip.compress(padded), filename.upper() + ".gz", Provider.STRAVA, provider_activity_id=42)
+
+    assert plain.provider_activity_id == gzipped.provider_activity_id == 42
+    assert plain.streams == gzipped.streams
+    assert StreamType.LATLNG in plain.streams
+
+
+def test_unsupported_file() -> None:
+    assert not is_activity_file("activities.csv")
+    assert is_activity_file("activities/123.TCX.gz")
+    with pytest.raises(ValueError, match="Unsupported"):
+        read_activity_file(b"", "activities.csv", Provider.STRAVA)
@@ -0,0 +1,86 @@
+import io
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from stride.enums import Provider, StreamType
+from stride.provider.files.fit import RECORD, SESSION, FitDecodeError, iter_fit_messages, read_fit_file
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def test_read_run() -> None:
+    activity = read_fit_file(DATA_DIR / "run.fit")
+
+    assert activity.provider == Provider.COROS
+    assert activity.sport == "Run"
+    assert activity.start_date == datetime(2024, 5, 4, 7, 30, tzinfo=timezone.utc)
+    assert activity.provider_activity_id == int(activity.start_date.timestamp())
+    assert (activity.distance, activity.moving_time, activity.elapsed_time) == (996.67, 290, 300)
+    assert activity.sample_count == 300
+    assert set(activity.streams) == {
+        StreamType.TIME,
+        StreamType.LATLNG,
+        StreamType.ALTITUDE,
+        StreamType.HEARTRATE,
+        StreamType.CADENCE,
+        StreamType.DISTANCE,
+        StreamType.VELOCITY_SMOOTH,
+    }
+    assert list(activity.streams[StreamType.TIME][:3]) == [0.0, 1.0, 2.0]
+    assert list(activity.streams[StreamType.LATLNG][:2]) == [52.3791, 4.9003]
+    assert len(activity.streams[StreamType.LATLNG]) == 2 * activity.sample_count
+    assert activity.streams[StreamType.DISTANCE][-1] == 996.67
+
+
+def test_enhanced_fields_replace_their_16_bit_counterpart() -> None:
+    activity = read_fit_file(DATA_DIR / "run.fit")
+
+    # the 16 bit speed field is invalid in every record, enhanced_speed holds the values
+    assert set(activity.streams[StreamType.VELOCITY_SMOOTH]) == {3.333}
+    assert activity.streams[StreamType.ALTITUDE][0] == 2.0
+
+
+def test_invalid_samples_are_forward_filled() -> None:
+    heartrate = read_fit_file(DATA_DIR / "run.fit").streams[StreamType.HEARTRATE]
+
+    assert list(heartrate[99:106]) == [129.0] * 6 + [130.0]
+
+
+def test_read_file_object_without_session() -> None:
+    activity = read_fit_file(io.BytesIO((DATA_DIR / "indoor_ride.fit").read_bytes()), provider=Provider.STRAVA)
+
+    assert activity.provider == Provider.STRAVA
+    assert activity.sport is None
+    assert activity.start_date == datetime(2024, 5, 4, 18, 30, tzinfo=timezone.utc)
+    # summaries come from the records: compressed timestamps advance the time stream
+    assert (activity.distance, activity.moving_time, activity.elapsed_time) == (472.0, 59, 59)
+    assert set(activity.streams) == {StreamType.TIME, StreamType.HEARTRATE, StreamType.DISTANCE, StreamType.WATTS}
+    assert list(activity.streams[StreamType.TIME]) == [float(second) for second in range(60)]
+    assert list(activity.streams[StreamType.WATTS][:3]) == [200.0, 201.0, 202.0]
+    # the first record has no distance, it takes the first recorded value
+    assert list(activity.streams[StreamType.DISTANCE][:3]) == [8.0, 8.0, 16.0]
+
+
+def test_iter_messages() -> None:
+    with open(DATA_DIR / "run.fit", "rb") as stream:
+        messages = list(iter_fit_messages(stream))
+
+    records = [fields for number, fields in messages if number == RECORD]
+    assert len(records) == 300
+    assert records[100][3] is None
+    assert records[0][253] == records[1][253] - 1
+    assert [fields[5] for number, fields in messages if number == SESSION] == [1]
+
+
+def test_truncated_file() -> None:
+    data = (DATA_DIR / "run.fit").read_bytes()
+
+    with pytest.raises(FitDecodeError, match="Unexpected end"):
+        read_fit_file(io.BytesIO(data[: len(data) // 2]))
+
+
+def test_not_a_fit_file() -> None:
+    with pytest.raises(FitDecodeError, match="Not a FIT file"):
+        read_fit_file(io.BytesIO(b"\x0e" + bytes(20)))
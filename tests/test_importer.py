@@ -0,0 +1,72 @@
+import gzip
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from stride.enums import Provider
+from stride.provider.strava.archive import StravaArchive
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.importer import ArchiveImporter
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def archive_path(tmp_path: Path) -> Path:
+    """Strava bulk export with a recording in every format, a manual activity and a broken file."""
+    path = tmp_path / "export.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(
+            "export_123/activities.csv",
+            "Activity ID,Activity Date,Activity Name,Activity Type,Distance,Filename,Distance\n"
+            "1,,Morning Run,Run,1.0,activities/1.fit.gz,996.7\n"
+            "2,,Evening Ride,Ride,0.5,activities/2.fit,472.0\n"
+            "3,,Morning Run,Run,1.0,activities/3.gpx,966.7\n"
+            "4,,Morning Run,Run,1.0,activities/4.tcx.gz,966.7\n"
+            "5,,Gym,WeightTraining,0,,0\n"
+            "6,,Broken,Run,1.0,activities/6.fit,0\n"
+            "7,,Lost,Run,1.0,activities/7.fit,0\n",
+        )
+        archive.writestr("export_123/activities/1.fit.gz", gzip.compress((DATA_DIR / "run.fit").read_bytes()))
+        archive.writestr("export_123/activities/2.fit", (DATA_DIR / "indoor_ride.fit").read_bytes())
+        archive.writestr("export_123/activities/3.gpx", (DATA_DIR / "run.gpx").read_bytes())
+        archive.writestr("export_123/activities/4.tcx.gz", gzip.compress((DATA_DIR / "run.tcx").read_bytes()))
+        archive.writestr("export_123/activities/6.fit", (DATA_DIR / "run.fit").read_bytes()[:100])
+    return path
+
+
+def test_archive_entries(archive_path: Path) -> None:
+    with StravaArchive(archive_path) as archive:
+        entries = archive.entries()
+
+    assert [entry.activity_id for entry in entries] == [1, 2, 3, 4, 5, 6, 7]
+    assert [entry.filename for entry in entries] == [
+        "export_123/activities/1.fit.gz",
+        "export_123/activities/2.fit",
+        "export_123/activities/3.gpx",
+        "export_123/activities/4.tcx.gz",
+        None,
+        "export_123/activities/6.fit",
+        None,
+    ]
+    assert entries[2].activity_type == "Run"
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_import_strava_archive(db_service: StrideDBService, archive_path: Path, max_workers: int) -> None:
+    importer = ArchiveImporter(db_service, max_workers=max_workers, batch_size=2)
+
+    summary = importer.import_strava_archive(archive_path)
+
+    assert (summary.files_total, summary.files_imported, summary.files_failed, summary.files_skipped) == (5, 4, 1, 0)
+    assert summary.samples == 300 + 60 + 30 + 30
+    activities = {activity.provider_activity_id: activity for activity in db_service.get_activities()}
+    assert set(activities) == {1, 2, 3, 4}
+    assert all(activity.provider == Provider.STRAVA for activity in activities.values())
+    assert [activities[activity_id].sport for activity_id in (1, 2, 3, 4)] == ["Run", "Ride", "Run", "Run"]
+
+    rerun = importer.import_strava_archive(archive_path)
+
+    assert (rerun.files_imported, rerun.files_failed, rerun.files_skipped) == (0, 1, 4)
+    assert len(db_service.get_activities()) == 4
@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+
+import sqlalchemy
+
+from stride.enums import Provider, StreamMask, StreamType
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.migrations import add_activity_stream_mask
+from stride.stridedb.models import Activity, Stream
+
+START = datetime(2024, 5, 4, 7, 30, tzinfo=timezone.utc)
+
+
+def test_stream_mask_is_backfilled_with_the_column(db_service: StrideDBService) -> None:
+    with_streams = Activity(  # type: ignore[call-arg]  # id is generated when it is saved
+        provider=Provider.STRAVA,
+        provider_activity_id=1,
+        distance=10_000.0,
+        start_date=START,
+        streams=[Stream.from_coordinates([(52.3791, 4.9003), (52.3791, 4.9008)]), Stream.from_values(StreamType.HEARTRATE, [140, 141])],
+    )
+    without_streams = Activity(provider=Provider.STRAVA, provider_activity_id=2, distance=0.0, start_date=START.replace(day=5))  # type: ignore[call-arg]
+    saved = db_service.save_activities([with_streams, without_streams], verbose=False, deduplicate=False)
+
+    # a database from before the mask existed
+    with db_service.engine.begin() as connection:
+        connection.execute(sqlalchemy.text("ALTER TABLE activity DROP COLUMN stream_mask"))
+    with db_service.engine.begin() as connection:
+        add_activity_stream_mask(connection)
+        masks = dict(connection.execute(sqlalchemy.text("SELECT id, stream_mask FROM activity")).all())
+
+    assert masks == {saved[0].id: StreamMask.LATLNG | StreamMask.HEARTRATE, saved[1].id: 0}
+    assert db_service.get_activity(saved[0].id).has_heartrate_stream
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+from stride.enums import Provider
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.models import Activity, Stream
+
+START = datetime(2024, 5, 4, 7, 30, tzinfo=timezone.utc)
+
+
+def make_run(provider: Provider, provider_activity_id: int, start_offset_s: int = 0, distance: float = 10_000.0, lng_offset: float = 0.0, athlete_id: int | None = None) -> Activity:
+    """Build a 10 km run heading east from Amsterdam Centraal, as recorded by a provider."""
+    coordinates = [(52.3791, 4.9003 + lng_offset + i * 0.0005) for i in range(300)]
+    return Activity(  # type: ignore[call-arg]  # id is generated when it is saved
+        provider=provider,
+        provider_activity_id=provider_activity_id,
+        athlete_id=athlete_id,
+        distance=distance,
+        moving_time=3000,
+        duration=3100,
+        start_date=START + timedelta(seconds=start_offset_s),
+        streams=[Stream.from_coordinates(coordinates)],
+    )
+
+
+def test_strava_and_coros_copies_are_one_activity(db_service: StrideDBService) -> None:
+    strava = db_service.save_activity(make_run(Provider.STRAVA, 1))
+    coros = make_run(Provider.COROS, 2, start_offset_s=20, distance=10_080.0)
+
+    assert db_service.find_duplicate_activities(coros) == [strava.id]
+    db_service.save_activity(coros)
+    assert [activity.id for activity in db_service.get_activities()] == [strava.id]
+
+
+def test_other_runs_are_not_duplicates(db_service: StrideDBService) -> None:
+    db_service.save_activity(make_run(Provider.STRAVA, 1))
+
+    assert db_service.find_duplicate_activities(make_run(Provider.COROS, 2, start_offset_s=3600)) == []
+    assert db_service.find_duplicate_activities(make_run(Provider.COROS, 3, distance=12_000.0)) == []
+    assert db_service.find_duplicate_activities(make_run(Provider.COROS, 4, lng_offset=1.0)) == []
+
+
+def test_runs_of_other_athletes_are_not_duplicates(db_service: StrideDBService) -> None:
+    strava = db_service.save_activity(make_run(Provider.STRAVA, 1, athlete_id=7))
+
+    assert db_service.find_duplicate_activities(make_run(Provider.STRAVA, 2, start_offset_s=20, athlete_id=8)) == []
+    assert db_service.find_duplicate_activities(make_run(Provider.COROS, 3, start_offset_s=20, athlete_id=7)) == [strava.id]
+    # file imports and Coros recordings have no athlete, they may be a copy of anyone's activity
+    assert db_service.find_duplicate_activities(make_run(Provider.COROS, 4, start_offset_s=20)) == [strava.id]
+
+
+def test_similar_routes(db_service: StrideDBService) -> None:
+    monday = db_service.save_activity(make_run(Provider.STRAVA, 1))
+    tuesday = db_service.save_activity(make_run(Provider.STRAVA, 2, start_offset_s=86_400))
+    db_service.save_activity(make_run(Provider.STRAVA, 3, start_offset_s=2 * 86_400, lng_offset=1.0))
+
+    assert [activity_id for activity_id, _ in db_service.find_similar_routes(monday.id)] == [tuesday.id]
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+from stride.enums import Provider, StreamType
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.models import Activity, Stream
+from stride.stridedb.streamstore import StreamStore
+
+START = datetime(2024, 5, 4, 7, 30, tzinfo=timezone.utc)
+
+
+def make_run(provider: Provider, provider_activity_id: int, heartrate: int = 140, start_offset_s: int = 0) -> Activity:
+    """Build a 10 km run heading east from Amsterdam Centraal with a constant heart rate."""
+    return Activity(  # type: ignore[call-arg]  # id is generated when it is saved
+        provider=provider,
+        provider_activity_id=provider_activity_id,
+        distance=10_000.0,
+        moving_time=3000,
+        duration=3100,
+        start_date=START + timedelta(seconds=start_offset_s),
+        streams=[Stream.from_coordinates([(52.3791, 4.9003 + i * 0.0005) for i in range(300)]), Stream.from_values(StreamType.HEARTRATE, [heartrate] * 300)],
+    )
+
+
+@pytest.fixture
+def store_db_service(db_service: StrideDBService, tmp_path: Path) -> StrideDBService:
+    db_service.stream_store = StreamStore(tmp_path / "streams")
+    return db_service
+
+
+def test_saved_streams_are_stored(store_db_service: StrideDBService) -> None:
+    saved = store_db_service.save_activities([make_run(Provider.STRAVA, 1), make_run(Provider.STRAVA, 2, start_offset_s=86_400)])
+    assert store_db_service.stream_store is not None
+    assert store_db_service.stream_store.activity_ids(StreamType.HEARTRATE) == [activity.id for activity in saved]
+    assert list(store_db_service.stream_store.view(saved[0].id, StreamType.HEARTRATE)) == [140.0] * 300
+
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_linked_duplicate_is_not_stored_again(store_db_service: StrideDBService, batch: bool) -> None:
+    store = store_db_service.stream_store
+    assert store is not None
+    strava = store_db_service.save_activity(make_run(Provider.STRAVA, 1))
+    size = store.size_bytes()
+
+    coros = make_run(Provider.COROS, 2, start_offset_s=20)
+    linked = store_db_service.save_activities([coros])[0] if batch else store_db_service.save_activity(coros)
+    assert linked.id == strava.id
+    assert store.size_bytes() == size
+
+
+def test_update_replaces_stored_streams(store_db_service: StrideDBService) -> None:
+    saved = store_db_service.save_activity(make_run(Provider.STRAVA, 1))
+    store_db_service.save_activity(make_run(Provider.STRAVA, 1, heartrate=150), update=True)
+    assert store_db_service.stream_store is not None
+    assert list(store_db_service.stream_store.view(saved.id, StreamType.HEARTRATE)) == [150.0] * 300
@@ -0,0 +1,110 @@
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+import sqlmodel
+
+from stride.provider.strava.models import StravaActivityResponseModel, StravaJSONStreamResponseModel, StravaStreamType
+from stride.stridedb.database import StrideDBService
+from stride.stridedb.models import SyncJob, SyncJobStatus
+from stride.stridedb.sync import RATE_LIMIT_BACKOFF, StravaSync
+
+START = datetime(2024, 5, 4, 7, 30, tzinfo=timezone.utc)
+
+
+def strava_activity(activity_id: int) -> StravaActivityResponseModel:
+    start = START + timedelta(days=activity_id)
+    return StravaActivityResponseModel(
+        id=activity_id,
+        name=f"Run {activity_id}",
+        distance=5000,
+        moving_time=1500,
+        elapsed_time=1500,
+        total_elevation_gain=10,
+        type="Run",
+        start_date=start,
+        start_date_local=start,
+        timezone="(GMT+01:00) Europe/Amsterdam",
+        average_speed=3.3,
+        max_speed=4.0,
+    )
+
+
+class FakeStravaService:
+    """Lists a fixed set of activities, fetching streams calls on_streams first."""
+
+    def __init__(self, activity_ids: list[int], on_streams: Callable[[int], None] = lambda activity_id: None):
+        self.activities = [strava_activity(activity_id) for activity_id in activity_ids]
+        self.on_streams = on_streams
+        self.fetched: list[int] = []
+
+    def get_activities(self, per_page: int, page: int, start_date: datetime, end_date: datetime) -> list[StravaActivityResponseModel]:
+        listed = [activity for activity in self.activities if start_date <= activity.start_date < end_date]
+        return listed[(page - 1) * per_page : page * per_page]
+
+    def remaining_requests(self) -> int | None:
+        return None
+
+    def get_streams(self, activity_id: int, stream_types: list[StravaStreamType] | None = None) -> StravaJSONStreamResponseModel:
+        self.on_streams(activity_id)
+        self.fetched.append(activity_id)
+        return StravaJSONStreamResponseModel(streams=[])
+
+
+def get_jobs(db_service: StrideDBService) -> dict[int, SyncJob]:
+    with sqlmodel.Session(db_service.engine) as session:
+        return {job.provider_activity_id: job for job in session.exec(sqlmodel.select(SyncJob))}
+
+
+def plan_and_list(sync: StravaSync) -> None:
+    sync.plan(START, START + timedelta(days=30))
+    sync.list_activities()
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_work_saves_every_job(db_service: StrideDBService, prefetch: bool) -> None:
+    strava_service = FakeStravaService([1, 2, 3])
+    sync = StravaSync(db_service, strava_service, prefetch=prefetch)  # type: ignore[arg-type]
+    plan_and_list(sync)
+
+    assert sync.work(batch_size=2) == 3
+    assert {job.status for job in get_jobs(db_service).values()} == {SyncJobStatus.DONE}
+    assert {job.attempts for job in get_jobs(db_service).values()} == {1}
+    assert sorted(strava_service.fetched) == [1, 2, 3]
+
+
+def test_work_renews_the_leases_of_held_jobs(db_service: StrideDBService) -> None:
+    leases: list[datetime | None] = []
+    # lease of the last job of the batch, seen while the jobs before it run
+    strava_service = FakeStravaService([1, 2, 3, 4], on_streams=lambda activity_id: leases.append(get_jobs(db_service)[4].lease_expires_at))
+    # without prefetching, streams are fetched while their job runs
+    sync = StravaSync(db_service, strava_service, prefetch=False)  # type: ignore[arg-type]
+    plan_and_list(sync)
+
+    sync.work(batch_size=4)
+    assert len(leases) == 4
+    assert None not in leases and leases == sorted(leases) and len(set(leases)) == 4  # type: ignore[type-var]
+
+
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_rate_limit_releases_jobs_that_did_not_run(db_service: StrideDBService, prefetch: bool) -> None:
+    def on_streams(activity_id: int) -> None:
+        if activity_id == 2:
+            response = requests.Response()
+            response.status_code = 429
+            raise requests.HTTPError("429 Too Many Requests", response=response)
+
+    sync = StravaSync(db_service, FakeStravaService([1, 2, 3, 4], on_streams), prefetch=prefetch)  # type: ignore[arg-type]
+    plan_and_list(sync)
+
+    before = datetime.now(timezone.utc)
+    assert sync.work(batch_size=4) == 2
+    jobs = get_jobs(db_service)
+    assert jobs[1].status == SyncJobStatus.DONE
+    assert jobs[2].status == SyncJobStatus.PENDING and jobs[2].attempts == 1
+    for activity_id in (3, 4):
+        assert jobs[activity_id].status == SyncJobStatus.PENDING
+        assert jobs[activity_id].attempts == 0
+        assert jobs[activity_id].lease_owner is None
+        assert jobs[activity_id].next_attempt_at.replace(tzinfo=timezone.utc) >= before + RATE_LIMIT_BACKOFF  # type: ignore[union-attr]